@@ -0,0 +1,118 @@
+'''
+Purpose:
+    Crash-safe replacement of the generated files.
+    The new content is written to a temporary file in the same
+    directory, flushed to disk, given its mode, and renamed over
+    the old file, which is then made immutable again.
+    A power cut leaves either the old or the new file, never
+    a missing or truncated one.
+    The directories are flushed once per batch of files,
+    rather than once per file.
+'''
+
+import contextlib
+import os
+import tempfile
+import threading
+
+try:
+    from . import fileattr
+except ImportError:
+    import fileattr
+
+DEFAULT_MODE = 0o644
+
+_local = threading.local()
+
+
+def fsync_directory(directory='.'):
+    '''
+    Purpose:
+        Make the renames within directory durable
+    '''
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def batch():
+    '''
+    Purpose:
+        Flush each directory written to once, when the batch ends.
+        A batch within a batch joins the outer one.
+    '''
+    if getattr(_local, 'directories', None) is not None:
+        yield
+        return
+    directories = set()
+    _local.directories = directories
+    try:
+        yield
+    finally:
+        _local.directories = None
+        for directory in sorted(directories):
+            fsync_directory(directory)
+
+
+def write_file(filename='', content='', mode=None, immutable=False):
+    '''
+    Purpose:
+        Atomically replace filename with content
+    Arguments:
+        mode: Permissions of the new file, those of the old file
+              (or DEFAULT_MODE) if None
+        immutable: Set the immutable flag once in place
+    Return:
+        The outcome of the immutable flag (see fileattr.set_immutable),
+        None if it was not requested
+    Raise:
+        OSError if the file could not be replaced, the old file is then intact,
+        immutable again if it was
+    '''
+    directory = os.path.dirname(os.path.abspath(filename))
+    locked = False
+    try:
+        current = os.stat(filename)
+        if mode == None:
+            mode = current.st_mode & 0o7777
+        # An immutable file cannot be replaced, the old content stays meanwhile
+        locked = fileattr.is_immutable(filename) == True
+        if fileattr.set_immutable(filename, False) == False:
+            raise PermissionError(1, 'Unable to clear the immutable flag', filename)
+    except FileNotFoundError:
+        pass
+    if mode == None:
+        mode = DEFAULT_MODE
+
+    temporary = None
+    try:
+        fd, temporary = tempfile.mkstemp(prefix='.'+os.path.basename(filename)+'.', dir=directory)
+        with os.fdopen(fd, 'w') as file:
+            file.write(content)
+            file.flush()
+            os.fchmod(file.fileno(), mode)
+            os.fsync(file.fileno())
+        os.replace(temporary, filename)
+    except BaseException:
+        if temporary != None:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+        # The old file stays in place, and keeps its lock
+        if locked:
+            fileattr.set_immutable(filename, True)
+        raise
+
+    directories = getattr(_local, 'directories', None)
+    if directories is not None:
+        directories.add(directory)
+    else:
+        fsync_directory(directory)
+
+    if immutable:
+        return fileattr.set_immutable(filename, True)
+    return None
@@ -0,0 +1,261 @@
+'''
+Purpose:
+    Execution backend of configurations.py and runner.py.
+    Every command and every file operation on the system
+    goes through the current backend:
+    - RealBackend: executes the commands, and writes the files,
+      optionally under a root directory instead of /
+    - RecordingBackend: wraps another backend, and records every
+      command and file operation with a timestamp
+    - FakeBackend: executes nothing, answers every command after a
+      configurable latency, with configurable failures and output, and
+      writes the files under a temporary root directory
+    Applying the AP can therefore be timed and verified without
+    root, and without touching /etc or /root.
+'''
+
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+try:
+    from . import atomic
+    from . import fileattr
+except ImportError:
+    import atomic
+    import fileattr
+
+
+@dataclass(frozen=True)
+class Event:
+    time: float             # time.monotonic() when it finished
+    kind: str               # 'run', 'write', 'remove', 'chmod', 'immutable', 'mutable'
+    target: object          # The command (list) or the filename
+    returncode: int = 0
+    duration: float = 0.0   # Seconds
+
+
+class RealBackend():
+    def __init__(self,
+        root=None       # String, directory standing in for /, None for /
+    ):
+        self.root = root
+
+    def path(self, filename=''):
+        '''
+        Purpose:
+            Where filename actually is, given the root
+        '''
+        if self.root == None or not os.path.isabs(filename):
+            return filename
+        return os.path.join(self.root, filename.lstrip('/'))
+
+    def run(self, command=[], input=None):
+        '''
+        Return:
+            (returncode, stdout, stderr)
+        Raise:
+            OSError if the command cannot be started
+        '''
+        result = subprocess.run(command, input=input, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        return result.returncode, result.stdout, result.stderr
+
+    def write_file(self, filename='', content='', mode=None, immutable=False):
+        '''
+        Purpose:
+            Atomically replace the file (atomic.py)
+        Return:
+            See atomic.write_file
+        '''
+        path = self.path(filename)
+        if self.root != None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        return atomic.write_file(path, content, mode, immutable)
+
+    def batch(self):
+        '''
+        Purpose:
+            Context manager, flushing the directories of the
+            files written within it once, at the end
+        '''
+        return atomic.batch()
+
+    def remove(self, filename=''):
+        os.remove(self.path(filename))
+
+    def chmod(self, filename='', mode=0o644):
+        os.chmod(self.path(filename), mode)
+
+    def exists(self, filename=''):
+        return os.path.exists(self.path(filename))
+
+    def set_immutable(self, filename='', immutable=True):
+        '''
+        Return:
+            See fileattr.set_immutable
+        '''
+        return fileattr.set_immutable(self.path(filename), immutable)
+
+
+class RecordingBackend():
+    '''
+    Purpose:
+        Record everything done through backend,
+        a RealBackend unless specified
+    '''
+    def __init__(self, backend=None):
+        self.backend = backend if backend != None else RealBackend()
+        self.events = []
+        self.lock = threading.Lock()
+
+    def path(self, filename=''):
+        return self.backend.path(filename)
+
+    def exists(self, filename=''):
+        return self.backend.exists(filename)
+
+    def _record(self, kind, target, start, returncode=0):
+        now = time.monotonic()
+        with self.lock:
+            self.events.append(Event(now, kind, target, returncode, now - start))
+
+    def run(self, command=[], input=None):
+        start = time.monotonic()
+        try:
+            result = self.backend.run(command, input)
+        except OSError:
+            self._record('run', list(command), start, 127)
+            raise
+        self._record('run', list(command), start, result[0])
+        return result
+
+    def write_file(self, filename='', content='', mode=None, immutable=False):
+        start = time.monotonic()
+        status = self.backend.write_file(filename, content, mode, immutable)
+        self._record('write', filename, start)
+        if immutable:
+            self._record('immutable', filename, start, 0 if status else 1)
+        return status
+
+    def batch(self):
+        return self.backend.batch()
+
+    def remove(self, filename=''):
+        start = time.monotonic()
+        self.backend.remove(filename)
+        self._record('remove', filename, start)
+
+    def chmod(self, filename='', mode=0o644):
+        start = time.monotonic()
+        self.backend.chmod(filename, mode)
+        self._record('chmod', filename, start)
+
+    def set_immutable(self, filename='', immutable=True):
+        start = time.monotonic()
+        status = self.backend.set_immutable(filename, immutable)
+        self._record('immutable' if immutable else 'mutable', filename, start, 0 if status else 1)
+        return status
+
+    def commands(self):
+        '''
+        Return:
+            Every command executed, in the order they finished
+        '''
+        return [event.target for event in self.events if event.kind == 'run']
+
+    def files(self):
+        '''
+        Return:
+            Every file written, in the order they were written
+        '''
+        return [event.target for event in self.events if event.kind == 'write']
+
+
+class _Simulation():
+    '''
+    Purpose:
+        Answer commands without executing them
+    '''
+    def __init__(self, root, latency, failures, outputs, default_latency):
+        self.files = RealBackend(root)
+        self.latency = latency
+        self.failures = failures
+        self.outputs = outputs
+        self.default_latency = default_latency
+
+    def path(self, filename=''):
+        return self.files.path(filename)
+
+    def _match(self, table, command, default):
+        # The longest matching prefix wins
+        line = ' '.join(command)
+        best = None
+        for prefix in table:
+            if (line == prefix or line.startswith(prefix+' ')) and (best == None or len(prefix) > len(best)):
+                best = prefix
+        return table[best] if best != None else default
+
+    def run(self, command=[], input=None):
+        time.sleep(self._match(self.latency, command, self.default_latency))
+        returncode = self._match(self.failures, command, 0)
+        if returncode == 127:
+            raise FileNotFoundError(2, 'No such file or directory', command[0])
+        return returncode, self._match(self.outputs, command, ''), ''
+
+    def write_file(self, filename='', content='', mode=None, immutable=False):
+        # Never locks the files of the temporary root for real
+        self.files.write_file(filename, content, mode, False)
+        return True if immutable else None
+
+    def batch(self):
+        return self.files.batch()
+
+    def remove(self, filename=''):
+        self.files.remove(filename)
+
+    def chmod(self, filename='', mode=0o644):
+        self.files.chmod(filename, mode)
+
+    def exists(self, filename=''):
+        return self.files.exists(filename)
+
+    def set_immutable(self, filename='', immutable=True):
+        # Never locks the files of the temporary root for real
+        return True
+
+
+class FakeBackend(RecordingBackend):
+    def __init__(self,
+        root=None,              # String, directory standing in for /, a new temporary one if None
+        latency={},             # Dictionary, command prefix -> seconds, i.e. {'sudo systemctl restart': 0.5}
+        failures={},            # Dictionary, command prefix -> returncode, 127 for a missing command
+        outputs={},             # Dictionary, command prefix -> standard output
+        default_latency=0.0     # Seconds for every other command
+    ):
+        if root == None:
+            root = tempfile.mkdtemp(prefix='ap_setup.')
+        self.root = root
+        RecordingBackend.__init__(self, _Simulation(root, latency, failures, outputs, default_latency))
+
+
+_current = RealBackend()
+
+
+def get_backend():
+    return _current
+
+
+def set_backend(backend=None):
+    '''
+    Purpose:
+        Make backend the current one, a RealBackend if None
+    Return:
+        The previous backend, to restore it later
+    '''
+    global _current
+    previous = _current
+    _current = backend if backend != None else RealBackend()
+    return previous
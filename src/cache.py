@@ -0,0 +1,137 @@
+'''
+Purpose:
+    Small on-disk cache for the preflight results of tool.py.
+    Every entry carries its own invalidation key, such as the
+    mtime of a file or the set of network interfaces, and
+    optionally a time to live. An entry is only reused when
+    the key computed now equals the key it was stored with.
+Note:
+    The cache lives under /run, which is a tmpfs and therefore
+    emptied on every boot.
+'''
+
+import json
+import os
+import threading
+import time
+
+CACHE_DIR = '/run/ap_setup'
+CACHE_FILE = os.path.join(CACHE_DIR, 'preflight.json')
+
+
+def file_key(path=''):
+    '''
+    Purpose:
+        Invalidation key for the content of a file
+    Return:
+        [path, inode, size, mtime] or [path, None] if it does not exist
+    '''
+    try:
+        info = os.stat(path)
+    except OSError:
+        return [path, None]
+    return [path, info.st_ino, info.st_size, info.st_mtime_ns]
+
+
+def interfaces_key(base_path='/sys/class/net/'):
+    '''
+    Purpose:
+        Invalidation key for the set of network interfaces
+    '''
+    try:
+        return sorted(os.listdir(base_path))
+    except OSError:
+        return None
+
+
+def boot_key(location='/proc/sys/kernel/random/boot_id'):
+    '''
+    Purpose:
+        Invalidation key which changes on every boot
+    '''
+    try:
+        with open(location, 'r') as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def _normalise(key):
+    # Keys are compared after a JSON round trip, turning tuples into lists
+    return json.loads(json.dumps(key))
+
+
+class Cache():
+    def __init__(self,
+        filename=CACHE_FILE,    # String
+        fresh=False             # Boolean, ignore the stored entries
+    ):
+        self.filename = filename
+        self.fresh = fresh
+        self.changed = False
+        self.lock = threading.Lock()
+        self.entries = {}
+        if not fresh:
+            self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.filename, 'r') as file:
+                entries = json.load(file)
+            if isinstance(entries, dict):
+                return entries
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def get(self, name, key, ttl=None):
+        '''
+        Purpose:
+            Look up an entry
+        Return:
+            The entry, a dictionary with 'value' and 'output',
+            or None if it is missing, stale or expired
+        '''
+        with self.lock:
+            entry = self.entries.get(name)
+        if not isinstance(entry, dict) or entry.get('key') != _normalise(key):
+            return None
+        if ttl is not None and time.time() - entry.get('time', 0) > ttl:
+            return None
+        return entry
+
+    def put(self, name, key, value, output=''):
+        entry = {
+            'key': _normalise(key),
+            'time': time.time(),
+            'value': value,
+            'output': output
+        }
+        with self.lock:
+            self.entries[name] = entry
+            self.changed = True
+
+    def save(self):
+        '''
+        Purpose:
+            Write the entries back, if anything changed.
+            Failing to do so (e.g. not running as root) is not an error,
+            the next run simply starts without a cache.
+        Return:
+            True if the cache was written
+        '''
+        with self.lock:
+            if not self.changed:
+                return False
+            content = json.dumps(self.entries)
+            self.changed = False
+        try:
+            os.makedirs(os.path.dirname(self.filename), mode=0o700, exist_ok=True)
+            tmp = self.filename + '.tmp'
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as file:
+                file.write(content)
+            os.replace(tmp, self.filename)
+        except OSError:
+            return False
+        return True
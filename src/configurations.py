@@ -1,9 +1,32 @@
-import subprocess
 import configparser
+import hashlib
 import os
 import re
 import random
 import ipaddress
+import time
+
+try:
+    from . import backend
+    from . import firewall
+    from . import hostapd_ctrl
+    from . import runner
+except ImportError:
+    import backend
+    import firewall
+    import hostapd_ctrl
+    import runner
+
+# Prefix lengths of the network of the AP, a /16 holds the largest pool
+MIN_PREFIX = 16
+MAX_PREFIX = 29
+DEFAULT_PREFIX = 24
+
+HOSTAPD_CTRL = hostapd_ctrl.CTRL_DIR
+# hostapd only reads these when it starts, a RELOAD keeps the old values
+HOSTAPD_RESTART_KEYS = ('interface', 'driver', 'ctrl_interface')
+# Changed on the running hostapd through its control interface
+HOSTAPD_LIVE_KEYS = ('channel',)
 
 
 '''
@@ -11,9 +34,12 @@ Helper functions needed by logic.py
 ######### File creation/deletion
 - safe_lock(filename='', verbose=False)
 - safe_delete(filename='', verbose=False)
+- file_changed(filename='', content='')
+- write_config(filename='', content='', mode=None, verbose=False)
 ######### 
 + is_valid_mac_address(mac, verbose=False)
 - change_mac(interface='', new_mac='', verbose=False)
+- mac_steps(interface='', new_mac='')
 #########ini file
 + ini_exist(file_path="")
 + ini_default_settings(verbose = False)
@@ -21,66 +47,152 @@ Helper functions needed by logic.py
 + determine_ini_ap_type(settings = {}, verbose = False)
 + ini_populate(settings = {}, verbose = False)
 #########Isolation
-+ create_isolation(ip='', wifiname = '', verbose = False)
-+ remove_isolation()
++ load_firewall(wifiname='', verbose=False)
++ unload_firewall(wifiname='', verbose=False)
++ firewall_status(wifiname='')
++ create_isolation(ip='', wifiname = '', verbose = False, changes = None, prefix = DEFAULT_PREFIX)
++ service_paths(results=[])
++ remove_isolation(verbose = False, wifiname = '')
++ reapply_ap(ip='', wifiname='', mac_address=None, verbose=False, prefix=DEFAULT_PREFIX, service='hostapd', firewalled=None, virtual=())
 ######### Persistence
 - persistence_status(files = [])
 - persistence_create(ip='',wifiname = [], verbose = False)
 + persistence_remove(verbose = False)
 ######### Update AP
 - is_valid_ip_address(ip='')
-- is_valid_range(range_from='', range_to='')
+- prefix_length(netmask=None)
+- pool_network(range_from='', range_to='', netmask=None)
+- is_valid_range(range_from='', range_to='', netmask=None)
 - retrieve_ip_from_conf(verbose = False)
-- find_usable_ip(range_from ='', range_to='')
+- address_from_conf(verbose = False)
+- find_usable_ip(range_from ='', range_to='', netmask=None)
+- render_dnsmasq(settings = {}, wifiname='')
+- render_hostapd(settings = {}, wifiname='', ap_type='')
+- read_dnsmasq_conf(filename='/etc/dnsmasq.conf')
+- read_hostapd_conf(filename='/etc/hostapd/hostapd.conf')
 - update_dnsmasq(settings = {}, verbose=False)
 - update_hostapd(settings = {}, ap_type='', verbose=False)
+- pending_changes(ip='', wifiname='', settings={})
 - update_ap(settings={}, wifiname='', verbose=False)
+######### Multiple radios
+- allocate_pools(radios={})
++ ini_radios(file_path='', verbose=False)
++ radio_interfaces(radios={})
+- render_bss(settings={}, vif='', ap_type='')
+- render_hostapd_radio(settings={}, wifiname='')
+- render_dnsmasq_radios(radios={})
+- pending_radio_changes(radios={}, addresses={})
+- radio_steps(radios={}, addresses={}, changes=None)
++ update_radios(radios={}, verbose=False)
+- read_dnsmasq_radios_conf(filename='/etc/dnsmasq.conf')
+- read_hostapd_radio_conf(filename='')
+- dnsmasq_addresses(filename='/etc/dnsmasq.conf')
++ reapply_radio(wifiname='', radios={}, verbose=False)
+######### Live changes
+- live_status(wifiname='')
+- apply_live(wifiname='', live={}, verbose=False)
++ change_channel(wifiname='', channel='', verbose=False)
++ disconnect_station(wifiname='', mac='', verbose=False)
 '''
 
 
 ######### File creation/deletio
 def safe_lock(filename='', verbose=False):
-    #step 1a Change file metadata (attributes)
-    command = ['sudo', 'chattr', '+i', filename]
+    '''
+    Purpose:
+        Make the file immutable (chattr +i), in-process
+    Return:
+        False if the flag could not be set,
+        True if it was, or if the filesystem does not support it
+    '''
     try:
-        # Make the file immutable
-        result =subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)  
+        status = backend.get_backend().set_immutable(filename, True)
+    except OSError:
+        status = False
+    if status == None:
         if verbose:
-            if result.returncode == 0:
-                print(" "*4+"\x1b[32m[+]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-            else:
-                print(" "*4+"\x1b[31m[!]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-    except subprocess.CalledProcessError as e:
+            print(" "*4+"\x1b[34m[?]\x1b[0m Immutable flag not supported: \x1b[100m"+filename+"\x1b[0m")
+        return True
+    if verbose:
+        if status:
+            print(" "*4+"\x1b[32m[+]\033[0m "+f"Locked \x1b[35m{filename}\033[0m")
+        else:
+            print(" "*4+"\x1b[31m[!]\033[0m "+f"Unable to lock \x1b[35m{filename}\033[0m")
+    return status
+
+
+def safe_delete(filename='', verbose=''):
+    '''
+    Purpose:
+        Clear the immutable flag (chattr -i) and delete the file
+    Return:
+        True if the file no longer exists
+    '''
+    system = backend.get_backend()
+    if not system.exists(filename):
+        return True
+    try:
+        status = system.set_immutable(filename, False)
+    except OSError:
+        status = False
+    if status == False:
+        print(" "*4+"\x1b[31m[!]\033[0m "+f"Unable to unlock \x1b[35m{filename}\033[0m")
+        return False
+    try:
+        system.remove(filename)  # Delete the file
+    except OSError as e:
+        print(" "*4+"\x1b[41mError\x1b[0m unable to delete '"+filename+"' before recreation")
         if verbose:
-            print(" "*4+f"\x1b[41m[!] Error executing command\033[0m:\n"+" "*4+f"\x1b[35m{' '.join(command)}\033[0m\n    Error: {str(e)}")
+            print(" "*4+f"Error: {str(e)}")
         return False
+    if verbose:
+        print(" "*4+"\x1b[34m[?]\x1b[0m Deleted file: \x1b[100m"+filename+"\x1b[0m")
     return True
 
 
-def safe_delete(filename='', verbose=''):
-    if os.path.exists(filename):
-        flags = ['-i', '-e']
-        for flag in flags:
-            command = ['sudo', 'chattr', flag, filename]
-            try:
-                subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                if verbose:
-                    print(" "*4+"\x1b[32m[+]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-            except subprocess.CalledProcessError as e:
-                if verbose:
-                    print(" "*4+"\x1b[31m[!]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-                return False
+def file_changed(filename='', content=''):
+    '''
+    Purpose:
+        Compare the hash of content with the file on disk
+    Return:
+        True if the file is missing or differs from content
+    '''
+    try:
+        with open(backend.get_backend().path(filename), 'rb') as file:
+            current = hashlib.sha256(file.read()).digest()
+    except OSError:
+        return True
+    return current != hashlib.sha256(content.encode()).digest()
 
-        os.remove(filename)  # Delete the file
-        if os.path.exists(filename):
-            print(" "*4+"\x1b[41mError\x1b[0m unable to delete '"+filename+"' before recreation")
-        # Attempt to open the file to write
-            return False
+
+def write_config(filename='', content='', mode=None, verbose=False):
+    '''
+    Purpose:
+        Replace filename with content, unless it already has that content.
+        The file is replaced atomically and made immutable (atomic.py),
+        a crash leaves either the old or the new file.
+    Return:
+        (status, changed), status being False if the file could not be
+        written or locked
+    '''
+    if not file_changed(filename, content):
         if verbose:
-            print(" "*4+"\x1b[34m[?]\x1b[0m Deleted file: \x1b[100m"+filename+"\x1b[0m")
-    else:
-        return True
-    return True
+            print(" "*4+"\x1b[34m[?]\x1b[0m Unchanged file: \x1b[100m"+filename+"\x1b[0m")
+        return True, False
+    try:
+        locked = backend.get_backend().write_file(filename, content, mode, True)
+    except OSError as e:
+        print(" "*4+f"\x1b[31m[!]\033[0m Failed to write to {filename}:\n    {str(e)}")
+        return False, False
+    if verbose:
+        print(" "*4+"\x1b[34m[?]\x1b[0m Created file: \x1b[100m"+filename+"\x1b[0m")
+    if locked == None:
+        if verbose:
+            print(" "*4+"\x1b[34m[?]\x1b[0m Immutable flag not supported: \x1b[100m"+filename+"\x1b[0m")
+    elif not locked:
+        print(" "*4+"\x1b[31m[!]\033[0m "+f"Unable to lock \x1b[35m{filename}\033[0m")
+        return False, True
+    return True, True
 
 
 ######### MAC addresse
@@ -133,38 +245,30 @@ def change_mac(interface='', new_mac='', verbose=False):
     '''
     if new_mac == None:
         return False
-    returncode = 0
     if not is_valid_mac_address(new_mac, verbose):
         return False
 
-    commands = [
-        ['sudo', 'ip', 'link', 'set', interface, 'down'],
-        ['sudo', 'ip', 'link', 'set', interface, 'address', new_mac],
-        ['sudo', 'ip', 'link', 'set', interface, 'up']
-    ]
-    count = 0
-    for command in commands:
-        try:
-            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            if result.returncode != 0:
-                count += 1
-            if verbose:
-                if result.returncode == 0:
-                    print(" "*4+"\x1b[32m[+]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-                else:
-                    print(" "*4+"\x1b[31m[!]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-        except subprocess.CalledProcessError as e:
-            if verbose:
-                print(" "*4+f"\x1b[41m[!] Error executing command\033[0m:\n"+" "*4+f"\x1b[35m{' '.join(command)}\033[0m\n    Error: {str(e)}")
-                count += 1
-            return False
-    if count > 0:
+    results = runner.run_steps(mac_steps(interface, new_mac), verbose=verbose)
+    if not runner.succeeded(results):
         print(" "*4+"\x1b[31m[!]\033[0m Failed to change MAC address")
         return False
     print(" "*4+f"\x1b[34m[?]\x1b[0m MAC address for {interface} changed to {new_mac}.")
     return True
 
 
+def mac_steps(interface='', new_mac=''):
+    '''
+    Purpose:
+        The steps changing the MAC address, the link must be down
+    '''
+    return [
+        runner.Step('mac_down', ['sudo', 'ip', 'link', 'set', interface, 'down']),
+        runner.Step('mac_address', ['sudo', 'ip', 'link', 'set', interface, 'address', new_mac], depends=['mac_down']),
+        # The link is brought back up, whatever happened to the address
+        runner.Step('mac_up', ['sudo', 'ip', 'link', 'set', interface, 'up'], after=['mac_address'])
+    ]
+
+
 ######### .ini file
 
 
@@ -189,6 +293,7 @@ def ini_default_settings(verbose = False):
         'password': None,               # str
         'range_from': "10.10.10.100",   # str
         'range_to': "10.10.10.255",     # str
+        'netmask': None,                # str, derived from the range if None
         'channel': "1",                 # str
         'persistence': None             # str
     }
@@ -228,6 +333,7 @@ def read_ini_config(file_path='', verbose=False):
         'password': None,       # str
         'range_from': None,     # str
         'range_to': None,       # str
+        'netmask': None,        # str, optional
         'channel': None,        # str
         'persistence': None     # str 'yes'
     }
@@ -238,15 +344,15 @@ def read_ini_config(file_path='', verbose=False):
     try:
         with open(file_path, 'r') as f: 
             config.read_file(f)
-    except configparser.Error as e:
+    except (OSError, configparser.Error) as e:
         print(" "*22+f"Warning: Failed to read the config file: {str(e)}")
         return None 
     # Optional 'Settings' section
     if 'Settings' in config:
+        for key in settings.keys():
+            if key in config['Settings']:
+                settings[key] = config['Settings'][key]
         if verbose:
-            for key in settings.keys():
-                if key in config['Settings']:
-                    settings[key] = config['Settings'][key]
             print(" "*4+"Settings loaded :")
         # Individually check each setting
             max_key_length = max(len(key) for key in settings)
@@ -333,6 +439,7 @@ def ini_populate(settings = {}, verbose = False):
         - channel        : str
         Optional:
         - mac_address    : str
+        - netmask        : str (i.e. 255.255.252.0 or 22 for a /22)
         - persistence    : str
     Return:
         New settings dictionary
@@ -381,10 +488,13 @@ def ini_populate(settings = {}, verbose = False):
             '''
             settings['channel'] = '1'
     
-    # Review ranges, to and from.
-    if is_valid_range(settings['range_from'], settings['range_to']) == False:
+    # Review ranges, to and from, within the netmask if one is given
+    if settings.get('netmask') != None and prefix_length(settings['netmask']) == None:
+        settings['netmask'] = None
+    if is_valid_range(settings['range_from'], settings['range_to'], settings.get('netmask')) == False:
         settings['range_from'] = default_settings['range_from']
         settings['range_to'] = default_settings['range_to']
+        settings['netmask'] = default_settings['netmask']
 
     # Review persistence
     if settings['persistence'] != None:
@@ -396,7 +506,44 @@ def ini_populate(settings = {}, verbose = False):
 
 ######### Isolation
 
-def create_isolation(ip='', wifiname = '', verbose = False):
+def _run_firewall(command=[], content='', verbose=False):
+    results = runner.run_steps([runner.Step('firewall', command, input=content)], verbose=verbose)
+    return runner.succeeded(results)
+
+
+def load_firewall(wifiname='', verbose=False):
+    '''
+    Purpose:
+        Apply the firewall in a single transaction,
+        using the backend of the system (firewall.py)
+    Return:
+        True if the ruleset was committed
+    '''
+    command, content = firewall.backend().apply(wifiname)
+    return _run_firewall(command, content, verbose)
+
+
+def unload_firewall(wifiname='', verbose=False):
+    '''
+    Purpose:
+        Remove the firewall of load_firewall, and nothing else
+    '''
+    command, content = firewall.backend().remove(wifiname)
+    return _run_firewall(command, content, verbose)
+
+
+def firewall_status(wifiname=''):
+    '''
+    Purpose:
+        Determine whether the firewall of load_firewall is in place
+    Return:
+        (status, missing) where missing lists the absent rules,
+        or (False, None) if the rules cannot be read
+    '''
+    return firewall.backend().status(wifiname)
+
+
+def create_isolation(ip='', wifiname = '', verbose = False, changes = None, prefix = DEFAULT_PREFIX):
     '''
     Purpose:
         Create isolation on the machine.
@@ -404,74 +551,172 @@ def create_isolation(ip='', wifiname = '', verbose = False):
         - Activate a firewall by blocking all traffic
           on ALL ethernet devices, allowing only the wifi device
         - sudo airmon-ng check kill
+        changes (see pending_changes) limits the commands to what
+        has to change, everything is executed if None
+        prefix is the prefix length of the network of the AP
     Note:
         It is assumed that hostapd.conf and dnsmasq.conf files
         are already in place.
         And that these commands will run flawlessly, as all prerequisites
         have been met.
     '''
-    commands = [
-        ["sudo", "iptables", "-F",],
-        ["sudo", "iptables", "-P", "INPUT", "DROP"],
-        ["sudo", "iptables", "-P", "OUTPUT", "DROP"],
-        ["sudo", "iptables", "-P", "FORWARD", "DROP"],
-        ["sudo", "iptables", "-A", "INPUT", "-i", wifiname, "-j", "ACCEPT"],
-        ["sudo", "iptables", "-A", "FORWARD", "-i", wifiname, "-j", "ACCEPT"],
-        ["sudo", "iptables", "-A", "OUTPUT", "-o", wifiname, "-j", "ACCEPT"],
-        ["sudo", "iptables", "-A", "FORWARD", "-o", wifiname, "-j", "ACCEPT"],
-        ["sudo", "airmon-ng", "check", "kill"],
-        ["sudo", "ip", "link", "set", wifiname, "down"],
-        ["sudo", "ip", "addr", "add", f"{ip}/24", "dev", wifiname],
-        ["sudo", "ip", "link", "set", wifiname, "up"],
-        ["sudo", "systemctl", "unmask", "hostapd"],
-        ["sudo", "systemctl", "unmask", "dnsmasq"],
-        ["sudo", "systemctl", "restart", "hostapd"],
-        ["sudo", "systemctl", "restart", "dnsmasq"]
-    ]
+    if changes == None:
+        changes = {'firewall': True, 'address': True, 'restart': ['hostapd', 'dnsmasq'], 'reload': []}
+    steps = []
+    gate = []
+    if changes['firewall']:
+        command, content = firewall.backend().apply(wifiname)
+        steps.append(runner.Step('firewall', command, input=content))
+        # Nothing else starts, unless the traffic is blocked
+        gate = ['firewall']
+    link = []
+    if changes['address']:
+        steps += [
+            runner.Step('airmon', ["sudo", "airmon-ng", "check", "kill"], depends=gate),
+            runner.Step('link_down', ["sudo", "ip", "link", "set", wifiname, "down"], depends=gate, after=['airmon']),
+            runner.Step('address', ["sudo", "ip", "addr", "add", f"{ip}/{prefix}", "dev", wifiname], depends=gate, after=['link_down']),
+            runner.Step('link_up', ["sudo", "ip", "link", "set", wifiname, "up"], depends=gate, after=['address'])
+        ]
+        link = ['link_up']
+    for service in changes['restart']:
+        steps += [
+            runner.Step('unmask_'+service, ["sudo", "systemctl", "unmask", service], depends=gate),
+            runner.Step('restart_'+service, ["sudo", "systemctl", "restart", service],
+                depends=gate, after=link+['unmask_'+service])
+        ]
+    for service in changes.get('reload', []):
+        steps.append(runner.Step('reload_'+service, _reload_command(service, wifiname), depends=gate, after=link))
+    results = runner.run_steps(steps, verbose=verbose)
+
+    # A reload which did not take, i.e. hostapd running without
+    # a control interface, falls back to a restart
+    failed = [result.name[len('reload_'):] for result in results
+        if result.name.startswith('reload_') and not result.skipped and not _reloaded(result)]
+    if len(failed) > 0:
+        results += runner.run_steps([
+            runner.Step('restart_'+service, ["sudo", "systemctl", "restart", service]) for service in failed
+        ], verbose=verbose)
+
+    for service, path, outage, ok in service_paths(results):
+        if ok:
+            print(" "*4+"\x1b[32m[+]\033[0m "+f"{service}: {path}, outage {outage:.2f}s")
+        else:
+            print(" "*4+"\x1b[31m[!]\033[0m "+f"{service}: {path} failed, outage {outage:.2f}s")
+    # The restart replacing a failed reload decides for its service
+    return runner.succeeded([result for result in results
+        if not (result.name.startswith('reload_') and result.name[len('reload_'):] in failed)])
+
+
+def _reload_command(service='', wifiname=''):
+    '''
+    Purpose:
+        The command reloading service in place, only hostapd can:
+        RELOAD through its control interface re-reads hostapd.conf
+        without tearing down the interface.
+        dnsmasq only reads dnsmasq.conf at start, it is restarted.
+    '''
+    return ["sudo", "hostapd_cli", "-p", HOSTAPD_CTRL, "-i", wifiname, "reload"]
 
-    for command in commands:
-        try:
-            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            if verbose:
-                if result.returncode == 0:
-                    print(" "*4+"\x1b[32m[+]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-                else:
-                    print(" "*4+"\x1b[31m[!]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-        except subprocess.CalledProcessError as e:
-            if verbose:
-                print(" "*4+f"\x1b[41m[!] Error executing command\033[0m:\n"+" "*4+f"\x1b[35m{' '.join(command)}\033[0m\n    Error: {str(e)}")
-            return False
-    return True
+
+def _reloaded(result):
+    # hostapd_cli answers FAIL, with a returncode of 0, when the command failed
+    return result.ok and 'FAIL' not in result.stdout
+
+
+def service_paths(results=[]):
+    '''
+    Purpose:
+        How create_isolation brought hostapd and dnsmasq up to date,
+        and how long their clients went without them: from the start
+        of the first step interrupting the service (the link going
+        down, the reload or the restart) until it was back.
+    Return:
+        List of (service, path, outage in seconds, ok), path being
+        'reload', 'restart' or 'reload, restart' if the reload failed
+    '''
+    ran = [result for result in results if not result.skipped]
+    link = [result.started for result in ran if result.name == 'link_down']
+    services = {}
+    for result in ran:
+        action, _, service = result.name.partition('_')
+        if action not in ('reload', 'restart') or service.split('@')[0] not in ('hostapd', 'dnsmasq'):
+            continue
+        entry = services.setdefault(service, {'path': [], 'start': result.started, 'end': result.started})
+        entry['path'].append(action)
+        entry['start'] = min(entry['start'], result.started)
+        entry['end'] = max(entry['end'], result.started + result.duration)
+        entry['ok'] = result.ok if action == 'restart' else _reloaded(result)
+    return [
+        (service, ', '.join(entry['path']), entry['end'] - min([entry['start']] + link), entry['ok'])
+        for service, entry in services.items()
+    ]
 
 
-def remove_isolation(verbose = False):
+def remove_isolation(verbose = False, wifiname = ''):
     '''
     Purpose:
         Remove isolation.
-        iptables -F # Flush all rules
-    '''
-    commands = [
-        ["sudo", "iptables", "-F"],
-        ["sudo", "systemctl", "stop", "hostapd"],
-        ["sudo", "systemctl", "stop", "dnsmasq"],
-        ["sudo", "systemctl", "mask", "hostapd"],
-        ["sudo", "systemctl", "mask", "dnsmasq"],
-        ["sudo", "systemctl", "unmask", "wpa_supplicant"],
-        ["sudo", "systemctl", "restart", "wpa_supplicant"],
-        ["sudo", "systemctl", "restart", "NetworkManager"],
-        ["sudo", "systemctl", "restart", "networking"]
+        Unload the firewall, rules of other tools are kept
+        wifiname is one interface, or the list of every AP interface
+    '''
+    command, content = firewall.backend().remove(wifiname)
+    steps = [
+        runner.Step('firewall', command, input=content),
+        runner.Step('stop_hostapd', ["sudo", "systemctl", "stop", "hostapd", "hostapd@*"]),
+        runner.Step('stop_dnsmasq', ["sudo", "systemctl", "stop", "dnsmasq"]),
+        runner.Step('mask_hostapd', ["sudo", "systemctl", "mask", "hostapd"], after=['stop_hostapd']),
+        runner.Step('mask_dnsmasq', ["sudo", "systemctl", "mask", "dnsmasq"], after=['stop_dnsmasq']),
+        runner.Step('unmask_wpa_supplicant', ["sudo", "systemctl", "unmask", "wpa_supplicant"]),
+        # The wifi device is handed back, once the AP let go of it
+        runner.Step('restart_wpa_supplicant', ["sudo", "systemctl", "restart", "wpa_supplicant"],
+            after=['unmask_wpa_supplicant', 'stop_hostapd', 'stop_dnsmasq']),
+        runner.Step('restart_networkmanager', ["sudo", "systemctl", "restart", "NetworkManager"],
+            after=['firewall', 'stop_hostapd', 'stop_dnsmasq']),
+        runner.Step('restart_networking', ["sudo", "systemctl", "restart", "networking"],
+            after=['firewall', 'stop_hostapd', 'stop_dnsmasq'])
     ]
-    for command in commands:
-        try:
-            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            if verbose:
-                if result.returncode == 0:
-                    print(" "*4+"\x1b[32m[+]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-                else:
-                    print(" "*4+"\x1b[31m[!]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-        except subprocess.CalledProcessError as e:
-            if verbose:
-                print(" "*4+f"\x1b[41m[!] Error executing command\033[0m:\n"+" "*4+f"\x1b[35m{' '.join(command)}\033[0m\n    Error: {str(e)}")
+    runner.run_steps(steps, verbose=verbose)
+
+def reapply_ap(ip='', wifiname='', mac_address=None, verbose=False, prefix=DEFAULT_PREFIX,
+        service='hostapd', firewalled=None, virtual=()):
+    '''
+    Purpose:
+        Bring the AP back on a wifi adapter which has been
+        reset or unplugged and plugged back in.
+        Only the steps lost along with the adapter are executed:
+        - MAC address
+        - IP address
+        - Firewall
+        - Restart hostapd (service) and dnsmasq
+        firewalled lists every AP interface, the firewall being
+        replaced as a whole, [wifiname] if None
+        virtual lists the (interface, ip, prefix) of the BSS
+        interfaces, which hostapd creates again when it restarts
+    Note:
+        The hostapd.conf and dnsmasq.conf files are still in place,
+        and the services are already unmasked.
+    Return:
+        True if every command succeeded
+    '''
+    command, content = firewall.backend().apply(firewalled if firewalled != None else wifiname)
+    steps = [runner.Step('firewall', command, input=content)]
+    link = []
+    if mac_address != None and is_valid_mac_address(mac_address, verbose):
+        steps += mac_steps(wifiname, mac_address)
+        link = ['mac_up']
+    steps += [
+        runner.Step('address', ["sudo", "ip", "addr", "add", f"{ip}/{prefix}", "dev", wifiname], after=link),
+        runner.Step('link_up', ["sudo", "ip", "link", "set", wifiname, "up"], after=['address']),
+        runner.Step('restart_'+service, ["sudo", "systemctl", "restart", service], after=['firewall', 'link_up'])
+    ]
+    links = ['firewall', 'link_up']
+    for vif, vif_ip, vif_prefix in virtual:
+        steps.append(runner.Step(vif+':address', ["sudo", "ip", "addr", "replace", f"{vif_ip}/{vif_prefix}", "dev", vif],
+            depends=['restart_'+service]))
+        links.append(vif+':address')
+    steps.append(runner.Step('restart_dnsmasq', ["sudo", "systemctl", "restart", "dnsmasq"], after=links))
+    results = runner.run_steps(steps, verbose=verbose)
+    return runner.succeeded(results)
 
 ######### Persistence
 
@@ -497,13 +742,45 @@ def persistence_status():
     status = True
 
     for file in files:
-        if not os.path.exists(file):
+        if not backend.get_backend().exists(file):
             status = False
 
     return status
 
 
-def persistence_create(ip='',wifiname = [], mac_address='', verbose = False):
+def _create_ap_script(radios=[]):
+    '''
+    Purpose:
+        The content of /root/create_ap.sh
+        radios is a list of (wifiname, ip, prefix, mac_address, service),
+        service being None for a BSS interface, which hostapd creates
+    '''
+    physical = [radio for radio in radios if radio[4] != None]
+    content = "sudo airmon-ng check kill\n"
+    for wifiname, ip, prefix, _, _ in physical:
+        content += "sudo ip link set "+wifiname+" down\n"
+        content += "sudo ip addr add "+f"{ip}/{prefix} dev "+wifiname+"\n"
+        content += "sudo ip link set "+wifiname+" up\n"
+    for _, _, _, _, service in physical:
+        content += "sudo systemctl unmask "+service+"\n"
+    content += "sudo systemctl unmask dnsmasq\n"
+    content += "sudo systemctl mask wpa_supplicant\n"
+    # Started at boot, reloaded in place when already running
+    for _, _, _, _, service in physical:
+        content += "sudo systemctl reload-or-restart "+service+"\n"
+    for wifiname, ip, prefix, _, service in radios:
+        if service == None:
+            content += "sudo ip addr replace "+f"{ip}/{prefix} dev "+wifiname+"\n"
+    content += "sudo systemctl reload-or-restart dnsmasq\n"
+    for wifiname, _, _, mac_address, _ in physical:
+        if is_valid_mac_address(mac_address):
+            content += "sudo ip link set "+wifiname+" down\n"
+            content += "sudo ip link set "+wifiname+" address "+ mac_address+"\n"
+            content += "sudo ip link set "+wifiname+" up\n"
+    return content
+
+
+def persistence_create(ip='',wifiname = [], mac_address='', verbose = False, prefix = DEFAULT_PREFIX, radios = None):
     '''
     Purpose:
         Creating persistence on the machine
@@ -522,73 +799,32 @@ def persistence_create(ip='',wifiname = [], mac_address='', verbose = False):
 
         Afterwards the ap_settings should be reset.
         to ensure that the AP is created
+
+        radios replaces ip, wifiname, mac_address and prefix when
+        several radios serve as AP, see update_radios
     '''
+    if radios == None:
+        radios = [(wifiname, ip, prefix, mac_address, 'hostapd')]
+    names = [radio[0] for radio in radios]
 
     # Step 1, create files
-    ## Step 1a /root/firewall.sh, if it exist delete it to create it anew
-    ## Make sure to change file attributes as well, chmod 500 $file, + chattr +i $file
-    filename = '/root/firewall.sh'
-    safe_delete(filename, verbose)
-    try:
-        #This will create the file
-        with open(filename, 'w') as file:
-            file.write("#!/bin/sh\n\n")
-            file.write("# Flush all rules on all chains, essentially resetting the firewall\n")
-            file.write("iptables -F\n\n")
-            
-            file.write("# Setting default policies to DROP\n\n")
-            file.write(f"iptables -P INPUT DROP\n")
-            file.write(f"iptables -P OUTPUT DROP\n")
-            file.write(f"iptables -P FORWARD DROP\n\n")
-            
-            file.write(f"# Only allow traffic on {wifiname}\n")
-            file.write(f"iptables -A INPUT -i {wifiname} -j ACCEPT\n")
-            file.write(f"iptables -A OUTPUT -i {wifiname} -j ACCEPT\n")
-            file.write(f"iptables -A FORWARD -i {wifiname} -j ACCEPT\n")
-            file.write(f"iptables -A INPUT -o {wifiname} -j ACCEPT\n")
-            file.write(f"iptables -A OUTPUT -o {wifiname} -j ACCEPT\n")
-            file.write(f"iptables -A FORWARD -o {wifiname} -j ACCEPT\n\n")
-    except IOError as e:
-        if verbose:
-            print(f"    Failed to write to {filename}: {str(e)}")
-        return False
-    if verbose:
-        print(" "*4+"\x1b[34m[?]\x1b[0m Created file: \x1b[100m"+filename+"\x1b[0m")
-    os.chmod(filename, 0o500)  # Make the script executable by the owner only
-    safe_lock(filename, verbose)
-
-    # Step 1b, /root/create_ap.sh
-    ## If file exist, delete it
-    filename = '/root/create_ap.sh'
-    safe_delete(filename, verbose)
-    # Attempt to open the file to write
-    try:
-        #This will create the file
-        with open(filename, 'w') as file:
-            file.write("sudo airmon-ng check kill\n")
-            file.write("sudo ip link set "+wifiname+" down\n")
-            file.write("sudo ip addr add "+f"{ip}/24 dev "+wifiname+"\n")
-            file.write("sudo ip link set "+wifiname+" up\n")
-            file.write("sudo systemctl unmask hostapd\n")
-            file.write("sudo systemctl unmask dnsmasq\n")
-            file.write("sudo systemctl mask wpa_supplicant\n")
-            file.write("sudo systemctl restart hostapd\n")
-            file.write("sudo systemctl restart dnsmasq\n")
-            if is_valid_mac_address(mac_address, verbose):
-                file.write("sudo ip link set "+wifiname+" down\n")
-                file.write("sudo ip link set "+wifiname+" address "+ mac_address+"\n")
-                file.write("sudo ip link set "+wifiname+" up\n")
-    except IOError as e:
-        if verbose:
-            print(f"    Failed to write to {filename}:\n    {str(e)}")
-        return False
-
-    #step 1b Change file metadata (permissions and attributes)
-    if verbose:
-        print(" "*4+"\x1b[34m[?]\x1b[0m Created file: \x1b[100m"+filename+"\x1b[0m")
-    os.chmod(filename, 0o500)  # Make the script executable by the owner only
+    # The directories are flushed once, after the last file
+    changed = False
+    with backend.get_backend().batch():
+        ## Step 1a /root/firewall.sh, rewritten if its content changed
+        ## Make sure to change file attributes as well, chmod 500 $file, + chattr +i $file
+        status, written = write_config('/root/firewall.sh',
+            "#!/bin/sh\n\n" + firewall.backend().script(names),
+            0o500, verbose)  # Make the script executable by the owner only
+        if not status:
+            return False
+        changed = changed or written
 
-    safe_lock(filename, verbose)
+        # Step 1b, /root/create_ap.sh
+        status, written = write_config('/root/create_ap.sh', _create_ap_script(radios), 0o500, verbose)
+        if not status:
+            return False
+        changed = changed or written
 
 #    # Step 1c, /etc/cron.d/ap_persistence
 #    ## If file exist, delete it
@@ -614,54 +850,30 @@ def persistence_create(ip='',wifiname = [], mac_address='', verbose = False):
 #        return False
 
 #    # Step 1c, 2nd attempt /etc/systemd/system/ap_setup.service
-    ## If file exist, delete it
-    filename = '/etc/systemd/system/ap_setup.service'
-
-    safe_delete(filename, verbose)
-
-    try:
-        #This will create the daemon service file
-        with open(filename, 'w') as file:
-            file.write("[Unit]\n")
-            file.write("Description=Setup AP at boot after network and hostapd are ready\n")
-            file.write("After=network.target\n\n")
-            file.write("\n")
-            file.write("[Service]\n")
-            file.write("Type=oneshot\n")
-            file.write("ExecStart=/bin/bash -c '/root/create_ap.sh; /root/firewall.sh'\n")
-            file.write("RemainAfterExit=No\n\n")
-            file.write("[Install]\n")
-            file.write("WantedBy=multi-user.target\n")
-
-    except IOError as e:
-        if verbose:
-            print(f"    Failed to write to {filename}: {str(e)}")
-        return False
-
-    #step 1c Change file metadata (permissions and attributes)
-    if verbose:
-        print(" "*4+"\x1b[34m[?]\x1b[0m Created file: \x1b[100m"+filename+"\x1b[0m")
-    os.chmod(filename, 0o744)  # Make the script executable by the owner only
-
-    if not safe_lock(filename, verbose):
-        return False
+        status, written = write_config('/etc/systemd/system/ap_setup.service',
+            "[Unit]\n"
+            "Description=Setup AP at boot after network and hostapd are ready\n"
+            "After=network.target\n\n"
+            "\n"
+            "[Service]\n"
+            "Type=oneshot\n"
+            "ExecStart=/bin/bash -c '/root/create_ap.sh; /root/firewall.sh'\n"
+            "RemainAfterExit=No\n\n"
+            "[Install]\n"
+            "WantedBy=multi-user.target\n",
+            0o744, verbose)
+        if not status:
+            return False
+        changed = changed or written
 
-    commands = [
-        ["sudo", "systemctl", "daemon-reload"],
-        ["sudo", "systemctl", "enable", "ap_setup.service"],
-        ["sudo", "systemctl", "start", "ap_setup.service"]
-    ]
-    for command in commands:
-        try:
-            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            if verbose:
-                if result.returncode == 0:
-                    print(" "*4+"\x1b[32m[+]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-                else:
-                    print(" "*4+"\x1b[31m[!]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-        except subprocess.CalledProcessError as e:
-            if verbose:
-                print(" "*4+f"\x1b[41m[!] Error executing command\033[0m:\n"+" "*4+f"\x1b[35m{' '.join(command)}\033[0m\n    Error: {str(e)}")
+    if not changed:
+        # Starting the service again would restart hostapd and dnsmasq
+        return True
+    runner.run_steps([
+        runner.Step('daemon_reload', ["sudo", "systemctl", "daemon-reload"]),
+        runner.Step('enable', ["sudo", "systemctl", "enable", "ap_setup.service"], after=['daemon_reload']),
+        runner.Step('start', ["sudo", "systemctl", "start", "ap_setup.service"], after=['enable'])
+    ], verbose=verbose)
     return True
 
 def persistence_remove(verbose = False):
@@ -673,22 +885,10 @@ def persistence_remove(verbose = False):
         False if failure
     '''
     # Stop and disable the service, before removing the associated files
-    commands = [
-        ["sudo", "systemctl", "stop", "ap_setup.service"],
-        ["sudo", "systemctl", "disable", "ap_setup.service"]
-    ]      
-    
-    for command in commands:
-        try:
-            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            if verbose:
-                if result.returncode == 0:
-                    print(" "*4+"\x1b[32m[+]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-                else:
-                    print(" "*4+"\x1b[31m[!]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-        except subprocess.CalledProcessError as e:
-            if verbose:
-                print(" "*4+f"\x1b[41m[!] Error executing command\033[0m:\n"+" "*4+f"\x1b[35m{' '.join(command)}\033[0m\n    Error: {str(e)}")
+    runner.run_steps([
+        runner.Step('stop', ["sudo", "systemctl", "stop", "ap_setup.service"]),
+        runner.Step('disable', ["sudo", "systemctl", "disable", "ap_setup.service"])
+    ], verbose=verbose)
 
     # Delete associated files used in persistence
     persistence_files = ['/root/firewall.sh', '/root/create_ap.sh', '/etc/systemd/system/ap_setup.service']
@@ -696,22 +896,10 @@ def persistence_remove(verbose = False):
         safe_delete(filename, verbose)
 
     #reload systemd
-    commands = [
-        ["sudo", "systemctl", "daemon-reload"],
-        ["sudo", "systemctl", "reset-failed"]
-    ]
-
-    for command in commands:
-        try:
-            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            if verbose:
-                if result.returncode == 0:
-                    print(" "*4+"\x1b[32m[+]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-                else:
-                    print(" "*4+"\x1b[31m[!]\033[0m "+f"\x1b[35m{' '.join(command)}\033[0m")
-        except subprocess.CalledProcessError as e:
-            if verbose:
-                print(" "*4+f"\x1b[41m[!] Error executing command\033[0m:\n"+" "*4+f"\x1b[35m{' '.join(command)}\033[0m\n    Error: {str(e)}")
+    runner.run_steps([
+        runner.Step('daemon_reload', ["sudo", "systemctl", "daemon-reload"]),
+        runner.Step('reset_failed', ["sudo", "systemctl", "reset-failed"], after=['daemon_reload'])
+    ], verbose=verbose)
     return True
     ## WARNING, UNKNOWN IF IPTABLE RULES PERSIST AFTER REBOOT
     ## IF THAT IS THE CASE, A 'sudo iptables -F' COMMAND
@@ -750,133 +938,286 @@ def is_valid_ip_address(ip=''):
     return pattern.match(ip) is not None
 
 
-def is_valid_range(range_from='', range_to=''):
+def prefix_length(netmask=None):
     '''
     Purpose
-        Determine if an ip range is valid
+        Parse a netmask, either dotted ('255.255.252.0')
+        or a prefix length ('22' or '/22')
     Return
-        True if valid
-        False if not valid
+        The prefix length, or None if netmask is not valid
     '''
-    acceptable_range = True
-    if range_from != None and range_to != None:
-        try:
-            ip_from = ipaddress.IPv4Address(range_from)
-            ip_to = ipaddress.IPv4Address(range_to)
-            if ip_from.packed[:3] != ip_to.packed[:3]:
-                acceptable_range = False
-                # Not the same /24 subnet (i.e. the first 3 octets are different)
-            else:
-                if int(ip_to) - int(ip_from)+1 < 5:
-                    # Insufficient range space 
-                    acceptable_range = False
-                else:
-                    # Acceptable range
-                    pass
+    try:
+        return ipaddress.IPv4Network('0.0.0.0/'+str(netmask).strip().lstrip('/')).prefixlen
+    except ValueError:
+        return None
 
-        except Exception as e:
-            acceptable_range = False
 
+def pool_network(range_from='', range_to='', netmask=None):
+    '''
+    Purpose
+        The network holding the DHCP pool range_from-range_to.
+        Without netmask, the smallest network holding both ends,
+        but never smaller than a /24.
+    Return
+        (network, prefix), the network as an integer,
+        or None if the range does not fit in one network
+        between MIN_PREFIX and MAX_PREFIX
+    '''
+    try:
+        start = int(ipaddress.IPv4Address(range_from))
+        end = int(ipaddress.IPv4Address(range_to))
+    except ValueError:
+        return None
+    if netmask != None:
+        prefix = prefix_length(netmask)
+        if prefix == None:
+            return None
     else:
-        acceptable_range = False
-        print(acceptable_range)
+        # Bits the two ends have in common
+        prefix = min(DEFAULT_PREFIX, 32 - (start ^ end).bit_length())
+    if not (MIN_PREFIX <= prefix <= MAX_PREFIX):
+        return None
+    mask = (0xffffffff << (32 - prefix)) & 0xffffffff
+    if start & mask != end & mask:
+        return None
+    return start & mask, prefix
+
 
-    return acceptable_range
+def is_valid_range(range_from='', range_to='', netmask=None):
+    '''
+    Purpose
+        Determine if an ip range is valid:
+        - Both ends within one network (see pool_network)
+        - At least 5 addresses
+        - An address left outside the pool for the AP itself
+    Return
+        True if valid
+        False if not valid
+    '''
+    if range_from == None or range_to == None:
+        return False
+    if pool_network(range_from, range_to, netmask) == None:
+        return False
+    if int(ipaddress.IPv4Address(range_to)) - int(ipaddress.IPv4Address(range_from)) + 1 < 5:
+        # Insufficient range space
+        return False
+    return find_usable_ip(range_from, range_to, netmask=netmask) != None
 
 
-def retrieve_ip_from_conf(verbose = False):
+def retrieve_ip_from_conf(verbose = False, filename = '/etc/dnsmasq.conf'):
     '''
     Purpose
         Read '/etc/dnsmasq.conf' and extract
         the range.
+    Return
+        The IP of the AP, see find_usable_ip
+        False if the file does not exist
+    '''
+    address = address_from_conf(verbose, filename)
+    if address == None or address == False:
+        return address
+    return address[0]
+
+
+def address_from_conf(verbose = False, filename = '/etc/dnsmasq.conf'):
+    '''
+    Purpose
+        The address of the AP, derived from the
+        range (and netmask) of '/etc/dnsmasq.conf'
+    Return
+        (ip, prefix length), None if there is no usable range
+        False if the file does not exist
     '''
-    filename = '/etc/dnsmasq.conf'
-    if not os.path.exists(filename):
+    if not backend.get_backend().exists(filename):
         # File does not exist
         return False
-    range_from = None
-    range_to = None
-
-    try:
-        with open(filename, "r") as file:
-            for line in file:
-                if line.startswith("dhcp-range"):
-                    parts = line.strip().split("=")
-                    if len(parts) == 2:
-                        ip_range = parts[1].split(",")
-                        if len(ip_range) == 3:
-                            range_from = ip_range[0]
-                            range_to = ip_range[1]
-                            break  # Stop searching after finding the first dhcp-range
-    except Exception as e:
-        print(f"Error: {e}")
-    if range_from != None and range_to != None:
-        return find_usable_ip(range_from, range_to)
-    return None
+    conf = read_dnsmasq_conf(filename)
+    if conf == None:
+        return None
+    settings = conf[0]
+    if settings['range_from'] == None or settings['range_to'] == None:
+        return None
+    ip = find_usable_ip(settings['range_from'], settings['range_to'], verbose, settings['netmask'])
+    if ip == None:
+        return None
+    return ip, pool_network(settings['range_from'], settings['range_to'], settings['netmask'])[1]
 
 
-def find_usable_ip(range_from ='', range_to='', verbose=False):
+def find_usable_ip(range_from ='', range_to='', verbose=False, netmask=None):
     '''
     Purpose
         Find a usable IP which the interface
-        can use, in order to setup the AP
-        Requires a range_from, range_to
+        can use, in order to setup the AP.
+        The IP is never part of the pool: the first host of the
+        network if the pool starts above it, otherwise the last
+        host if the pool ends below it.
+    Return
+        The IP, or None if the pool leaves no room for it
     '''
-    # Convert start and end IP from string to IPv4Address objects
-    start = ipaddress.IPv4Address(range_from)
-    end = ipaddress.IPv4Address(range_to)
-    
-    # Calculate networks from the range and capture them in a list
-    networks = list(ipaddress.summarize_address_range(start, end))
-    
-    if not networks:
-        return None  # Return None if no network can be summarized
-
-    # Use the first network (smallest subnet that fits the range)
-    network = networks[0]
-    
-    # Get all usable hosts in this network
-    usable_hosts = list(network.hosts())
-    
-    # Select a usable IP
-    if usable_hosts:
-        return str(usable_hosts[-1])  # You can choose another strategy for selecting the IP
-    else:
+    network = pool_network(range_from, range_to, netmask)
+    if network == None:
         return None
+    network, prefix = network
+    start = int(ipaddress.IPv4Address(range_from))
+    end = int(ipaddress.IPv4Address(range_to))
+    broadcast = network | (0xffffffff >> prefix)
+    if start > network + 1:
+        return str(ipaddress.IPv4Address(network + 1))
+    if end < broadcast - 1:
+        return str(ipaddress.IPv4Address(broadcast - 1))
+    return None
 
 
-def update_dnsmasq(settings = {}, wifiname='', verbose=False, filename='/etc/dnsmasq.conf'):
+def render_dnsmasq(settings = {}, wifiname=''):
     '''
     Purpose
-        Update the /etc/dnsmasq.conf file 
+        The content of the /etc/dnsmasq.conf file
     '''
-    if not safe_delete(filename, verbose):
-        return False
+    # dnsmasq takes the netmask of the interface, unless told otherwise
+    netmask = ''
+    if settings.get('netmask') != None:
+        prefix = prefix_length(settings['netmask'])
+        netmask = str(ipaddress.IPv4Network(f"0.0.0.0/{prefix}").netmask)+","
+    return (
+        f"interface={wifiname}\n"
+        "bind-dynamic\n"
+        "domain-needed\n"
+        "bogus-priv\n"
+        f"dhcp-range={settings['range_from']},{settings['range_to']},{netmask}12h\n"
+        "no-resolv\n"
+    )
+
+
+def render_hostapd(settings = {}, wifiname = '', ap_type=''):
+    '''
+    Purpose
+        The content of the /etc/hostapd/hostapd.conf file
+    Return
+        The content, or None if the ap_type is unknown
+    '''
+    if ap_type.lower() == 'none':
+        return (
+            "driver=nl80211\n"
+            f"ctrl_interface={HOSTAPD_CTRL}\n"
+            f"channel={settings['channel']}\n"
+            f"interface={wifiname}\n"
+            f"ssid={settings['ssid']}\n"
+        )
+    elif ap_type.lower() == 'wpa1':
+        return (
+            f"interface={wifiname}\n"
+            'driver=nl80211\n'
+            f"ctrl_interface={HOSTAPD_CTRL}\n"
+            f"ssid={settings['ssid']}\n"
+            'hw_mode=g\n'
+            f"channel={settings['channel']}\n"
+            'wme_enabled=1\n'
+            'ieee80211n=1\n'
+            'macaddr_acl=0\n'
+            'auth_algs=1\n'
+            'ignore_broadcast_ssid=0\n'
+            'wpa=3\n'
+            f"wpa_passphrase={settings['password']}\n"
+            'wpa_key_mgmt=WPA-PSK\n'
+            'wpa_pairwise=TKIP\n'
+            'rsn_pairwise=CCMP\n'
+        )
+    elif ap_type.lower() == 'wpa2':
+        return (
+            f"interface={wifiname}\n"
+            'driver=nl80211\n'
+            f"ctrl_interface={HOSTAPD_CTRL}\n"
+            f"ssid={settings['ssid']}\n"
+            'hw_mode=g\n'
+            f"channel={settings['channel']}\n"
+            'ieee80211n=1\n'
+            'ieee80211ac=1\n'
+            'wmm_enabled=1\n'
+            'auth_algs=1\n'
+            'wpa=2\n'
+            'wpa_key_mgmt=WPA-PSK\n'
+            'wpa_pairwise=CCMP\n'
+            f"wpa_passphrase={settings['password']}\n"
+        )
+    #This is where ap expansions would be
+    return None
 
 
+def _conf_values(filename=''):
+    '''
+    Purpose
+        Read a key=value configuration file
+    Return
+        (content, dictionary of the first value of every key)
+        or (None, None) if the file cannot be read
+    '''
     try:
-        #This will create the file
-        with open(filename, 'w') as file:
-            file.write(f"interface={wifiname}\n")
-            file.write("bind-dynamic\n")
-            file.write("domain-needed\n")
-            file.write("bogus-priv\n")
-            file.write(f"dhcp-range={settings['range_from']},{settings['range_to']},12h\n")
-            file.write("no-resolv\n")
-    except IOError as e:
-        if verbose:
-            print(f"    Failed to write to {filename}:\n    {str(e)}")
-        return False
-    try:
-        subprocess.run(['sudo', 'chattr', '+i', filename], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    except subprocess.CalledProcessError as e:
-        if verbose:
-            print(""*4+f"Failed to add immutable flag to {filename}:\n    {str(e)}")
-    if verbose:
-            print(" "*4+"\x1b[34m[?]\x1b[0m Created file: \x1b[100m"+filename+"\x1b[0m")
-    safe_lock(filename, verbose)
+        with open(backend.get_backend().path(filename), 'r') as file:
+            content = file.read()
+    except (OSError, UnicodeDecodeError):
+        return None, None
+    return content, _parse_conf(content)
+
+
+def _parse_conf(content=''):
+    '''
+    Return
+        Dictionary of the first value of every key in content
+    '''
+    values = {}
+    for line in content.splitlines():
+        key, separator, value = line.partition('=')
+        if separator and key.strip() not in values:
+            values[key.strip()] = value.strip()
+    return values
 
-    return True
+
+def read_dnsmasq_conf(filename='/etc/dnsmasq.conf'):
+    '''
+    Purpose
+        Recover the settings render_dnsmasq was called with
+    Return
+        (settings, wifiname, content) or None if the file cannot be read
+    '''
+    content, values = _conf_values(filename)
+    if content == None:
+        return None
+    settings = {'range_from': None, 'range_to': None, 'netmask': None}
+    ip_range = values.get('dhcp-range', '').split(',')
+    if len(ip_range) in (3, 4):
+        settings['range_from'] = ip_range[0]
+        settings['range_to'] = ip_range[1]
+    if len(ip_range) == 4:
+        settings['netmask'] = ip_range[2]
+    return settings, values.get('interface'), content
+
+
+def read_hostapd_conf(filename='/etc/hostapd/hostapd.conf'):
+    '''
+    Purpose
+        Recover the settings render_hostapd was called with
+    Return
+        (settings, wifiname, ap_type, content) or None if the file cannot be read
+    '''
+    content, values = _conf_values(filename)
+    if content == None:
+        return None
+    ap_type = {'2': 'wpa2', '3': 'wpa1'}.get(values.get('wpa'), 'none')
+    settings = {
+        'ssid': values.get('ssid'),
+        'channel': values.get('channel'),
+        'password': values.get('wpa_passphrase')
+    }
+    return settings, values.get('interface'), ap_type, content
+
+
+def update_dnsmasq(settings = {}, wifiname='', verbose=False, filename='/etc/dnsmasq.conf'):
+    '''
+    Purpose
+        Update the /etc/dnsmasq.conf file 
+    '''
+    status, _ = write_config(filename, render_dnsmasq(settings, wifiname), None, verbose)
+    return status
 
 
 def update_hostapd(settings = {}, wifiname = '', ap_type='', verbose=False, filename = '/etc/hostapd/hostapd.conf'):
@@ -884,59 +1225,76 @@ def update_hostapd(settings = {}, wifiname = '', ap_type='', verbose=False, file
     Purpose
         Update the /etc/hostapd/hostapd.conf file 
     '''
-    if not safe_delete(filename, verbose):
-        return False
-    try:
-        #This will create the file
-        with open(filename, 'w') as file:
-            if ap_type.lower() == 'none':
-                file.write("driver=nl80211\n")
-                file.write(f"channel={settings['channel']}\n")
-                file.write(f"interface={wifiname}\n")
-                file.write(f"ssid={settings['ssid']}\n")
-            elif ap_type.lower() == 'wpa1':
-                file.write(f"interface={wifiname}\n")
-                file.write('driver=nl80211\n')
-                file.write(f"ssid={settings['ssid']}\n")
-                file.write('hw_mode=g\n')
-                file.write(f"channel={settings['channel']}\n")
-                file.write('wme_enabled=1\n')
-                file.write('ieee80211n=1\n')
-                file.write('macaddr_acl=0\n')
-                file.write('auth_algs=1\n')
-                file.write('ignore_broadcast_ssid=0\n')
-                file.write('wpa=3\n')
-                file.write(f"wpa_passphrase={settings['password']}\n")
-                file.write('wpa_key_mgmt=WPA-PSK\n')
-                file.write('wpa_pairwise=TKIP\n')
-                file.write('rsn_pairwise=CCMP\n')
-            elif ap_type.lower() == 'wpa2':
-                file.write(f"interface={wifiname}\n")
-                file.write('driver=nl80211\n')
-                file.write(f"ssid={settings['ssid']}\n")
-                file.write('hw_mode=g\n')
-                file.write(f"channel={settings['channel']}\n")
-                file.write('ieee80211n=1\n')
-                file.write('ieee80211ac=1\n')
-                file.write('wmm_enabled=1\n')
-                file.write('auth_algs=1\n')
-                file.write('wpa=2\n')
-                file.write('wpa_key_mgmt=WPA-PSK\n')
-                file.write('wpa_pairwise=CCMP\n')
-                file.write(f"wpa_passphrase={settings['password']}\n")
-            else:
-                #This is where ap expansions would be
-                print("Something went wrong\nIf the code ever executes this line, terminating program")
-                exit(1)
-    except IOError as e:
-        if verbose:
-            print(f"    Failed to write to {filename}:\n    {str(e)}")
-        return False
-    safe_lock(filename, verbose)
-    if verbose:
-        print(" "*4+"\x1b[34m[?]\x1b[0m Created file: \x1b[100m"+filename+"\x1b[0m")
+    content = render_hostapd(settings, wifiname, ap_type)
+    if content == None:
+        #This is where ap expansions would be
+        print("Something went wrong\nIf the code ever executes this line, terminating program")
+        exit(1)
+    status, _ = write_config(filename, content, None, verbose)
+    return status
 
-    return True
+
+def pending_changes(ip='', wifiname='', settings={}, dnsmasq_file='/etc/dnsmasq.conf', hostapd_file='/etc/hostapd/hostapd.conf'):
+    '''
+    Purpose:
+        Compare the AP described by settings with the running one,
+        so that only what differs is applied.
+        The live state is read with a few concurrent commands.
+    Return:
+        Dictionary with
+        'dnsmasq', 'hostapd': The rendered file differs from the one on disk
+        'mac'     : The MAC address of wifiname has to change
+        'firewall': The firewall is not (completely) in place
+        'address' : wifiname does not have the ip
+        'restart' : The services to restart, because they are not running,
+                    or because what changed is only read at start
+        'reload'  : The running services to reload in place (hostapd)
+        'live'    : The hostapd.conf values to change on the running
+                    hostapd instead, if only HOSTAPD_LIVE_KEYS changed
+    '''
+    ap_type = (settings['encryption'] or '').lower()
+    hostapd_content = render_hostapd(settings, wifiname, ap_type) or ''
+    changes = {
+        'dnsmasq': file_changed(dnsmasq_file, render_dnsmasq(settings, wifiname)),
+        'hostapd': file_changed(hostapd_file, hostapd_content)
+    }
+    probes = runner.run_steps([
+        runner.Step('link', ['ip', '-o', 'link', 'show', 'dev', wifiname]),
+        runner.Step('address', ['ip', '-4', '-o', 'addr', 'show', 'dev', wifiname]),
+        runner.Step('services', ['systemctl', 'is-active', 'hostapd', 'dnsmasq'])
+    ])
+    link, address, services = probes
+    mac = settings.get('mac_address')
+    changes['mac'] = (is_valid_mac_address(mac)
+        and f"link/ether {mac.lower().replace('-', ':')} " not in link.stdout.lower())
+    changes['firewall'] = not firewall_status(wifiname)[0]
+    network = pool_network(settings['range_from'], settings['range_to'], settings.get('netmask'))
+    prefix = network[1] if network != None else DEFAULT_PREFIX
+    changes['address'] = f" {ip}/{prefix} " not in address.stdout
+    active = dict(zip(['hostapd', 'dnsmasq'], services.stdout.split()))
+
+    # Bringing the link down, for the MAC or the address, stops the AP
+    link_down = changes['mac'] or changes['address']
+    changes['restart'] = []
+    changes['reload'] = []
+    changes['live'] = {}
+    if link_down or active.get('hostapd') != 'active':
+        changes['restart'].append('hostapd')
+    elif changes['hostapd']:
+        _, current = _conf_values(hostapd_file)
+        wanted = _parse_conf(hostapd_content)
+        differ = [key for key in set(wanted) | set(current or {}) if (current or {}).get(key) != wanted.get(key)]
+        if current == None or any(key in HOSTAPD_RESTART_KEYS for key in differ):
+            changes['restart'].append('hostapd')
+        else:
+            changes['reload'].append('hostapd')
+            if all(key in HOSTAPD_LIVE_KEYS for key in differ):
+                changes['live'] = {key: wanted[key] for key in differ}
+    # dnsmasq.conf is only read at start, which SIGHUP does not change,
+    # and bind-dynamic follows a new address on its own
+    if changes['dnsmasq'] or active.get('dnsmasq') != 'active':
+        changes['restart'].append('dnsmasq')
+    return changes
 
 
 def update_ap(settings={}, wifiname='', verbose=False):
@@ -951,31 +1309,435 @@ def update_ap(settings={}, wifiname='', verbose=False):
         - Execute commands to activate the AP
     '''
 
-    # Updating mac_address / Easy to do
-    if change_mac(wifiname, settings['mac_address'], verbose):
-        # mac change was successfull
-        pass
-    else:
-        # mac change was unsuccessfull
-        pass
+    # Only what differs from the running AP is applied,
+    # re-applying the same settings leaves the clients connected
+    ip = find_usable_ip(settings['range_from'], settings['range_to'], netmask=settings.get('netmask'))
+    prefix = pool_network(settings['range_from'], settings['range_to'], settings.get('netmask'))[1]
+    changes = pending_changes(ip, wifiname, settings)
 
-    status = update_dnsmasq(settings, wifiname, verbose)
-    if status == False: 
-        return status
-    # Note: The verification that the settings['encryption']
-    # is valid, i.e. != None or 'none' or 'wpa1' has been clarified at this stage
-    status = update_hostapd(settings, wifiname, settings['encryption'].lower(), verbose)
-    if status == False: 
-            return status
-    ip = find_usable_ip(settings['range_from'], settings['range_to'])
-    status = create_isolation(ip, wifiname, verbose)
+    # Updating mac_address / Easy to do
+    if changes['mac']:
+        change_mac(wifiname, settings['mac_address'], verbose)
+
+    # i.e. a new channel, hostapd.conf is still rewritten for the next start
+    if changes['live'] and apply_live(wifiname, changes['live'], verbose):
+        changes['reload'].remove('hostapd')
+
+    # The directories are flushed once, after both files
+    with backend.get_backend().batch():
+        if changes['dnsmasq']:
+            status = update_dnsmasq(settings, wifiname, verbose)
+            if status == False: 
+                return status
+        # Note: The verification that the settings['encryption']
+        # is valid, i.e. != None or 'none' or 'wpa1' has been clarified at this stage
+        if changes['hostapd']:
+            status = update_hostapd(settings, wifiname, settings['encryption'].lower(), verbose)
+            if status == False: 
+                return status
+    status = create_isolation(ip, wifiname, verbose, changes, prefix)
     if status == False: 
             return status
     
     if settings['persistence'] == None:
         return status
     if settings['persistence'].lower() == 'yes':
-        status = persistence_create(ip, wifiname, settings['mac_address'], verbose)
+        status = persistence_create(ip, wifiname, settings['mac_address'], verbose, prefix)
+    if status == False:
+        print(" "*4+"Creation of persistence failed")
+    elif status == True:
+        print(" "*4+"Successfully created files for persistence")
+    return status
+
+
+######### Multiple radios
+
+# Read from the [Settings] section, unless the radio section sets them
+RADIO_INHERITED = ('ssid', 'encryption', 'password', 'channel', 'persistence')
+HOSTAPD_RADIO_FILE = '/etc/hostapd/{}.conf'
+# [bss:wlan0_1] adds the SSID of the virtual interface wlan0_1 to the radio wlan0
+BSS_SECTION = 'bss:'
+# Per radio in hostapd.conf, a bss= block must not repeat them
+HOSTAPD_RADIO_KEYS = ('interface', 'driver', 'ctrl_interface', 'hw_mode', 'channel',
+    'ieee80211n', 'ieee80211ac')
+
+
+def _is_valid_interface_name(name=''):
+    # At most 15 characters (IFNAMSIZ), no '/' or whitespace
+    return re.fullmatch(r'[A-Za-z0-9_.-]{1,15}', name) != None
+
+
+def radio_interfaces(radios={}):
+    '''
+    Return:
+        List of (interface, settings) of every radio,
+        each followed by its virtual BSS interfaces
+    '''
+    found = []
+    for wifiname, settings in radios.items():
+        found.append((wifiname, settings))
+        found.extend(settings.get('bss', {}).items())
+    return found
+
+
+def render_bss(settings={}, vif='', ap_type=''):
+    '''
+    Purpose
+        The bss= block of an additional SSID, appended to the
+        hostapd.conf of its radio. hostapd creates the virtual
+        interface vif, with the MAC address of settings as BSSID.
+    Return
+        The block, or None if the ap_type is unknown
+    '''
+    content = render_hostapd(settings, vif, ap_type)
+    if content == None:
+        return None
+    block = f"\nbss={vif}\n"
+    if is_valid_mac_address(settings['mac_address']):
+        block += f"bssid={settings['mac_address'].lower().replace('-', ':')}\n"
+    for line in content.splitlines(keepends=True):
+        if line.partition('=')[0] not in HOSTAPD_RADIO_KEYS:
+            block += line
+    return block
+
+
+def render_hostapd_radio(settings={}, wifiname=''):
+    '''
+    Purpose
+        The content of /etc/hostapd/<interface>.conf of a radio,
+        followed by the bss= block of each of its BSS interfaces
+    '''
+    content = render_hostapd(settings, wifiname, settings['encryption'].lower())
+    for vif, bss in settings.get('bss', {}).items():
+        content += render_bss(bss, vif, bss['encryption'].lower())
+    return content
+
+def _networks_overlap(first, second):
+    # (network, prefix) pairs, the shorter prefix decides
+    prefix = min(first[1], second[1])
+    mask = (0xffffffff << (32 - prefix)) & 0xffffffff
+    return first[0] & mask == second[0] & mask
+
+
+def allocate_pools(radios={}):
+    '''
+    Purpose:
+        Give every radio without a DHCP pool one of its own,
+        10.10.N.100-10.10.N.255 with the lowest N from 10 on
+        which is free
+    Return:
+        False if the pools of the radios overlap, True otherwise
+    '''
+    taken = []
+    for settings in radios.values():
+        if settings['range_from'] != None:
+            network = pool_network(settings['range_from'], settings['range_to'], settings.get('netmask'))
+            if any(_networks_overlap(network, other) for other in taken):
+                return False
+            taken.append(network)
+    third = 10
+    for settings in radios.values():
+        if settings['range_from'] != None:
+            continue
+        while any(_networks_overlap(pool_network(f"10.10.{third}.100", f"10.10.{third}.255"), other) for other in taken):
+            third += 1
+        settings['range_from'] = f"10.10.{third}.100"
+        settings['range_to'] = f"10.10.{third}.255"
+        settings['netmask'] = None
+        taken.append(pool_network(settings['range_from'], settings['range_to']))
+    return True
+
+
+def _ini_section(config, name='', inherited=()):
+    # The settings of a section, inherited keys falling back to [Settings]
+    settings = dict.fromkeys(['ssid', 'mac_address', 'encryption', 'password',
+        'range_from', 'range_to', 'netmask', 'channel', 'persistence'])
+    for key in settings:
+        if key in config[name]:
+            settings[key] = config[name][key]
+        elif key in inherited and key in config['Settings']:
+            settings[key] = config['Settings'][key]
+    return settings
+
+
+def _ini_verify(settings={}, label='', verbose=False):
+    # Populated settings, or None if the AP type or the pool are invalid
+    if determine_ini_ap_type(settings, verbose) == None:
+        print(" "*22+f"{label}: unable to determine the AP type")
+        return None
+    explicit = settings['range_from'] != None or settings['range_to'] != None
+    if explicit and not is_valid_range(settings['range_from'], settings['range_to'], settings['netmask']):
+        print(" "*22+f"{label}: invalid DHCP pool")
+        return None
+    settings = ini_populate(settings, verbose)
+    if not explicit:
+        # Left to allocate_pools, rather than the default pool of every radio
+        settings.update({'range_from': None, 'range_to': None, 'netmask': None})
+    return settings
+
+
+def ini_radios(file_path='', verbose=False):
+    '''
+    Purpose:
+        Read the radio sections of a .ini file, every section
+        besides [Settings] being named after a wireless interface:
+
+        [Settings]
+        encryption = wpa2
+        password = ...
+        [wlan0]
+        ssid = Lab-A
+        [wlan1]
+        ssid = Lab-B
+        range_from = 10.10.20.100
+        range_to = 10.10.20.200
+
+        A radio takes RADIO_INHERITED from [Settings], but never
+        the DHCP pool or the MAC address, its pool is allocated
+        if it has none (see allocate_pools).
+
+        [bss:<interface>] sections add SSIDs to a radio (see BSS_SECTION)
+    Return:
+        Dictionary mapping every interface to its populated settings,
+        empty without radio sections (a single AP, from [Settings]),
+        None if a radio is not valid or the pools overlap
+    '''
+    config = configparser.ConfigParser()
+    try:
+        with open(file_path, 'r') as f:
+            config.read_file(f)
+    except (OSError, configparser.Error) as e:
+        print(" "*22+f"Warning: Failed to read the config file: {str(e)}")
+        return None
+    if 'Settings' not in config:
+        return None
+    radios = {}
+    extra = {}
+    for name in config.sections():
+        if name == 'Settings':
+            continue
+        if name.startswith(BSS_SECTION):
+            extra[name[len(BSS_SECTION):]] = name
+            continue
+        radios[name] = _ini_verify(_ini_section(config, name, RADIO_INHERITED), f"Radio {name}", verbose)
+        if radios[name] == None:
+            return None
+
+    for vif, name in extra.items():
+        radio = config[name].get('radio', vif.rpartition('_')[0])
+        if not _is_valid_interface_name(vif) or vif in radios or radio == '':
+            print(" "*22+f"BSS {vif}: invalid interface name")
+            return None
+        if radio not in radios:
+            if len(radios) > 0:
+                print(" "*22+f"BSS {vif}: no radio section [{radio}]")
+                return None
+            # A single radio, [Settings] being its first SSID
+            radios[radio] = _ini_verify(_ini_section(config, 'Settings'), f"Radio {radio}", verbose)
+            if radios[radio] == None:
+                return None
+        # Nothing is inherited, every SSID has its own security
+        settings = _ini_verify(_ini_section(config, name), f"BSS {vif}", verbose)
+        if settings == None:
+            return None
+        radios[radio].setdefault('bss', {})[vif] = settings
+
+    if not allocate_pools(dict(radio_interfaces(radios))):
+        print(" "*22+"The DHCP pools of the radios overlap")
+        return None
+    return radios
+
+
+def render_dnsmasq_radios(radios={}):
+    '''
+    Purpose
+        The content of the /etc/dnsmasq.conf file, one interface
+        block per radio and per BSS interface. dnsmasq picks the
+        dhcp-range matching the subnet of the interface a request
+        arrives on.
+    '''
+    content = (
+        "bind-dynamic\n"
+        "domain-needed\n"
+        "bogus-priv\n"
+        "no-resolv\n"
+    )
+    for wifiname, settings in radio_interfaces(radios):
+        block = render_dnsmasq(settings, wifiname).splitlines(keepends=True)
+        content += f"\n# {wifiname}\n"
+        content += ''.join(line for line in block if line.startswith(('interface=', 'dhcp-range=')))
+    return content
+
+
+def pending_radio_changes(radios={}, addresses={}, dnsmasq_file='/etc/dnsmasq.conf'):
+    '''
+    Purpose:
+        pending_changes for update_radios, comparing every radio
+        and BSS interface with the running ones.
+        The live state is read with a few concurrent commands.
+        addresses maps every interface to its (ip, prefix)
+    Return:
+        Dictionary with
+        'dnsmasq' : The rendered dnsmasq.conf differs from the one on disk
+        'hostapd' : The radios whose /etc/hostapd/<interface>.conf differs
+        'mac'     : The radios whose MAC address has to change
+        'address' : The interfaces without their ip
+        'firewall': The firewall is not (completely) in place
+        'stop'    : The single AP hostapd may be running, it has to stop
+        'restart' : The services to restart, hostapd@<interface> and dnsmasq
+    '''
+    names = [name for name, _ in radio_interfaces(radios)]
+    units = ['hostapd'] + ['hostapd@'+wifiname for wifiname in radios] + ['dnsmasq']
+    changes = {
+        'dnsmasq': file_changed(dnsmasq_file, render_dnsmasq_radios(radios)),
+        'hostapd': [wifiname for wifiname, settings in radios.items()
+            if file_changed(HOSTAPD_RADIO_FILE.format(wifiname), render_hostapd_radio(settings, wifiname))]
+    }
+    steps = [runner.Step('services', ['systemctl', 'is-active'] + units)]
+    steps += [runner.Step(wifiname+':link', ['ip', '-o', 'link', 'show', 'dev', wifiname]) for wifiname in radios]
+    steps += [runner.Step(name+':address', ['ip', '-4', '-o', 'addr', 'show', 'dev', name]) for name in names]
+    probes = {result.name: result for result in runner.run_steps(steps)}
+    active = dict(zip(units, probes['services'].stdout.split()))
+    changes['mac'] = [wifiname for wifiname, settings in radios.items()
+        if is_valid_mac_address(settings['mac_address'])
+        and f"link/ether {settings['mac_address'].lower().replace('-', ':')} " not in probes[wifiname+':link'].stdout.lower()]
+    changes['address'] = [name for name in names
+        if f" {addresses[name][0]}/{addresses[name][1]} " not in probes[name+':address'].stdout]
+    changes['firewall'] = not firewall_status(names)[0]
+    changes['stop'] = active.get('hostapd') not in ('inactive', 'failed')
+
+    # Bringing the link down, for the MAC or the address, stops the AP.
+    # hostapd@<interface> restarts on a changed file, which holds the BSS.
+    changes['restart'] = [
+        'hostapd@'+wifiname for wifiname in radios
+        if wifiname in changes['mac'] + changes['address'] + changes['hostapd']
+        or active.get('hostapd@'+wifiname) != 'active'
+    ]
+    # bind-dynamic follows new addresses and BSS interfaces
+    if changes['dnsmasq'] or active.get('dnsmasq') != 'active':
+        changes['restart'].append('dnsmasq')
+    return changes
+
+
+def radio_steps(radios={}, addresses={}, changes=None):
+    '''
+    Purpose:
+        The steps bringing up every radio at once.
+        The firewall goes first, then every radio runs its own
+        chain (MAC address, IP address, hostapd@<interface>),
+        the BSS interfaces get their address once hostapd created
+        them, dnsmasq restarts once every address is in place.
+        addresses maps every interface to its (ip, prefix).
+        changes (see pending_radio_changes) limits the steps to
+        what differs, everything is applied if None.
+    '''
+    names = [name for name, _ in radio_interfaces(radios)]
+    if changes == None:
+        changes = {'firewall': True, 'stop': True, 'mac': list(radios), 'address': names,
+            'restart': ['hostapd@'+wifiname for wifiname in radios] + ['dnsmasq']}
+    steps = []
+    gate = []
+    if changes['firewall']:
+        command, content = firewall.backend().apply(names)
+        steps.append(runner.Step('firewall', command, input=content))
+        gate = ['firewall']
+    airmon = []
+    if any(wifiname in changes['mac'] + changes['address'] for wifiname in radios):
+        steps.append(runner.Step('airmon', ["sudo", "airmon-ng", "check", "kill"], depends=gate))
+        airmon = ['airmon']
+    stop = []
+    if changes['stop']:
+        # The single AP unit would fight over the interface
+        steps.append(runner.Step('stop_hostapd', ["sudo", "systemctl", "stop", "hostapd"], depends=gate))
+        stop = ['stop_hostapd']
+    links = []
+    for wifiname, settings in radios.items():
+        service = 'hostapd@'+wifiname
+        after = list(airmon)
+        if wifiname in changes['mac']:
+            for step in mac_steps(wifiname, settings['mac_address']):
+                steps.append(runner.Step(wifiname+':'+step.name, step.command,
+                    depends=gate + [wifiname+':'+name for name in step.depends],
+                    after=after + [wifiname+':'+name for name in step.after]))
+            after = [wifiname+':mac_up']
+        if wifiname in changes['address']:
+            ip, prefix = addresses[wifiname]
+            steps += [
+                runner.Step(wifiname+':link_down', ["sudo", "ip", "link", "set", wifiname, "down"], depends=gate, after=after),
+                runner.Step(wifiname+':address', ["sudo", "ip", "addr", "add", f"{ip}/{prefix}", "dev", wifiname],
+                    depends=gate, after=[wifiname+':link_down']),
+                runner.Step(wifiname+':link_up', ["sudo", "ip", "link", "set", wifiname, "up"], depends=gate, after=[wifiname+':address'])
+            ]
+            after = [wifiname+':link_up']
+            links += after
+        restarted = service in changes['restart']
+        if restarted:
+            steps += [
+                runner.Step('unmask_'+service, ["sudo", "systemctl", "unmask", service], depends=gate),
+                runner.Step('restart_'+service, ["sudo", "systemctl", "restart", service],
+                    depends=gate, after=after+['unmask_'+service]+stop)
+            ]
+        for vif in settings.get('bss', {}):
+            if not restarted and vif not in changes['address']:
+                continue
+            ip, prefix = addresses[vif]
+            # Recreated by every restart, 'replace' also covers a kept interface
+            steps.append(runner.Step(vif+':address', ["sudo", "ip", "addr", "replace", f"{ip}/{prefix}", "dev", vif],
+                depends=gate+(['restart_'+service] if restarted else [])))
+            links.append(vif+':address')
+    if 'dnsmasq' in changes['restart']:
+        steps += [
+            runner.Step('unmask_dnsmasq', ["sudo", "systemctl", "unmask", "dnsmasq"], depends=gate),
+            runner.Step('restart_dnsmasq', ["sudo", "systemctl", "restart", "dnsmasq"], depends=gate, after=links+['unmask_dnsmasq'])
+        ]
+    return steps
+
+
+def update_radios(radios={}, verbose=False):
+    '''
+    Purpose:
+        update_ap for several radios, every one of them an AP
+        with its own hostapd@<interface> and /etc/hostapd/<interface>.conf,
+        sharing dnsmasq and the firewall.
+        Only what differs from the running radios is applied,
+        the radios to bring up are brought up concurrently.
+    Return:
+        True if the AP is up on every radio
+    '''
+    addresses = {}
+    for wifiname, settings in radio_interfaces(radios):
+        ip = find_usable_ip(settings['range_from'], settings['range_to'], netmask=settings.get('netmask'))
+        addresses[wifiname] = ip, pool_network(settings['range_from'], settings['range_to'], settings.get('netmask'))[1]
+    changes = pending_radio_changes(radios, addresses)
+
+    with backend.get_backend().batch():
+        if changes['dnsmasq']:
+            status, _ = write_config('/etc/dnsmasq.conf', render_dnsmasq_radios(radios), None, verbose)
+            if status == False:
+                return status
+        for wifiname in changes['hostapd']:
+            status, _ = write_config(HOSTAPD_RADIO_FILE.format(wifiname), render_hostapd_radio(radios[wifiname], wifiname), None, verbose)
+            if status == False:
+                return status
+
+    results = runner.run_steps(radio_steps(radios, addresses, changes), verbose=verbose)
+    for service, path, outage, ok in service_paths(results):
+        if ok:
+            print(" "*4+"\x1b[32m[+]\033[0m "+f"{service}: {path}, outage {outage:.2f}s")
+        else:
+            print(" "*4+"\x1b[31m[!]\033[0m "+f"{service}: {path} failed, outage {outage:.2f}s")
+    status = runner.succeeded(results)
+    if status == False:
+        return status
+
+    if not any((settings['persistence'] or '').lower() == 'yes' for settings in radios.values()):
+        return status
+    # The BSS interfaces have no service, hostapd@<radio> creates them
+    status = persistence_create(radios=[
+        (wifiname, addresses[wifiname][0], addresses[wifiname][1], settings['mac_address'],
+            'hostapd@'+wifiname if wifiname in radios else None)
+        for wifiname, settings in radio_interfaces(radios)
+    ], verbose=verbose)
     if status == False:
         print(" "*4+"Creation of persistence failed")
     elif status == True:
@@ -983,6 +1745,194 @@ def update_ap(settings={}, wifiname='', verbose=False):
     return status
 
 
+def read_dnsmasq_radios_conf(filename='/etc/dnsmasq.conf'):
+    '''
+    Purpose
+        Recover the pools render_dnsmasq_radios was called with
+    Return
+        (pools, content), pools mapping every interface block
+        to its range_from, range_to and netmask (None if absent),
+        or None if the file cannot be read
+    '''
+    content, _ = _conf_values(filename)
+    if content == None:
+        return None
+    pools = {}
+    interface = None
+    for line in content.splitlines():
+        key, _, value = line.partition('=')
+        key = key.strip()
+        if key == 'interface':
+            interface = value.strip()
+            pools.setdefault(interface, {'range_from': None, 'range_to': None, 'netmask': None})
+        elif key == 'dhcp-range' and interface != None and pools[interface]['range_from'] == None:
+            fields = value.strip().split(',')
+            if len(fields) not in (3, 4):
+                continue
+            pools[interface] = {'range_from': fields[0], 'range_to': fields[1],
+                'netmask': fields[2] if len(fields) == 4 else None}
+    return pools, content
+
+
+def read_hostapd_radio_conf(filename=''):
+    '''
+    Purpose
+        Recover the settings render_hostapd_radio was called with,
+        the bss= blocks under settings['bss']
+    Return
+        (settings, wifiname, content) or None if the file cannot be read
+    '''
+    content, _ = _conf_values(filename)
+    if content == None:
+        return None
+    head, *blocks = content.split('\nbss=')
+    values = _parse_conf(head)
+    settings = {
+        'ssid': values.get('ssid'),
+        'channel': values.get('channel'),
+        'password': values.get('wpa_passphrase'),
+        'encryption': {'2': 'wpa2', '3': 'wpa1'}.get(values.get('wpa'), 'none'),
+        'mac_address': None,
+        'bss': {}
+    }
+    for block in blocks:
+        bss = _parse_conf('bss='+block)
+        settings['bss'][bss['bss']] = {
+            'ssid': bss.get('ssid'),
+            'channel': settings['channel'],
+            'password': bss.get('wpa_passphrase'),
+            'encryption': {'2': 'wpa2', '3': 'wpa1'}.get(bss.get('wpa'), 'none'),
+            'mac_address': bss.get('bssid')
+        }
+    return settings, values.get('interface'), content
+
+
+def dnsmasq_addresses(filename='/etc/dnsmasq.conf'):
+    '''
+    Purpose:
+        The address of every AP interface, derived from the
+        dhcp-range of its interface block (render_dnsmasq_radios)
+    Return:
+        Dictionary mapping every interface to its (ip, prefix),
+        None if the file cannot be read
+    '''
+    conf = read_dnsmasq_radios_conf(filename)
+    if conf == None:
+        return None
+    addresses = {}
+    for interface, pool in conf[0].items():
+        if pool['range_from'] == None:
+            continue
+        ip = find_usable_ip(pool['range_from'], pool['range_to'], netmask=pool['netmask'])
+        if ip != None:
+            addresses[interface] = ip, pool_network(pool['range_from'], pool['range_to'], pool['netmask'])[1]
+    return addresses
+
+
+def reapply_radio(wifiname='', radios={}, verbose=False, filename='/etc/dnsmasq.conf'):
+    '''
+    Purpose:
+        reapply_ap for one radio of update_radios, restarting
+        its own hostapd@<interface> and giving its BSS interfaces
+        their addresses again. The firewall keeps every interface.
+    Return:
+        True if every command succeeded
+    '''
+    addresses = dnsmasq_addresses(filename)
+    if addresses == None or wifiname not in addresses:
+        print(" "*22+f"No address for {wifiname} in {filename}")
+        return False
+    ip, prefix = addresses[wifiname]
+    virtual = [(vif,) + addresses[vif] for vif in radios[wifiname].get('bss', {}) if vif in addresses]
+    return reapply_ap(ip, wifiname, radios[wifiname]['mac_address'], verbose, prefix,
+        'hostapd@'+wifiname, [name for name, _ in radio_interfaces(radios)], virtual)
+
+
+######### Live changes
+
+def _control(wifiname=''):
+    # The socket follows the root of the backend, like every other file
+    return hostapd_ctrl.ControlClient(wifiname, backend.get_backend().path(HOSTAPD_CTRL))
+
+
+def live_status(wifiname=''):
+    '''
+    Purpose:
+        Query the running hostapd
+    Return:
+        (status, stations), see hostapd_ctrl.ControlClient,
+        or None if hostapd cannot be reached
+    '''
+    try:
+        with _control(wifiname) as client:
+            return client.status(), client.stations()
+    except OSError:
+        return None
+
+
+def apply_live(wifiname='', live={}, verbose=False):
+    '''
+    Purpose:
+        Apply hostapd.conf values (HOSTAPD_LIVE_KEYS) to the
+        running hostapd, through its control interface
+    Return:
+        True if every value took effect
+    '''
+    start = time.monotonic()
+    try:
+        with _control(wifiname) as client:
+            for key, value in live.items():
+                if key == 'channel':
+                    status = client.chan_switch(value)
+                else:
+                    status = client.set(key, value)
+                if not status:
+                    if verbose:
+                        print(" "*4+"\x1b[31m[!]\033[0m "+f"hostapd refused {key}={value}")
+                    return False
+    except OSError as e:
+        if verbose:
+            print(" "*4+"\x1b[31m[!]\033[0m "+f"hostapd control interface unavailable: {e}")
+        return False
+    changed = ', '.join(f"{key}={value}" for key, value in live.items())
+    print(" "*4+"\x1b[32m[+]\033[0m "+f"hostapd: live ({changed}), outage {time.monotonic() - start:.2f}s")
+    return True
+
+
+def change_channel(wifiname='', channel='', verbose=False, filename='/etc/hostapd/hostapd.conf'):
+    '''
+    Purpose:
+        Move the running AP to channel, then rewrite hostapd.conf
+        so that the channel is kept on the next start
+    Return:
+        True if both succeeded
+    '''
+    current = read_hostapd_conf(filename)
+    if current == None:
+        return False
+    settings, _, ap_type, _ = current
+    if not apply_live(wifiname, {'channel': channel}, verbose):
+        return False
+    settings['channel'] = channel
+    return update_hostapd(settings, wifiname, ap_type, verbose, filename)
+
+
+def disconnect_station(wifiname='', mac='', verbose=False):
+    '''
+    Purpose:
+        Disconnect the client with the MAC address mac,
+        it is free to connect again
+    '''
+    try:
+        with _control(wifiname) as client:
+            status = client.disassociate(mac.lower())
+    except OSError as e:
+        if verbose:
+            print(" "*4+"\x1b[31m[!]\033[0m "+f"hostapd control interface unavailable: {e}")
+        return False
+    return status
+
+
 ############# Isolation status of the machine.
 # Isolation is forced by using iptables to block
 # all traffic through the ethernet device
@@ -1016,6 +1966,7 @@ if __name__ == "__main__":
 # 'password'      : str 
 # 'range_from'    : str 
 # 'range_to'      : str 
+# 'netmask'       : str '255.255.252.0'/'22', optional
 # 'channel'       : str 
 # 'persistence'   : str 'yes'/'no'
 
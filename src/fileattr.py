@@ -0,0 +1,110 @@
+'''
+Purpose:
+    Read and change the inode flags of a file (chattr/lsattr)
+    in-process, with the FS_IOC_GETFLAGS and FS_IOC_SETFLAGS ioctls,
+    instead of spawning 'sudo chattr' for every change.
+    Every change is read back, so the caller knows whether it
+    really happened.
+Note:
+    The ioctl numbers are declared with a long argument (linux/fs.h),
+    so they differ between 32 and 64 bit systems, although the kernel
+    only transfers an int.
+    Filesystems without inode flags (tmpfs, vfat, ...) answer
+    ENOTTY or EOPNOTSUPP, reported as None.
+'''
+
+import errno
+import fcntl
+import os
+import struct
+
+FS_IMMUTABLE_FL = 0x00000010
+
+_IOC_WRITE = 1
+_IOC_READ = 2
+
+
+def _ioc(direction, kind, number, size):
+    return (direction << 30) | (size << 16) | (ord(kind) << 8) | number
+
+
+FS_IOC_GETFLAGS = _ioc(_IOC_READ, 'f', 1, struct.calcsize('l'))
+FS_IOC_SETFLAGS = _ioc(_IOC_WRITE, 'f', 2, struct.calcsize('l'))
+
+UNSUPPORTED = (errno.ENOTTY, errno.EOPNOTSUPP, errno.EINVAL, errno.ENOSYS)
+
+
+def _open(path):
+    # O_RDONLY works on immutable files, O_NONBLOCK keeps FIFOs from blocking
+    return os.open(path, os.O_RDONLY | os.O_NONBLOCK | getattr(os, 'O_NOFOLLOW', 0))
+
+
+def _get(fd):
+    buffer = bytearray(struct.calcsize('l'))
+    fcntl.ioctl(fd, FS_IOC_GETFLAGS, buffer)
+    return struct.unpack_from('i', buffer)[0]
+
+
+def get_flags(path=''):
+    '''
+    Return:
+        The inode flags of path, None if the filesystem has none
+    Raise:
+        OSError if path cannot be opened
+    '''
+    fd = _open(path)
+    try:
+        return _get(fd)
+    except OSError as e:
+        if e.errno in UNSUPPORTED:
+            return None
+        raise
+    finally:
+        os.close(fd)
+
+
+def set_immutable(path='', immutable=True):
+    '''
+    Purpose:
+        Set or clear the immutable flag of path (chattr +i/-i),
+        leaving the other flags as they are.
+    Return:
+        True if the flag is verified to be in the requested state
+        False if it could not be changed (i.e. no CAP_LINUX_IMMUTABLE)
+        None if the filesystem does not support the flag
+    Raise:
+        OSError if path cannot be opened
+    '''
+    fd = _open(path)
+    try:
+        try:
+            flags = _get(fd)
+        except OSError as e:
+            if e.errno in UNSUPPORTED:
+                return None
+            raise
+        wanted = flags | FS_IMMUTABLE_FL if immutable else flags & ~FS_IMMUTABLE_FL
+        if wanted != flags:
+            try:
+                fcntl.ioctl(fd, FS_IOC_SETFLAGS, struct.pack('i', wanted) + bytes(struct.calcsize('l') - 4))
+            except OSError as e:
+                if e.errno in UNSUPPORTED:
+                    return None
+                return False
+        return bool(_get(fd) & FS_IMMUTABLE_FL) == immutable
+    finally:
+        os.close(fd)
+
+
+def is_immutable(path=''):
+    '''
+    Return:
+        True/False, None if unknown
+    '''
+    try:
+        flags = get_flags(path)
+    except OSError:
+        return None
+    if flags == None:
+        return None
+    return bool(flags & FS_IMMUTABLE_FL)
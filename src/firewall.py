@@ -0,0 +1,277 @@
+'''
+Purpose:
+    Firewall backends for the isolation of the machine.
+    Every backend blocks all traffic, except for the traffic
+    through the wifi devices, and loads its ruleset in a single
+    transaction:
+    - IptablesBackend: one iptables-restore of the filter table
+    - NftablesBackend: one 'nft -f' of its own table, inet ap_isolation,
+      removed again by deleting that table, leaving every other
+      table alone
+    backend() picks the one matching the system.
+Note:
+    The backends only describe the commands, configurations.py
+    executes them.
+    wifiname is either one interface, or a list of interfaces
+    when several radios serve as AP.
+'''
+
+import shutil
+
+try:
+    from . import backend as execution
+except ImportError:
+    import backend as execution
+
+NFT_TABLE = 'inet ap_isolation'
+
+
+def interfaces(wifiname=''):
+    '''
+    Return:
+        wifiname as a list of interfaces
+    '''
+    if isinstance(wifiname, str):
+        return [wifiname]
+    return list(wifiname)
+
+
+def _run(command=[]):
+    '''
+    Return:
+        (returncode, stdout), or None if the command cannot be started
+    '''
+    try:
+        returncode, stdout, _ = execution.get_backend().run(command)
+    except OSError:
+        return None
+    return returncode, stdout
+
+
+class IptablesBackend():
+    name = 'iptables'
+
+    def rules(self, wifiname=''):
+        '''
+        Return:
+            (policies, rules) as written by 'iptables -S'
+        '''
+        policies = [
+            "-P INPUT DROP",
+            "-P FORWARD DROP",
+            "-P OUTPUT DROP"
+        ]
+        rules = []
+        for name in interfaces(wifiname):
+            rules += [
+                f"-A INPUT -i {name} -j ACCEPT",
+                f"-A FORWARD -i {name} -j ACCEPT",
+                f"-A OUTPUT -o {name} -j ACCEPT",
+                f"-A FORWARD -o {name} -j ACCEPT"
+            ]
+        return policies, rules
+
+    def render(self, wifiname=''):
+        '''
+        Purpose:
+            The firewall in iptables-restore format.
+            Restoring it replaces the whole filter table in a single
+            commit, so the DROP policies never apply without the
+            ACCEPT rules for the wifi device.
+        '''
+        policies, rules = self.rules(wifiname)
+        content = "*filter\n"
+        for policy in policies:
+            _, chain, target = policy.split()
+            content += f":{chain} {target} [0:0]\n"
+        for rule in rules:
+            content += rule+"\n"
+        content += "COMMIT\n"
+        return content
+
+    def apply(self, wifiname=''):
+        '''
+        Return:
+            (command, input) loading the firewall
+        '''
+        return ["sudo", "iptables-restore"], self.render(wifiname)
+
+    def remove(self, wifiname=''):
+        '''
+        Return:
+            (command, input) restoring the ACCEPT policies and deleting
+            the rules of the wifi device which are in place.
+            Other rules of the filter table are kept (--noflush).
+        '''
+        present = self._list() or set()
+        policies, rules = self.rules(wifiname)
+        content = "*filter\n"
+        for policy in policies:
+            _, chain, _ = policy.split()
+            content += f":{chain} ACCEPT [0:0]\n"
+        for rule in rules:
+            if rule in present:
+                content += "-D"+rule[2:]+"\n"
+        content += "COMMIT\n"
+        return ["sudo", "iptables-restore", "--noflush"], content
+
+    def _list(self):
+        result = _run(["iptables", "-S"])
+        if result == None or result[0] != 0:
+            return None
+        return set(line.strip() for line in result[1].splitlines())
+
+    def status(self, wifiname=''):
+        '''
+        Return:
+            (status, missing) where missing lists the absent policies
+            and rules, or (False, None) if the rules cannot be read
+        '''
+        present = self._list()
+        if present == None:
+            return False, None
+        policies, rules = self.rules(wifiname)
+        missing = [rule for rule in policies + rules if rule not in present]
+        return len(missing) == 0, missing
+
+    def script(self, wifiname=''):
+        '''
+        Purpose:
+            Shell lines loading the firewall, for /root/firewall.sh
+        '''
+        return (
+            "# Replace the filter table in a single transaction:\n"
+            f"# policies set to DROP, only traffic on {', '.join(interfaces(wifiname))} allowed\n"
+            "iptables-restore <<'EOF'\n"
+            + self.render(wifiname) +
+            "EOF\n"
+        )
+
+
+class NftablesBackend():
+    name = 'nftables'
+
+    def rules(self, wifiname=''):
+        '''
+        Return:
+            Dictionary mapping each chain of the table to its rules
+        '''
+        names = interfaces(wifiname)
+        return {
+            'input': [f'iifname "{name}" accept' for name in names],
+            'forward': [rule for name in names for rule in (f'iifname "{name}" accept', f'oifname "{name}" accept')],
+            'output': [f'oifname "{name}" accept' for name in names]
+        }
+
+    def render(self, wifiname=''):
+        '''
+        Purpose:
+            The firewall as an nft script.
+            The table is declared and deleted before being created,
+            so loading it twice replaces it, within one transaction.
+        '''
+        content = f"table {NFT_TABLE}\n"
+        content += f"delete table {NFT_TABLE}\n"
+        content += f"table {NFT_TABLE} {{\n"
+        for chain, rules in self.rules(wifiname).items():
+            content += f"    chain {chain} {{\n"
+            content += f"        type filter hook {chain} priority 0; policy drop;\n"
+            for rule in rules:
+                content += f"        {rule}\n"
+            content += "    }\n"
+        content += "}\n"
+        return content
+
+    def apply(self, wifiname=''):
+        return ["sudo", "nft", "-f", "-"], self.render(wifiname)
+
+    def remove(self, wifiname=''):
+        '''
+        Purpose:
+            Delete the table, whether or not it exists
+        '''
+        return ["sudo", "nft", "-f", "-"], f"table {NFT_TABLE}\ndelete table {NFT_TABLE}\n"
+
+    def status(self, wifiname=''):
+        '''
+        Return:
+            (status, missing) where missing lists the absent chains
+            and rules, or (False, None) if the table cannot be read
+        '''
+        result = _run(["nft", "list", "table"] + NFT_TABLE.split())
+        if result == None:
+            return False, None
+        if result[0] != 0:
+            # The table is absent
+            return False, [f"table {NFT_TABLE}"]
+        missing = []
+        chain = None
+        present = {}
+        for line in result[1].splitlines():
+            line = line.strip()
+            if line.startswith('chain '):
+                chain = line.split()[1]
+                present[chain] = set()
+            elif chain != None:
+                present[chain].add(line)
+        for chain, rules in self.rules(wifiname).items():
+            if chain not in present:
+                missing.append(f"chain {chain}")
+                continue
+            if not any(line.startswith('type filter') and 'policy drop;' in line for line in present[chain]):
+                missing.append(f"chain {chain} policy drop")
+            for rule in rules:
+                if rule not in present[chain]:
+                    missing.append(f"{chain} {rule}")
+        return len(missing) == 0, missing
+
+    def script(self, wifiname=''):
+        return (
+            f"# Replace the {NFT_TABLE} table in a single transaction:\n"
+            f"# policies set to DROP, only traffic on {', '.join(interfaces(wifiname))} allowed\n"
+            "nft -f - <<'EOF'\n"
+            + self.render(wifiname) +
+            "EOF\n"
+        )
+
+
+BACKENDS = {
+    'iptables': IptablesBackend,
+    'nftables': NftablesBackend
+}
+
+
+def detect():
+    '''
+    Purpose:
+        Name of the backend matching the system.
+        nftables if nft is installed and iptables is either missing
+        or the nf_tables variant, iptables otherwise.
+    '''
+    nft = shutil.which('nft') != None
+    iptables = shutil.which('iptables') != None
+    if nft and iptables:
+        result = _run(["iptables", "--version"])
+        if result != None and 'nf_tables' in result[1]:
+            return 'nftables'
+        return 'iptables'
+    if nft:
+        return 'nftables'
+    return 'iptables'
+
+
+_backend = None
+
+
+def backend(name=None):
+    '''
+    Purpose:
+        The firewall backend, detected on first use
+        unless name ('iptables'/'nftables') is given
+    '''
+    global _backend
+    if name != None:
+        return BACKENDS[name]()
+    if _backend == None:
+        _backend = BACKENDS[detect()]()
+    return _backend
@@ -0,0 +1,219 @@
+'''
+Purpose:
+    Apply one .ini file to a fleet of machines over plain SSH.
+    Every host receives the .ini file on the standard input of a
+    single ssh session, stores it in a private temporary file
+    (mktemp), and runs the single host path from its own copy of
+    the project:
+        sudo python3 src/tool.py -y -i <ini>
+    Up to MAX_HOSTS hosts are handled at once, every host is
+    reported as it progresses, and a summary table closes the run.
+    The inventory lists one host per line, '#' starts a comment:
+        [user@]host[:port] [project directory]
+    The project directory is relative to the home directory of the
+    user, DEFAULT_DIRECTORY if omitted.
+Note:
+    ssh runs in batch mode, the hosts must accept a key without
+    a passphrase prompt, and sudo must not ask for a password.
+'''
+
+import shlex
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+try:
+    from . import backend
+except ImportError:
+    import backend
+
+MAX_HOSTS = 8
+DEFAULT_DIRECTORY = 'Project10'
+SSH_OPTIONS = ['-o', 'BatchMode=yes', '-o', 'ConnectTimeout=10']
+
+_print_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Host:
+    destination: str                    # [user@]host, as given to ssh
+    port: int = None                    # None for the port of the ssh configuration
+    directory: str = DEFAULT_DIRECTORY
+
+    @property
+    def name(self):
+        return self.destination if self.port == None else f"{self.destination}:{self.port}"
+
+
+@dataclass(frozen=True)
+class HostResult:
+    host: Host
+    returncode: int = None  # Of the remote command, 255 if ssh failed
+    duration: float = 0.0   # Seconds
+    detail: str = ''        # Last line of output of a failure
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+
+def parse_host(line=''):
+    '''
+    Return:
+        The Host of an inventory line,
+        None for a blank line or a comment
+    Raise:
+        ValueError if the port is not a number
+    '''
+    fields = line.split('#', 1)[0].split()
+    if len(fields) == 0:
+        return None
+    user, at, address = fields[0].rpartition('@')
+    port = None
+    if address.startswith('[') and ']' in address:
+        # [address]:port, for IPv6 addresses
+        address, _, rest = address[1:].partition(']')
+        if rest != '':
+            port = rest[1:] if rest.startswith(':') else rest
+    elif address.count(':') == 1:
+        address, _, port = address.partition(':')
+    if port != None:
+        if not port.isdigit():
+            raise ValueError(f"Invalid port in '{fields[0]}'")
+        port = int(port)
+    directory = fields[1] if len(fields) > 1 else DEFAULT_DIRECTORY
+    return Host(user+at+address, port, directory)
+
+
+def read_inventory(filename=''):
+    '''
+    Return:
+        List of Host, in the order of the inventory
+    Raise:
+        OSError if the inventory cannot be read,
+        ValueError if a line is not valid
+    '''
+    hosts = []
+    with open(filename, 'r') as file:
+        for number, line in enumerate(file, 1):
+            try:
+                host = parse_host(line)
+            except ValueError as e:
+                raise ValueError(f"{filename}:{number}: {e}")
+            if host != None:
+                hosts.append(host)
+    return hosts
+
+
+def ssh_command(host):
+    '''
+    Return:
+        The ssh command reaching host, without the remote command
+    '''
+    command = ['ssh']
+    if host.port != None:
+        command += ['-p', str(host.port)]
+    return command + SSH_OPTIONS + [host.destination]
+
+
+def apply_command(host, verbose=False):
+    '''
+    Return:
+        The remote shell command storing its standard input in a
+        temporary file, applying it and removing it again. The file
+        is only readable by the ssh user, and every run gets its own.
+    '''
+    tool = "sudo python3 src/tool.py -y" + (" -v" if verbose else "") + ' -i "$f"'
+    return (
+        'f=$(mktemp) || exit 1; '
+        f'cat > "$f" && cd {shlex.quote(host.directory)} && {tool}; '
+        'status=$?; rm -f "$f"; exit $status'
+    )
+
+
+def _progress(host, message):
+    with _print_lock:
+        print(" "*4+f"{host.name.ljust(24)}: {message}", flush=True)
+
+
+def _last_line(stdout='', stderr=''):
+    lines = [line.strip() for line in (stderr + '\n' + stdout).splitlines() if line.strip() != '']
+    return lines[-1] if lines else ''
+
+
+def apply_host(host, content='', verbose=False):
+    '''
+    Purpose:
+        Send content (the .ini file) to host and apply it there,
+        in a single ssh session
+    Return:
+        HostResult
+    '''
+    _progress(host, "applying")
+    start = time.monotonic()
+    try:
+        returncode, stdout, stderr = backend.get_backend().run(ssh_command(host) + [apply_command(host, verbose)], content)
+    except OSError as e:
+        returncode, stdout, stderr = 127, '', str(e)
+    duration = time.monotonic() - start
+    if returncode != 0:
+        detail = _last_line(stdout, stderr)
+        _progress(host, f"\x1b[31m[!]\033[0m failed ({returncode}) after {duration:.1f}s {detail}")
+        return HostResult(host, returncode, duration, detail)
+    _progress(host, f"\x1b[32m[+]\033[0m applied in {duration:.1f}s")
+    return HostResult(host, returncode, duration)
+
+
+def apply_fleet(hosts=[], content='', max_hosts=MAX_HOSTS, verbose=False):
+    '''
+    Purpose:
+        apply_host on every host, at most max_hosts at once
+    Return:
+        List of HostResult, in the same order as hosts
+    '''
+    if len(hosts) == 0:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_hosts, len(hosts)))) as pool:
+        return list(pool.map(lambda host: apply_host(host, content, verbose), hosts))
+
+
+def summary(results=[]):
+    '''
+    Return:
+        The summary table of results, as a string
+    '''
+    width = max([len('Host')] + [len(result.host.name) for result in results])
+    lines = [
+        f"{'Host'.ljust(width)} | Result | Time   | Detail",
+        f"{'-'*width}-+--------+--------+-------"
+    ]
+    for result in results:
+        outcome = 'OK' if result.ok else 'FAIL'
+        detail = '' if result.ok else f"({result.returncode}) {result.detail}".strip()
+        lines.append(f"{result.host.name.ljust(width)} | {outcome.ljust(6)} | {result.duration:5.1f}s | {detail}")
+    failed = len([result for result in results if not result.ok])
+    lines.append(f"{len(results) - failed} of {len(results)} hosts applied, {failed} failed")
+    return '\n'.join(lines)
+
+
+def run(inventory='', ini_file='', max_hosts=MAX_HOSTS, verbose=False):
+    '''
+    Purpose:
+        The --fleet option, apply ini_file to every host of inventory
+    Return:
+        0 if every host applied it, 1 otherwise
+    '''
+    try:
+        hosts = read_inventory(inventory)
+        with open(ini_file, 'r') as file:
+            content = file.read()
+    except (OSError, ValueError) as e:
+        print("\x1b[31m[!]\033[0m Fleet           : "+str(e))
+        return 1
+    print("\x1b[34m[?]\x1b[0m Fleet           : "+f"{len(hosts)} hosts, {min(max_hosts, len(hosts))} at once")
+    start = time.monotonic()
+    results = apply_fleet(hosts, content, max_hosts, verbose)
+    print(summary(results))
+    print(f"Elapsed {time.monotonic() - start:.1f}s")
+    return 0 if all(result.ok for result in results) else 1
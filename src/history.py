@@ -0,0 +1,100 @@
+'''
+Purpose:
+    Find the most recent use of a command in a bash history file,
+    without reading the whole file.
+    The file is memory mapped and searched backwards from the end,
+    stopping at the first match. The inode and the size scanned are
+    remembered, so a later run only searches the appended bytes.
+Note:
+    Bash only records timestamps when HISTTIMEFORMAT is set, in which
+    case every command is preceded by a '#<seconds since epoch>' line.
+'''
+
+import mmap
+import os
+
+try:
+    from . import cache
+except ImportError:
+    import cache
+
+STATE_FILE = os.path.join(cache.CACHE_DIR, 'history.json')
+
+
+def _match_at(mm, position):
+    '''
+    Purpose:
+        Describe the line containing position, along with the
+        timestamp on the line before it, if there is one.
+    '''
+    start = mm.rfind(b'\n', 0, position) + 1
+    end = mm.find(b'\n', position)
+    if end == -1:
+        end = len(mm)
+    timestamp = None
+    if start > 0:
+        previous = mm[mm.rfind(b'\n', 0, start - 1) + 1:start - 1]
+        if previous.startswith(b'#') and previous[1:].isdigit():
+            timestamp = int(previous[1:])
+    return {
+        'line': mm[start:end].decode('utf-8', 'replace').strip(),
+        'offset': start,
+        'timestamp': timestamp
+    }
+
+
+def _scan(filename, pattern, begin=0):
+    '''
+    Purpose:
+        Search the file backwards, from the end down to begin.
+    Return:
+        (size, match) where match is None if the pattern was not found
+    '''
+    with open(filename, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return size, None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if begin > 0:
+                # Include the line which was incomplete at the last scan
+                begin = mm.rfind(b'\n', 0, begin) + 1
+            position = mm.rfind(pattern, begin, size)
+            if position == -1:
+                return size, None
+            return size, _match_at(mm, position)
+
+
+def last_match(filename='', pattern='date -s', state=None):
+    '''
+    Purpose:
+        Most recent line of filename containing pattern
+    Arguments:
+        state: A cache.Cache remembering previous scans, or None
+    Return:
+        A dictionary with the 'line', its 'offset' and its 'timestamp'
+        (seconds since epoch, or None), or None if there is no match
+    '''
+    try:
+        info = os.stat(filename)
+    except OSError:
+        return None
+    name = filename + '\0' + pattern
+    key = [info.st_dev, info.st_ino]
+    begin = 0
+    previous = None
+    if state is not None:
+        entry = state.get(name, key)
+        if entry is not None and entry['value']['size'] <= info.st_size:
+            begin = entry['value']['size']
+            previous = entry['value']['match']
+            if begin == info.st_size:
+                return previous
+    try:
+        size, match = _scan(filename, pattern.encode(), begin)
+    except (OSError, ValueError):
+        return None
+    if match is None:
+        match = previous
+    if state is not None:
+        state.put(name, key, {'size': size, 'match': match})
+    return match
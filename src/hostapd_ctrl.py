@@ -0,0 +1,183 @@
+'''
+Purpose:
+    Client for the control interface of a running hostapd,
+    the UNIX datagram socket /var/run/hostapd/<wifiname>
+    (ctrl_interface in hostapd.conf), as used by hostapd_cli.
+    Queries and supported changes (channel, disconnecting a
+    station, runtime parameters) take effect in milliseconds,
+    without rewriting hostapd.conf and restarting hostapd.
+Note:
+    Every request is one datagram, answered by one datagram.
+    Unsolicited events ('<level>message') only arrive after an
+    ATTACH, which this client never sends, they are skipped anyway.
+'''
+
+import os
+import socket
+
+CTRL_DIR = '/var/run/hostapd'
+TIMEOUT = 2.0           # Seconds to wait for an answer
+BUFFER_SIZE = 4096      # hostapd answers with at most 4096 bytes
+
+
+def channel_frequency(channel=''):
+    '''
+    Return:
+        The center frequency in MHz of a 2.4 or 5 GHz channel,
+        None if channel is not a valid channel number
+    '''
+    try:
+        channel = int(channel)
+    except (TypeError, ValueError):
+        return None
+    if channel == 14:
+        return 2484
+    if 1 <= channel <= 13:
+        return 2407 + 5 * channel
+    if 32 <= channel <= 177:
+        return 5000 + 5 * channel
+    return None
+
+
+def parse_values(reply=''):
+    '''
+    Return:
+        Dictionary of the key=value lines of reply
+    '''
+    values = {}
+    for line in reply.splitlines():
+        key, separator, value = line.partition('=')
+        if separator:
+            values[key] = value
+    return values
+
+
+class ControlClient():
+    def __init__(self,
+        wifiname,               # String, the interface hostapd serves
+        directory=CTRL_DIR,     # String, ctrl_interface of hostapd.conf
+        timeout=TIMEOUT         # Seconds to wait for every answer
+    ):
+        self.path = os.path.join(directory, wifiname)
+        self.timeout = timeout
+        self.sock = None
+
+    def open(self):
+        '''
+        Raise:
+            OSError if hostapd is not listening
+        '''
+        if self.sock != None:
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            # Autobind to an abstract address, nothing to clean up afterwards
+            sock.bind('')
+            sock.connect(self.path)
+            sock.settimeout(self.timeout)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+    def close(self):
+        if self.sock != None:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, command=''):
+        '''
+        Purpose:
+            Send command, wait for its answer
+        Return:
+            The answer as a string
+        Raise:
+            OSError if hostapd cannot be reached or does not answer in time
+        '''
+        self.open()
+        self.sock.send(command.encode())
+        while True:
+            reply = self.sock.recv(BUFFER_SIZE).decode('utf-8', 'replace')
+            if not reply.startswith('<'):
+                return reply
+
+    def _ok(self, command):
+        return self.request(command).strip() == 'OK'
+
+    def ping(self):
+        try:
+            return self.request('PING').strip() == 'PONG'
+        except OSError:
+            return False
+
+    def status(self):
+        '''
+        Return:
+            Dictionary of STATUS, i.e. 'state', 'channel', 'freq', 'ssid[0]'
+        '''
+        return parse_values(self.request('STATUS'))
+
+    def stations(self):
+        '''
+        Purpose:
+            Every associated station, walking STA-FIRST/STA-NEXT
+            like hostapd_cli all_sta
+        Return:
+            Dictionary mapping the MAC address of every station
+            to the dictionary of its values
+        '''
+        stations = {}
+        reply = self.request('STA-FIRST')
+        while reply != '' and not reply.startswith('FAIL'):
+            mac, _, rest = reply.partition('\n')
+            mac = mac.strip().lower()
+            if mac in stations:
+                break
+            stations[mac] = parse_values(rest)
+            reply = self.request('STA-NEXT '+mac)
+        return stations
+
+    def reload(self):
+        '''
+        Purpose:
+            Re-read hostapd.conf, see configurations.HOSTAPD_RESTART_KEYS
+            for what it does not pick up
+        '''
+        return self._ok('RELOAD')
+
+    def chan_switch(self, channel='', count=5):
+        '''
+        Purpose:
+            Move the AP to channel, announcing it to the stations
+            count beacons ahead (channel switch announcement)
+        Return:
+            False if the channel is unknown or hostapd refused the switch
+        '''
+        frequency = channel_frequency(channel)
+        if frequency == None:
+            return False
+        return self._ok(f'CHAN_SWITCH {count} {frequency}')
+
+    def disassociate(self, mac='', reason=None):
+        '''
+        Purpose:
+            Disconnect the station with the MAC address mac
+        '''
+        command = 'DISASSOCIATE '+mac
+        if reason != None:
+            command += f' reason={reason}'
+        return self._ok(command)
+
+    def set(self, name='', value=''):
+        '''
+        Purpose:
+            Change a runtime parameter (SET name value)
+        '''
+        return self._ok(f'SET {name} {value}')
@@ -0,0 +1,266 @@
+'''
+Purpose:
+    One-shot hardware inventory of the machine.
+    Everything the tool needs to know about the hardware is read
+    once from /proc and /sys, and handed out as an immutable
+    snapshot which every other module can query.
+    - Board model, CPU count and RAM (/proc/cpuinfo, /proc/meminfo)
+    - Every network device with its type, driver, phy,
+      MAC address and operational state, from one rtnetlink
+      dump (netlink.py), or one pass over /sys/class/net
+'''
+
+import os
+import threading
+from dataclasses import dataclass
+
+try:
+    from . import netlink
+except ImportError:
+    import netlink
+
+CPUINFO = '/proc/cpuinfo'
+MEMINFO = '/proc/meminfo'
+NET_PATH = '/sys/class/net/'
+PHY_PATH = '/sys/class/ieee80211/'
+
+ARPHRD_ETHER = 1
+ARPHRD_LOOPBACK = 772
+
+
+@dataclass(frozen=True)
+class NetDev:
+    name: str
+    index: int = None
+    type: int = None        # ARPHRD_* value, 1 for ethernet (and wireless)
+    driver: str = None      # Kernel driver of the backing device
+    phy: str = None         # phy80211 name, wireless devices only
+    mac: str = None
+    operstate: str = None   # 'up', 'down', 'dormant', ...
+    wireless: bool = False
+    device: bool = False    # Backed by hardware, i.e. not a virtual link
+
+    @property
+    def ethernet(self):
+        return self.device and not self.wireless and self.type == ARPHRD_ETHER
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    model: str = None
+    cpu_count: int = None
+    mem_total: int = None   # kB
+    netdevs: tuple = ()
+    errors: tuple = ()      # Sources which could not be read
+
+    def netdev(self, name=''):
+        for dev in self.netdevs:
+            if dev.name == name:
+                return dev
+        return None
+
+    def wireless(self):
+        return [dev.name for dev in self.netdevs if dev.wireless]
+
+    def ethernet(self):
+        return [dev.name for dev in self.netdevs if dev.ethernet]
+
+
+def _read(path):
+    try:
+        with open(path, 'r') as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def _link_name(path):
+    try:
+        return os.path.basename(os.readlink(path))
+    except OSError:
+        return None
+
+
+def read_cpuinfo(location=CPUINFO):
+    '''
+    Return:
+        (model, cpu_count), model being None if absent or empty
+    Raise:
+        OSError if the file cannot be read
+    '''
+    model = None
+    cpu_count = 0
+    with open(location, 'r') as file:
+        for line in file:
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            value = value.strip()
+            if name == 'processor':
+                cpu_count += 1
+            # The board 'Model', not the numeric CPU 'model' (nor 'model name') of x86
+            elif name == 'model' and model is None and value != '' and not value.isdigit():
+                model = value
+    return model, cpu_count or os.cpu_count()
+
+
+def read_meminfo(location=MEMINFO):
+    with open(location, 'r') as file:
+        for line in file:
+            if line.startswith('MemTotal:'):
+                return int(line.split()[1])
+    return None
+
+
+def read_netdev(name='', base_path=NET_PATH):
+    '''
+    Purpose:
+        Describe a single interface from sysfs.
+        The directory is listed once, rather than testing
+        for the existence of each entry separately.
+    Raise:
+        OSError if the interface does not exist
+    '''
+    path = os.path.join(base_path, name)
+    entries = set(os.listdir(path))
+    values = {}
+    for attribute in ('ifindex', 'type'):
+        try:
+            values[attribute] = int(_read(os.path.join(path, attribute)))
+        except (TypeError, ValueError):
+            values[attribute] = None
+    return NetDev(
+        name=name,
+        index=values['ifindex'],
+        type=values['type'],
+        driver=_link_name(os.path.join(path, 'device', 'driver')) if 'device' in entries else None,
+        phy=_link_name(os.path.join(path, 'phy80211')) if 'phy80211' in entries else None,
+        mac=_read(os.path.join(path, 'address')),
+        operstate=_read(os.path.join(path, 'operstate')),
+        wireless='wireless' in entries or 'phy80211' in entries,
+        device='device' in entries
+    )
+
+
+def scan_netdevs(base_path=NET_PATH):
+    '''
+    Purpose:
+        Describe every interface with a single os.scandir pass
+        over base_path. Used when netlink is not available.
+    Raise:
+        OSError if base_path cannot be listed
+    '''
+    netdevs = []
+    with os.scandir(base_path) as entries:
+        for entry in entries:
+            try:
+                netdevs.append(read_netdev(entry.name, base_path))
+            except OSError:
+                continue # Interface removed while scanning
+    return tuple(sorted(netdevs, key=lambda dev: dev.name))
+
+
+def _wireless_netdevs(phy_path=PHY_PATH):
+    '''
+    Purpose:
+        Map the name of every wireless interface to its phy and driver
+        Walks the (few) phys rather than the (many) interfaces.
+    '''
+    wireless = {}
+    try:
+        phys = os.listdir(phy_path)
+    except OSError:
+        return wireless
+    for phy in phys:
+        device = os.path.join(phy_path, phy, 'device')
+        driver = _link_name(os.path.join(device, 'driver'))
+        try:
+            names = os.listdir(os.path.join(device, 'net'))
+        except OSError:
+            continue
+        for name in names:
+            wireless[name] = (phy, driver)
+    return wireless
+
+
+def discover_interfaces(base_path=NET_PATH, phy_path=PHY_PATH):
+    '''
+    Purpose:
+        Every network interface with its attributes.
+        On the live system this is one RTM_GETLINK dump plus a walk
+        over the wireless phys, falling back to scan_netdevs.
+        Exit policy is left to the caller.
+    Return:
+        Tuple of NetDev, sorted by name
+    Raise:
+        OSError if neither netlink nor base_path can be used
+    '''
+    if base_path != NET_PATH:
+        return scan_netdevs(base_path)
+    try:
+        links = netlink.dump_links()
+    except OSError:
+        return scan_netdevs(base_path)
+    wireless = _wireless_netdevs(phy_path)
+    netdevs = []
+    for link in links:
+        name = link['name']
+        if name in wireless:
+            phy, driver = wireless[name]
+            device = True
+        else:
+            phy = None
+            # Virtual links report their kind (veth, bridge, ifb, ...),
+            # newer kernels name the parent device of hardware links
+            device = link['parent'] != None or (link['kind'] == None and link['type'] != ARPHRD_LOOPBACK)
+            driver = _link_name(os.path.join(base_path, name, 'device', 'driver')) if device else None
+        netdevs.append(NetDev(
+            name=name,
+            index=link['index'],
+            type=link['type'],
+            driver=driver,
+            phy=phy,
+            mac=link['mac'],
+            operstate=link['operstate'],
+            wireless=name in wireless,
+            device=device
+        ))
+    return tuple(sorted(netdevs, key=lambda dev: dev.name))
+
+
+def take_snapshot(cpuinfo=CPUINFO, meminfo=MEMINFO, net_path=NET_PATH):
+    '''
+    Purpose:
+        Read every source once, regardless of earlier snapshots
+    '''
+    values = {}
+    errors = []
+    try:
+        values['model'], values['cpu_count'] = read_cpuinfo(cpuinfo)
+    except OSError:
+        errors.append(cpuinfo)
+    try:
+        values['mem_total'] = read_meminfo(meminfo)
+    except (OSError, ValueError):
+        errors.append(meminfo)
+    try:
+        values['netdevs'] = discover_interfaces(net_path)
+    except OSError:
+        errors.append(net_path)
+    return Snapshot(errors=tuple(errors), **values)
+
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def snapshot(cpuinfo=CPUINFO, meminfo=MEMINFO, net_path=NET_PATH, refresh=False):
+    '''
+    Purpose:
+        The snapshot of the machine, taken on first use.
+        Concurrent callers (the preflight checks) share one snapshot.
+    '''
+    key = (cpuinfo, meminfo, net_path)
+    with _lock:
+        if refresh or key not in _snapshots:
+            _snapshots[key] = take_snapshot(cpuinfo, meminfo, net_path)
+        return _snapshots[key]
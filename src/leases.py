@@ -0,0 +1,335 @@
+'''
+Purpose:
+    Follow the DHCP leases handed out by dnsmasq.
+    The lease file is watched with inotify, and every change is
+    diffed line by line against the previous content, so only new
+    or changed leases are parsed. The leases are indexed by MAC
+    address, IP address and hostname, answering every lookup
+    without reading the file again.
+Note:
+    dnsmasq rewrites the whole file in place on every change
+    (one '<expiry> <mac> <ip> <hostname> <client id>' line per
+    lease), it never appends. An incomplete last line means the
+    rewrite is still in progress, the next event completes it.
+'''
+
+import ctypes
+import os
+import select
+import struct
+import threading
+import time
+from dataclasses import dataclass
+
+LEASE_FILE = '/var/lib/misc/dnsmasq.leases'
+DEBOUNCE = 0.05     # Seconds without events before the file is read
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct('=iIII')     # watch descriptor, mask, cookie, length of the name
+
+
+@dataclass(frozen=True)
+class Lease:
+    expires: int            # Seconds since epoch, 0 for an infinite lease
+    mac: str                # Lower case
+    ip: str
+    hostname: str = None    # None if the client did not send one
+    client_id: str = None
+
+
+def parse_line(line=''):
+    '''
+    Return:
+        The Lease of a line of the lease file,
+        None for anything else (i.e. the DHCPv6 'duid' line)
+    '''
+    fields = line.split()
+    if len(fields) < 4 or not fields[0].isdigit():
+        return None
+    hostname = None if fields[3] == '*' else fields[3]
+    client_id = None if len(fields) < 5 or fields[4] == '*' else fields[4]
+    return Lease(int(fields[0]), fields[1].lower(), fields[2], hostname, client_id)
+
+
+class LeaseTable():
+    '''
+    Purpose:
+        The leases, indexed by MAC address, IP address and hostname
+    '''
+    def __init__(self):
+        self.lines = {}         # Line of the lease file -> Lease
+        self.by_mac = {}        # MAC address -> Lease
+        self.by_ip = {}         # IP address -> Lease
+        self.by_hostname = {}   # Lower case hostname -> {MAC address: Lease}
+
+    def _remove(self, lease):
+        if self.by_mac.get(lease.mac) == lease:
+            del self.by_mac[lease.mac]
+        if self.by_ip.get(lease.ip) == lease:
+            del self.by_ip[lease.ip]
+        if lease.hostname != None:
+            macs = self.by_hostname.get(lease.hostname.lower(), {})
+            if macs.get(lease.mac) == lease:
+                del macs[lease.mac]
+                if len(macs) == 0:
+                    del self.by_hostname[lease.hostname.lower()]
+
+    def _add(self, lease):
+        self.by_mac[lease.mac] = lease
+        self.by_ip[lease.ip] = lease
+        if lease.hostname != None:
+            self.by_hostname.setdefault(lease.hostname.lower(), {})[lease.mac] = lease
+
+    def update(self, content=''):
+        '''
+        Purpose:
+            Bring the table in line with content, the whole lease file.
+            Only the lines which changed are parsed.
+        Return:
+            (joined, left, renewed), lists of Lease.
+            A lease which moved to another IP or hostname, or got a
+            new expiry, is renewed.
+        '''
+        # An incomplete last line is still being written
+        lines = [line for line in content.split('\n')[:-1] if line.strip() != '']
+        before = dict(self.by_mac)
+        for line in set(self.lines) - set(lines):
+            lease = self.lines.pop(line)
+            if lease != None:
+                self._remove(lease)
+        for line in lines:
+            if line in self.lines:
+                continue
+            lease = parse_line(line)
+            self.lines[line] = lease
+            if lease != None:
+                self._add(lease)
+        joined = [lease for mac, lease in self.by_mac.items() if mac not in before]
+        left = [lease for mac, lease in before.items() if mac not in self.by_mac]
+        renewed = [lease for mac, lease in self.by_mac.items() if mac in before and before[mac] != lease]
+        return joined, left, renewed
+
+    def lookup(self, query=''):
+        '''
+        Return:
+            The leases matching query, a MAC address,
+            an IP address or a hostname
+        '''
+        query = query.strip().lower().replace('-', ':')
+        if query in self.by_mac:
+            return [self.by_mac[query]]
+        if query in self.by_ip:
+            return [self.by_ip[query]]
+        return list(self.by_hostname.get(query, {}).values())
+
+    def leases(self):
+        '''
+        Return:
+            Every lease, ordered by IP address
+        '''
+        return sorted(self.by_mac.values(), key=lambda lease: tuple(int(part) for part in lease.ip.split('.') if part.isdigit()))
+
+
+def _libc():
+    return ctypes.CDLL(None, use_errno=True)
+
+
+def inotify_watch(directory='', mask=0):
+    '''
+    Purpose:
+        An inotify instance watching directory
+    Return:
+        The non-blocking file descriptor to read the events from
+    Raise:
+        OSError if inotify or the directory are unavailable
+    '''
+    libc = _libc()
+    fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if fd < 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+    if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+        error = ctypes.get_errno()
+        os.close(fd)
+        raise OSError(error, os.strerror(error), directory)
+    return fd
+
+
+def parse_events(data=b''):
+    '''
+    Return:
+        List of (mask, name) of the inotify events in data
+    '''
+    events = []
+    offset = 0
+    while offset + _EVENT.size <= len(data):
+        _, mask, _, length = _EVENT.unpack_from(data, offset)
+        name = data[offset + _EVENT.size:offset + _EVENT.size + length].split(b'\0', 1)[0]
+        events.append((mask, os.fsdecode(name)))
+        offset += _EVENT.size + length
+    return events
+
+
+class LeaseMonitor():
+    def __init__(self,
+        filename=LEASE_FILE,    # String
+        callback=None           # Called with (joined, left, renewed) on every change
+    ):
+        self.filename = filename
+        self.callback = callback
+        self.table = LeaseTable()
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.version = 0        # Incremented on every change of the table
+        self.thread = None
+        self._wake = None
+
+    def refresh(self):
+        '''
+        Purpose:
+            Read the lease file and apply what changed
+        Return:
+            (joined, left, renewed), see LeaseTable.update
+        '''
+        try:
+            with open(self.filename, 'r') as file:
+                content = file.read()
+        except FileNotFoundError:
+            content = ''
+        with self.lock:
+            changes = self.table.update(content)
+            if any(changes):
+                self.version += 1
+                self.changed.notify_all()
+        if any(changes) and self.callback != None:
+            self.callback(*changes)
+        return changes
+
+    def start(self):
+        '''
+        Purpose:
+            Read the lease file, then follow it in a background thread
+        Return:
+            False if it cannot be followed (no inotify, missing directory),
+            every lookup then reads the file again
+        '''
+        try:
+            fd = inotify_watch(os.path.dirname(os.path.abspath(self.filename)),
+                IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE)
+        except OSError:
+            self.refresh()
+            return False
+        # Watching before reading, so no change falls in between
+        self.refresh()
+        self._wake = os.pipe()
+        self.thread = threading.Thread(target=self._follow, args=(fd,), daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        if self.thread != None:
+            os.write(self._wake[1], b'\0')
+            self.thread.join()
+            self.thread = None
+            for fd in self._wake:
+                os.close(fd)
+
+    def _follow(self, fd):
+        name = os.path.basename(self.filename)
+        try:
+            while True:
+                readable, _, _ = select.select([fd, self._wake[0]], [], [])
+                if self._wake[0] in readable:
+                    return
+                # Wait for the rewrite to settle, one read for a burst of events
+                relevant = False
+                while readable:
+                    try:
+                        data = os.read(fd, 65536)
+                    except BlockingIOError:
+                        data = b''
+                    for mask, event_name in parse_events(data):
+                        relevant = relevant or event_name == name or bool(mask & IN_Q_OVERFLOW)
+                    readable, _, _ = select.select([fd], [], [], DEBOUNCE)
+                if relevant:
+                    self.refresh()
+        finally:
+            os.close(fd)
+
+    def wait(self, version=0, timeout=None):
+        '''
+        Purpose:
+            Wait for the table to change past version
+        Return:
+            The current version
+        '''
+        with self.changed:
+            self.changed.wait_for(lambda: self.version > version, timeout)
+            return self.version
+
+    def lookup(self, query=''):
+        if self.thread == None:
+            self.refresh()
+        with self.lock:
+            return self.table.lookup(query)
+
+    def leases(self):
+        if self.thread == None:
+            self.refresh()
+        with self.lock:
+            return self.table.leases()
+
+
+def describe(lease, now=None):
+    '''
+    Return:
+        One line describing lease, for the clients view
+    '''
+    if now == None:
+        now = time.time()
+    if lease.expires == 0:
+        remaining = 'infinite'
+    else:
+        seconds = max(0, int(lease.expires - now))
+        remaining = f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{lease.ip.ljust(15)} | {lease.mac} | {(lease.hostname or '*').ljust(20)} | {remaining}"
+
+
+def follow(filename=LEASE_FILE):
+    '''
+    Purpose:
+        Print the clients, then every client joining or leaving.
+        Runs until interrupted (Ctrl+C / SIGINT).
+    '''
+    def report(joined, left, renewed):
+        for lease in joined:
+            print("\x1b[32m[+]\x1b[0m "+describe(lease))
+        for lease in left:
+            print("\x1b[31m[-]\x1b[0m "+describe(lease))
+
+    monitor = LeaseMonitor(filename)
+    following = monitor.start()
+    leases = monitor.leases()
+    print("\x1b[34m[?]\x1b[0m Clients         : "+str(len(leases)))
+    for lease in leases:
+        print(" "*4+describe(lease))
+    if not following:
+        print(" "*4+"Unable to follow "+filename)
+        return 1
+    monitor.callback = report
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n\x1b[34m[?]\x1b[0m Clients         : Stopped")
+    finally:
+        monitor.stop()
+    return 0
@@ -3,6 +3,8 @@
 '''
 
 import configurations
+import leases
+import watcher
 
 class AP_Setup():
     def __init__(self,
@@ -13,7 +15,8 @@ class AP_Setup():
         ini_file,               # String
         persistence_achieved,   # Boolean
         test,                   # Boolean (For testing purposes)
-        autoaccept              # Boolean
+        autoaccept,             # Boolean
+        wifinames=None          # List of strings, every wireless interface
     ):    
         self.verbose = verbose
         self.internet_status =  internet_status
@@ -23,8 +26,12 @@ class AP_Setup():
         self.persistence_achieved = persistence_achieved
         self.test = test
         self.autoaccept = autoaccept
+        self.wifinames = wifinames if wifinames != None else [wifiname]
 
         self.ap_type = None
+        self.settings = None
+        self.radios = {}        # configurations.ini_radios, when several radios are APs
+        self.leases = None      # leases.LeaseMonitor, started on first use
 
     def logic_skeleton(self):
         '''
@@ -44,6 +51,7 @@ class AP_Setup():
             'password': None,               # str
             'range_from': "10.10.10.100",   # str
             'range_to': "10.10.10.255",     # str
+            'netmask': None,                # str
             'channel': "1",                 # str
             'persistence': None             # str
         }
@@ -53,12 +61,14 @@ class AP_Setup():
             print(" "*4+"1. Tear down AP and restore connectivity")
             print(" "*4+"2. Disable persistence")
             print(" "*4+"3. Create persistence")
-            print(" "*4+"4. Set up an Access Point\n")
-            choice = input("Make your choice (0/1/2/3/4):\n")
+            print(" "*4+"4. Set up an Access Point")
+            print(" "*4+"5. Change the running Access Point (channel, clients)")
+            print(" "*4+"6. Show the connected clients\n")
+            choice = input("Make your choice (0/1/2/3/4/5/6):\n")
 
             try:
-                if not (0 <= int(choice) <= 4):
-                    print("Input must be in the range of 0 to 4. Please try again.")
+                if not (0 <= int(choice) <= 6):
+                    print("Input must be in the range of 0 to 6. Please try again.")
                     continue
             except ValueError:
                 print("Invalid input. Please enter a valid integer.")
@@ -66,7 +76,7 @@ class AP_Setup():
                 exit(0)
             elif int(choice) == 1:
                 print("Removing isolation")
-                configurations.remove_isolation(self.verbose)
+                configurations.remove_isolation(self.verbose, self.wifinames)
             elif int(choice) == 2:
                 print("Disabling persistence")
                 status = configurations.persistence_status()
@@ -84,13 +94,14 @@ class AP_Setup():
                 print("      accounted for once persistence have been set.")
                 # Time to get the range_from and range_to from the /etc/dnsmasq.conf file
                 # and then by extension an IP which can be used
-                ip = configurations.retrieve_ip_from_conf(self.verbose)
-                if ip == None:
+                address = configurations.address_from_conf(self.verbose)
+                if not address:
                     print("Unable to create persistence, as it was not possible")
                     print("to retrive a range, to generate a static IP needed for")
                     print("correctly configuring a dhcp server.")
                     continue
-                configurations.persistence_create(ip, self.wifiname, '', self.verbose)
+                ip, prefix = address
+                configurations.persistence_create(ip, self.wifiname, '', self.verbose, prefix)
             elif int(choice) == 4:
                 # I hate you
                 print("Manually updating the Access Point")
@@ -193,6 +204,52 @@ class AP_Setup():
                 else:
                     print("Failed setting up an AP ")
                 ## End choice 4
+            elif int(choice) == 5:
+                # Applied through the control interface of hostapd, no restart
+                live = configurations.live_status(self.wifiname)
+                if live == None:
+                    print("Unable to reach hostapd on "+self.wifiname+", is the AP running?")
+                    continue
+                status, stations = live
+                print(" "*4+"State           : "+status.get('state', ''))
+                print(" "*4+"SSID            : "+status.get('ssid[0]', ''))
+                print(" "*4+"Channel         : "+status.get('channel', ''))
+                print(" "*4+f"Clients         : {len(stations)}")
+                for mac, values in stations.items():
+                    print(" "*22+f"{mac} | connected {values.get('connected_time', '?')}s")
+
+                user_input = input("OPTIONAL: Select a new channel (1-11)\n")
+                if user_input != '':
+                    try:
+                        if 1 <= int(user_input) <= 11:
+                            if configurations.change_channel(self.wifiname, user_input, self.verbose):
+                                print("    Channel changed")
+                            else:
+                                print("    Channel change failed")
+                        else:
+                            print("    Channel rejected")
+                    except ValueError:
+                        print("    Channel rejected")
+
+                user_input = input("OPTIONAL: MAC address of a client to disconnect\n")
+                if user_input != '':
+                    if user_input.lower() in stations and configurations.disconnect_station(self.wifiname, user_input, self.verbose):
+                        print("    Client disconnected")
+                    else:
+                        print("    Unknown client, or disconnecting it failed")
+            elif int(choice) == 6:
+                # Followed from now on, later views answer from memory
+                if self.leases == None:
+                    self.leases = leases.LeaseMonitor()
+                    self.leases.start()
+                user_input = input("OPTIONAL: MAC address, IP or hostname to look up\n")
+                if user_input != '':
+                    found = self.leases.lookup(user_input)
+                else:
+                    found = self.leases.leases()
+                print(" "*4+f"Clients         : {len(found)}")
+                for lease in found:
+                    print(" "*4+leases.describe(lease))
             else: # Choice not reckognized
                 print("Choice not reckognized")
                 continue
@@ -252,6 +309,26 @@ class AP_Setup():
         if ini_verified:
             tmp = configurations.ini_populate(settings, self.verbose)
             settings = tmp
+            self.settings = settings
+
+            # Sections named after interfaces make every one of them an AP,
+            # [bss:...] sections add SSIDs to them
+            radios = configurations.ini_radios(self.ini_file, self.verbose)
+            if radios == None:
+                print("\x1b[34m[?]\x1b[0m .ini file       : Radios \x1b[5;34;41mREJECTED\x1b[0m")
+                return False
+            missing = [name for name in radios if name not in self.wifinames]
+            if len(missing) > 0:
+                print("\x1b[34m[?]\x1b[0m .ini file       : Unknown wireless interface(s) "+', '.join(missing))
+                return False
+            self.radios = radios
+            if len(radios) > 0:
+                for name, radio in configurations.radio_interfaces(radios):
+                    kind = "Radio" if name in radios else "BSS"
+                    print(" "*4+f"{kind} {name}".ljust(16)+": "+f"{radio['ssid']}, {radio['range_from']} - {radio['range_to']}")
+                if self.test:
+                    print("\x1b[46m[?]\x1b[0m .ini file"+" "*7+": \x1b[46mTEST\x1b[0m accepted")
+                    return True
 
         # Time to implement
         # Remember to create/update the hostapd.conf and dnsmasq.conf
@@ -310,6 +387,8 @@ class AP_Setup():
                         print(" "*22+f"{key.ljust(max_key_length)} | {value}")
                 if self.verbose:
                     print(" "*4+"Executing commands: (\x1b[31mRED\033[0m - Fail, \x1b[32mGREEN\033[0m - Success, \x1b[34mBLUE\033[0m - Info)")
+                if len(radios) > 0:
+                    return configurations.update_radios(radios, self.verbose)
                 result = configurations.update_ap(settings,self.wifiname, self.verbose)
                 return result
             else:
@@ -321,5 +400,38 @@ class AP_Setup():
             return False
 
 
-
-
+    def watch(self):
+        '''
+        Purpose:
+            Watch the wifi adapter, and re-apply the AP
+            every time it comes back after a reset or replug.
+            The IP is derived from /etc/dnsmasq.conf, the
+            MAC address from the .ini file, if one was used.
+            With several radios, every one of them is watched
+            and re-applied on its own.
+        Return:
+            Exit code, 0 when stopped normally
+        '''
+        if len(self.radios) > 0:
+            watcher.watch(
+                list(self.radios),
+                lambda name: configurations.reapply_radio(name, self.radios, self.verbose),
+                self.verbose
+            )
+            return 0
+        address = configurations.address_from_conf(self.verbose)
+        if not address:
+            print("Unable to watch the adapter, as it was not possible")
+            print("to retrieve a range from /etc/dnsmasq.conf, to generate")
+            print("the static IP of the AP.")
+            return 1
+        ip, prefix = address
+        mac_address = None
+        if self.settings != None:
+            mac_address = self.settings['mac_address']
+        watcher.watch(
+            self.wifiname,
+            lambda name: configurations.reapply_ap(ip, name, mac_address, self.verbose, prefix),
+            self.verbose
+        )
+        return 0
@@ -0,0 +1,174 @@
+'''
+Purpose:
+    Minimal rtnetlink (NETLINK_ROUTE) client.
+    Used to list every network link with a single RTM_GETLINK
+    dump, instead of walking /sys/class/net file by file.
+Note:
+    Only the message types and attributes the tool needs are
+    decoded. Constants are from linux/netlink.h, linux/rtnetlink.h
+    and linux/if_link.h.
+'''
+
+import os
+import socket
+import struct
+import time
+
+NETLINK_ROUTE = 0
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_GETLINK = 18
+
+NLM_F_REQUEST = 0x1
+NLM_F_MULTI = 0x2
+NLM_F_DUMP = 0x300
+
+RTNLGRP_LINK = 1
+
+IFLA_ADDRESS = 1
+IFLA_IFNAME = 3
+IFLA_OPERSTATE = 16
+IFLA_LINKINFO = 18
+IFLA_PARENT_DEV_NAME = 56
+IFLA_INFO_KIND = 1
+
+IFF_UP = 0x1
+
+OPERSTATES = ['unknown', 'notpresent', 'down', 'lowerlayerdown', 'testing', 'dormant', 'up']
+
+_NLMSGHDR = struct.Struct('=IHHII')     # length, type, flags, sequence, pid
+_IFINFOMSG = struct.Struct('=BxHiII')   # family, type, index, flags, change
+_RTATTR = struct.Struct('=HH')          # length, type
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def parse_attributes(data, offset=0):
+    '''
+    Return:
+        Dictionary mapping attribute type to its raw payload
+    '''
+    attributes = {}
+    while offset + _RTATTR.size <= len(data):
+        length, kind = _RTATTR.unpack_from(data, offset)
+        if length < _RTATTR.size:
+            break
+        attributes[kind & 0x3fff] = data[offset + _RTATTR.size:offset + length]
+        offset += _align(length)
+    return attributes
+
+
+def parse_messages(data, sequence=None, pid=None):
+    '''
+    Purpose:
+        Split a datagram into its netlink messages
+    Arguments:
+        sequence, pid: Keep only the messages with this sequence
+                       number and port id (the replies to a request)
+    Return:
+        List of (type, flags, payload)
+    '''
+    messages = []
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(data):
+        length, kind, flags, message_sequence, message_pid = _NLMSGHDR.unpack_from(data, offset)
+        if length < _NLMSGHDR.size:
+            break
+        if (sequence == None or message_sequence == sequence) and (pid == None or message_pid == pid):
+            messages.append((kind, flags, data[offset + _NLMSGHDR.size:offset + length]))
+        offset += _align(length)
+    return messages
+
+
+def _string(value):
+    return value.split(b'\0', 1)[0].decode()
+
+
+def parse_link(payload):
+    '''
+    Purpose:
+        Decode the ifinfomsg and attributes of an RTM_NEWLINK/RTM_DELLINK
+    Return:
+        Dictionary with index, type, flags, name, mac, operstate,
+        kind (IFLA_INFO_KIND, virtual links only) and parent
+        (IFLA_PARENT_DEV_NAME, hardware backed links on newer kernels)
+    '''
+    _, link_type, index, flags, _ = _IFINFOMSG.unpack_from(payload, 0)
+    attributes = parse_attributes(payload, _IFINFOMSG.size)
+    link = {
+        'index': index,
+        'type': link_type,
+        'flags': flags,
+        'name': None,
+        'mac': None,
+        'operstate': None,
+        'kind': None,
+        'parent': None
+    }
+    if IFLA_IFNAME in attributes:
+        link['name'] = _string(attributes[IFLA_IFNAME])
+    if IFLA_ADDRESS in attributes:
+        link['mac'] = ':'.join(f'{byte:02x}' for byte in attributes[IFLA_ADDRESS])
+    if IFLA_OPERSTATE in attributes:
+        state = attributes[IFLA_OPERSTATE][0]
+        link['operstate'] = OPERSTATES[state] if state < len(OPERSTATES) else str(state)
+    if IFLA_LINKINFO in attributes:
+        info = parse_attributes(attributes[IFLA_LINKINFO])
+        if IFLA_INFO_KIND in info:
+            link['kind'] = _string(info[IFLA_INFO_KIND])
+    if IFLA_PARENT_DEV_NAME in attributes:
+        link['parent'] = _string(attributes[IFLA_PARENT_DEV_NAME])
+    return link
+
+
+def open_socket(groups=0):
+    '''
+    Purpose:
+        NETLINK_ROUTE socket, subscribed to the groups bitmask
+    '''
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    try:
+        sock.bind((0, groups))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def dump_links():
+    '''
+    Purpose:
+        Every link on the machine, from one RTM_GETLINK dump
+    Return:
+        List of dictionaries, see parse_link
+    Raise:
+        OSError if netlink is unavailable or the dump fails
+    '''
+    links = []
+    with open_socket() as sock:
+        # The kernel answers with our sequence number and port id
+        sequence = int(time.time()) & 0xffffffff
+        pid = sock.getsockname()[0]
+        request = _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)
+        header = _NLMSGHDR.pack(_NLMSGHDR.size + len(request), RTM_GETLINK,
+                                NLM_F_REQUEST | NLM_F_DUMP, sequence, 0)
+        sock.send(header + request)
+        while True:
+            # The size of the next datagram, which is then read whole
+            size = sock.recv_into(bytearray(_NLMSGHDR.size), _NLMSGHDR.size, socket.MSG_PEEK | socket.MSG_TRUNC)
+            data = sock.recv(max(size, _NLMSGHDR.size))
+            for kind, _, payload in parse_messages(data, sequence, pid):
+                if kind == NLMSG_DONE:
+                    return links
+                if kind == NLMSG_ERROR:
+                    error = -struct.unpack_from('=i', payload)[0]
+                    if error:
+                        raise OSError(error, os.strerror(error))
+                    return links
+                if kind == RTM_NEWLINK:
+                    links.append(parse_link(payload))
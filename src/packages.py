@@ -0,0 +1,127 @@
+'''
+Purpose:
+    Determine which packages are installed, answering for the
+    whole requirements list at once instead of spawning a
+    'dpkg -s [PACKAGE]' process per package.
+    The dpkg status database is parsed directly, and the parsed
+    result is cached on disk keyed on the mtime of the status file,
+    so repeated runs only pay for reading a small cache file.
+    Should the status file be unavailable, a single batched
+    'dpkg-query' call is used instead.
+'''
+
+import json
+import os
+import subprocess
+
+DPKG_STATUS = '/var/lib/dpkg/status'
+CACHE_FILE = '/run/ap_setup/packages.json'
+
+# In-process cache, (status_file, mtime_ns, size) -> set of package names
+_installed = {}
+
+
+def _status_key(status_file):
+    info = os.stat(status_file)
+    return [status_file, info.st_mtime_ns, info.st_size]
+
+
+def parse_status(status_file=DPKG_STATUS):
+    '''
+    Purpose:
+        Read the dpkg status database and collect the names
+        of every package in the 'install ok installed' state.
+    Return:
+        A set of package names
+    '''
+    installed = set()
+    package = None
+    with open(status_file, 'rb') as file:
+        for line in file:
+            if line.startswith(b'Package:'):
+                package = line[8:].strip().decode('utf-8', 'replace')
+            elif line.startswith(b'Status:'):
+                if package is not None and line.split()[-1] == b'installed':
+                    installed.add(package)
+            elif line.strip() == b'':
+                package = None
+    return installed
+
+
+def _read_cache(key, cache_file):
+    try:
+        with open(cache_file, 'r') as file:
+            content = json.load(file)
+        if content.get('key') == key:
+            return set(content['installed'])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _write_cache(key, installed, cache_file):
+    '''
+    Purpose:
+        Store the parsed status database. Failing to do so
+        (read-only or missing /run) is not an error.
+    '''
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp = cache_file + '.tmp'
+        with open(tmp, 'w') as file:
+            json.dump({'key': key, 'installed': sorted(installed)}, file)
+        os.replace(tmp, cache_file)
+    except OSError:
+        pass
+
+
+def installed_packages(status_file=DPKG_STATUS, cache_file=CACHE_FILE):
+    '''
+    Purpose:
+        The set of installed packages, from memory, from the
+        on-disk cache or by parsing the status file, whichever
+        is the first to match the current mtime of the status file.
+    '''
+    key = _status_key(status_file)
+    if tuple(key) in _installed:
+        return _installed[tuple(key)]
+    installed = None
+    if cache_file:
+        installed = _read_cache(key, cache_file)
+    if installed is None:
+        installed = parse_status(status_file)
+        if cache_file:
+            _write_cache(key, installed, cache_file)
+    _installed.clear()
+    _installed[tuple(key)] = installed
+    return installed
+
+
+def _query_installed(packages=[]):
+    '''
+    Purpose:
+        Fallback for systems without a readable status file.
+        One 'dpkg-query' call covering every package.
+    '''
+    command = ['dpkg-query', '-W', '-f=${Package} ${Status}\n'] + list(packages)
+    result = subprocess.run(command, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    installed = set()
+    for line in result.stdout.splitlines():
+        fields = line.split()
+        if len(fields) >= 2 and fields[-1] == 'installed':
+            installed.add(fields[0])
+    return installed
+
+
+def missing_packages(packages=[], status_file=DPKG_STATUS, cache_file=CACHE_FILE):
+    '''
+    Purpose:
+        Review a list of package names in one pass
+    Return:
+        The packages which are not installed, in the supplied order
+    '''
+    try:
+        installed = installed_packages(status_file, cache_file)
+    except OSError:
+        installed = _query_installed(packages)
+    return [package for package in packages if package not in installed]
@@ -0,0 +1,157 @@
+'''
+Purpose:
+    Run the "System status" checks of tool.py concurrently.
+    Each check is a function which prints its own findings,
+    so the output of every check is buffered and printed
+    afterwards in the order the checks were supplied.
+    The report therefore looks exactly like a sequential run,
+    while the wall-clock time is roughly that of the slowest check.
+    Checks with an invalidation key can be answered from a
+    cache.Cache, replaying the output stored with the result.
+'''
+
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class Check():
+    def __init__(self,
+        name,           # String, key of the result
+        function,       # Callable, receives a dict with the results it depends on
+        depends=(),     # Iterable of check names which must finish first
+        key=None,       # Callable, same argument as function, returns the cache key
+        ttl=None        # Seconds a cached result stays valid, None for no limit
+    ):
+        self.name = name
+        self.function = function
+        self.depends = tuple(depends)
+        self.key = key
+        self.ttl = ttl
+
+
+class _ThreadOutput():
+    '''
+    Purpose:
+        Stand-in for sys.stdout while the checks run.
+        Text printed from a thread owning a buffer is kept
+        in that buffer, everything else goes to the real stream.
+    '''
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is None:
+            return self.stream.write(text)
+        buffer.append(text)
+        return len(text)
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def _capture(function, arguments, buffer):
+    '''
+    Purpose:
+        Execute function inside a worker thread, with its
+        printed output directed into buffer.
+    '''
+    proxy = sys.stdout
+    if isinstance(proxy, _ThreadOutput):
+        proxy.local.buffer = buffer
+    try:
+        return function(arguments)
+    finally:
+        if isinstance(proxy, _ThreadOutput):
+            proxy.local.buffer = None
+
+
+def _execute(check, arguments, buffer, cache):
+    '''
+    Purpose:
+        Answer a check from the cache when its key still matches,
+        otherwise run it and store the result along with its output.
+    '''
+    key = None
+    if cache is not None and check.key is not None:
+        key = check.key(arguments)
+        entry = cache.get(check.name, key, check.ttl)
+        if entry is not None:
+            buffer.append(entry['output'])
+            return entry['value']
+    value = _capture(check.function, arguments, buffer)
+    if key is not None:
+        cache.put(check.name, key, value, ''.join(buffer))
+    return value
+
+
+def run_checks(checks=[], max_workers=None, cache=None):
+    '''
+    Purpose:
+        Run the checks on a thread pool, starting each check
+        as soon as the checks it depends on have finished.
+    Note:
+        If a check raises (this includes exit()), the output of
+        the checks before it is printed and the exception re-raised,
+        as it would have been in a sequential run.
+        Checks depending on a failed check are never started.
+        Failed checks are never cached.
+    Return:
+        A dictionary mapping each check name to its result
+    '''
+    order = [check.name for check in checks]
+    pending = {check.name: check for check in checks}
+    for check in checks:
+        for dependency in check.depends:
+            if dependency not in pending:
+                raise ValueError(f"Check '{check.name}' depends on unknown check '{dependency}'")
+
+    results = {}
+    errors = {}
+    outputs = {name: [] for name in order}
+    running = {}
+
+    stream = sys.stdout
+    sys.stdout = _ThreadOutput(stream)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers or max(len(checks), 1)) as pool:
+            while pending or running:
+                for name, check in list(pending.items()):
+                    failed = [dep for dep in check.depends if dep in errors]
+                    if failed:
+                        # Never started, report the failure of the dependency instead
+                        errors[name] = errors[failed[0]]
+                        del pending[name]
+                    elif all(dep in results for dep in check.depends):
+                        arguments = {dep: results[dep] for dep in check.depends}
+                        future = pool.submit(_execute, check, arguments, outputs[name], cache)
+                        running[future] = name
+                        del pending[name]
+                if not running:
+                    if pending:
+                        raise ValueError("Circular dependency between checks: " + ', '.join(pending))
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except BaseException as e:
+                        errors[name] = e
+    finally:
+        sys.stdout = stream
+        if cache is not None:
+            cache.save()
+
+    for name in order:
+        stream.write(''.join(outputs[name]))
+        if name in errors:
+            stream.flush()
+            raise errors[name]
+    return results
@@ -1,7 +1,11 @@
 import os
-import subprocess
-import sys
-import configurations
+import pwd
+import time
+import cache
+import history
+import inventory
+import packages
+import probe
 
 def get_model(location='/proc/cpuinfo'):
     '''
@@ -9,41 +13,23 @@ def get_model(location='/proc/cpuinfo'):
         Get the hardware model of the RPi
         Essentially this command
             cat /proc/cpuinfo | grep Model | cut -d: -f2
-        along with some additional safety mechanisms.
+        The default file is read once, as part of the hardware
+        inventory snapshot (inventory.py), any other file on its own.
     '''
-    model = None
-    model_info = ""
-    step = 0
-    test = None
     try:
-       with open(location, 'r') as file:
-           for line in file:
-               # Strip leading and trailing whitespaces
-               stripped_line = line.lower().strip()
-               # Check if the stripped line starts with 'Model'
-               if stripped_line.startswith('model'):
-                   model_info = line.strip()
-                   break  # Optional: break after finding the first match if only one is expected
-    except Exception as e:
+        if location == inventory.CPUINFO and location not in inventory.snapshot().errors:
+            model = inventory.snapshot().model
+        else:
+            model, _ = inventory.read_cpuinfo(location)
+    except OSError:
         print("\x1b[31m[!]\x1b[0m Model           : Unable to determine")
         print(" "*22+"'"+location+"'"+" not found")
-        model = None
-        return model
-    for char in model_info:
-        step += 1
-        ascii_value = ord(char)  # Get ASCII value using ord()
-#        print(f"'{char}' : {ascii_value}")
-        if ascii_value == 58:
-            test = step
-            break
+        return None
 
-# Model string is not empty
-    if step > 4 and step != len(model_info):
-        model = model_info[test:].strip()
+    if model != None:
         print("\x1b[32m[+]\x1b[0m Model           : "+model)
     else: # Model string is missing or empty
         print("\x1b[31m[!]\x1b[0m Model           : Unable to determine")
-        model = None
     return model
 
 
@@ -66,55 +52,56 @@ def check_date(test = 0):
         print("\x1b[33m[?]\x1b[0m Date review     : Skipped for testing")
         return test
     outcome = 0
-    result1 = 0
-    result2 = 0
-    name = os.getlogin()
+    latest = None
+    HISTFILE1, HISTFILE2 = history_files()
+    state = cache.Cache(history.STATE_FILE)
     '''
     Always check root's history file
+    Then the history file of the user, if not root
     '''
-    HISTFILE1 = "/root/.bash_history"
-    command1 = 'cat '+HISTFILE1+" | grep 'date -s'"
-    result1 = command_length(command1)
-    if result2 > 0:
-        outcome += 2
-    if name != 'root':
-        '''
-        Check users history file
-        '''
-        HISTFILE2 = "/home/"+ name + "/.bash_history"
-        command2 = 'cat '+HISTFILE2+" | grep 'sudo date -s'"
-        # Execute the command as a shell command
-        result2 = command_length(command2)
-
-    outcome = len(result1) + len(result2)
+    searches = [(HISTFILE1, 'date -s')]
+    if HISTFILE2 != None:
+        searches.append((HISTFILE2, 'sudo date -s'))
+    for filename, pattern in searches:
+        match = history.last_match(filename, pattern, state)
+        if match == None:
+            continue
+        outcome += 1
+        if match['timestamp'] != None and (latest == None or latest < match['timestamp']):
+            latest = match['timestamp']
+    state.save()
 
     if outcome > 0: 
-        print("\x1b[32m[+]\x1b[0m Date review     : Seems updated")                                    
+        if latest != None:
+            print("\x1b[32m[+]\x1b[0m Date review     : Seems updated, last set "+time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(latest)))
+        else:
+            print("\x1b[32m[+]\x1b[0m Date review     : Seems updated")
     else: # Model string is missing or empty
         print("\x1b[31m[!]\x1b[0m Date review     : Not updated")
 
     return outcome
 
 
-def command_length(command=''):
+def history_files():
     '''
     Purpose:
-        This function call a shell in a subprocess
-        and return the result as a string.
+        The history files reviewed by check_date
     Note:
-        The subprocess method, means that
-        environment variables are not transferred
-        
+        os.getlogin() fails without a controlling terminal (systemd),
+        so the invoking user is taken from sudo, or the current uid.
+    Return:
+        root's history file, and the history file of
+        the invoking user or None if that user is root
     '''
+    name = os.environ.get('SUDO_USER')
     try:
-        # Prepare the command to run in the shell
-#        command = 'history | grep "sudo date -s"'
-        result = subprocess.run(command, shell=True, text=True, capture_output=True)
-        output = result.stdout
-        return output
-    except Exception as e:
-        print(f"An error occurred: {e}")
-
+        if not name:
+            name = pwd.getpwuid(os.getuid()).pw_name
+        if name == 'root':
+            return "/root/.bash_history", None
+        return "/root/.bash_history", os.path.join(pwd.getpwnam(name).pw_dir, ".bash_history")
+    except KeyError:
+        return "/root/.bash_history", None
 
 
 def installed_prerequisites(location='requirements.txt'):
@@ -122,15 +109,17 @@ def installed_prerequisites(location='requirements.txt'):
     Purpose:
         Review if the necessary files have been installed.
         Looks at a requirements.txt file, line by line for packages to review
-        It works by reviewing the return code of a 'dpkg -s [PACKAGE]' command.
+        The whole list is then answered at once by the package
+        status backend (packages.py), rather than one dpkg process per package.
     Note:
-        Due to calling shell commands, extra sanitation is required
+        The package names are sanitised before use, even though
+        the backend no longer passes them to a shell.
     '''
     problems = []
+    package_names = []
     try:
         with open(location, 'r') as file:
             for line in file:
-                result = -1
                 package_name = line.strip()
                 if len(package_name) == 0: # Ignoring empty lines
                     continue
@@ -143,20 +132,7 @@ def installed_prerequisites(location='requirements.txt'):
                     ''' Vulnerability prevention'''
                     print("\x1b[41mSeriously....\x1b[0m")
                     exit(2)
-                try:
-                    # Execute the dpkg command and suppress error messages
-                    result = subprocess.run(['dpkg', '-s', package_name], text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                except Exception as e:
-                    print("\x1b[31m[!]\x1b[0m \x1b[5;34;41mCritical Error\x1b[0m  : ", e)
-                    print("                          Unable to verify if")
-                    print("                          "+package_name)
-                    print("                          is installed")
-                    exit(1)
-                if result.returncode != 0:
-                    '''
-                    Package not installed
-                    '''
-                    problems.append(package_name)
+                package_names.append(package_name)
     except Exception as e:
         print("\x1b[31m[!]\x1b[0m Requirements    : '"+location+"' \x1b[5;34;41mFile not found\x1b[0m")
         print(" "*22+"Unable to determine whether the")
@@ -164,7 +140,16 @@ def installed_prerequisites(location='requirements.txt'):
         print("                      \x1b[41mTerminating the program\x1b[0m")
         exit(1)
 
- 
+    try:
+        problems = packages.missing_packages(package_names)
+    except Exception as e:
+        print("\x1b[31m[!]\x1b[0m \x1b[5;34;41mCritical Error\x1b[0m  : ", e)
+        print("                          Unable to verify if")
+        for package_name in package_names:
+            print("                          "+package_name)
+        print("                          is installed")
+        exit(1)
+
     if len(problems) == 0: 
         print("\x1b[32m[+]\x1b[0m Requirements    : Installed")                                    
     else: # Model string is missing or empty
@@ -177,101 +162,86 @@ def installed_prerequisites(location='requirements.txt'):
 def get_wireless_interfaces(verbose = False):
     '''
     Purpose:
-        Acquire the name of the Wireless Interface
-        Usually "wlan0" on a Raspberry Pi but
-        better be safe, in case 
+        Acquire the names of the Wireless Interfaces
+        Usually "wlan0" on a Raspberry Pi, USB adapters
+        add more, every one of them can serve as AP
+    Return:
+        A list with the names of the wireless interfaces,
+        the first one is the default AP interface
     '''
-    base_path = '/sys/class/net/'
-    wireless_interfaces = []
+    base_path = inventory.NET_PATH
+    machine = inventory.snapshot()
 
-    if not os.path.exists(base_path):
+    if base_path in machine.errors:
         print("\x1b[31m[!]\x1b[0m Error           : Unable to access '/sys/class/net/'.")
         print("                    - Please check your system configuration.")
         exit(1)
-    # Check each interface in /sys/class/net to see if it's wireless
-    for iface in os.listdir(base_path):
-        # Construct the path to the possible wireless directory
-        wireless_path = os.path.join(base_path, iface, 'wireless')
-        
-        # Check if the 'wireless' directory exists
-        if os.path.exists(wireless_path):
-            wireless_interfaces.append(iface)
-    if len(wireless_interfaces) > 1:
-        print("\x1b[31m[!]\x1b[0m \x1b[5;34;41mEdge case\x1b[0m     : Multiple Wireless Interfaces identified")
-        for wlan in wireless_interfaces:
-            print("                    -", wlan)
-        print("    There should not exist multiple interfaces.")
-        print("    Please check if there is an external wifi adapter")
-        print("    If there is, remove it.")
-        exit(1)
-    elif len(wireless_interfaces) == 0:
+    wireless_interfaces = sorted(machine.wireless())
+    if len(wireless_interfaces) == 0:
         print("\x1b[31m[!]\x1b[0m \x1b[5;34;41mEdge case\x1b[0m       : No Wireless Interface located")
         exit(1)
-    else:
-        if verbose:
-            print("\x1b[32m[+]\x1b[0m Interface       : "+wireless_interfaces[0])
-        
-    return wireless_interfaces[0]
+    elif verbose:
+        for wlan in wireless_interfaces:
+            print("\x1b[32m[+]\x1b[0m Interface       : "+wlan)
+
+    return wireless_interfaces
 
 
 def get_ethernet_interfaces(verbose = False):
     '''
     Purpose:
         Locate all ethernet interfaces
+        i.e. hardware backed, not wireless, of type 1
     Return:
-        The name of an ethernate interface if found
-        If none, or multipe are found, return an empty string
+        A list with the names of the ethernet interfaces found
     '''
-    base_path = '/sys/class/net/'
-    ethernet_interfaces = []
-
-    # Loop through all entries in /sys/class/net to find network interfaces
-    for iface_name in os.listdir(base_path):
-        iface_path = os.path.join(base_path, iface_name)
-
-        # Check if the directory has the typical Ethernet interface files
-        if os.path.exists(os.path.join(iface_path, 'device')) and not os.path.exists(os.path.join(iface_path, 'wireless')):
-            # Read the 'type' to ensure it's Ethernet (type 1)
-            try:
-                with open(os.path.join(iface_path, 'type'), 'r') as f:
-                    if f.read().strip() == '1':
-                        ethernet_interfaces.append(iface_name)
-                        if verbose:
-                            print("\x1b[32m[+]\x1b[0m Interface       : "+iface_name)
-            except IOError:
-                continue  # If reading 'type' fails, skip this interface
+    ethernet_interfaces = inventory.snapshot().ethernet()
+    if verbose:
+        for iface_name in ethernet_interfaces:
+            print("\x1b[32m[+]\x1b[0m Interface       : "+iface_name)
 
     return ethernet_interfaces
 
 
-def internet_status(interface, verbose = False):
+def internet_status(interface, verbose = False, host=probe.PROBE_HOST, port=probe.PROBE_PORT):
     '''
     Purpose:
         Check if there is internet connection through
         a specific interface.
+    Return:
+        True if host:port could be reached through interface
     '''
-    url = "http://google.com"
-    status = None
+    return internet_access([interface], verbose, host, port)
+
+
+def internet_access(interfaces=[], verbose = False, host=probe.PROBE_HOST, port=probe.PROBE_PORT, timeout=probe.PROBE_TIMEOUT):
+    '''
+    Purpose:
+        Check if there is internet connection through
+        any of the interfaces.
+        All interfaces are probed concurrently (probe.py),
+        sharing a single timeout, stopping at the first success.
+    Return:
+        True if host:port could be reached through any interface
+    '''
+    target = f"{host}:{port}"
     try:
-        # Using curl to make an HTTP GET request through a specific interface
-        # The -k flag is to proceed even if the timing is off
-        command = ['curl', '--interface', interface, '-k', '-s', '--connect-timeout', '5', url]
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        
-        if verbose:
-            print("\x1b[34m[?]\x1b[0m Checking access : "+ interface)
-        if result.returncode == 0:
-            if verbose:
-                print(" "*22+f"Successfully accessed {url} via {interface}.")
-            status = True
-        else:
-            if verbose:
-                print(" "*22+f"Failed to access {url} via {interface}: {result.stderr}")
-            status = False
+        winner, results = probe.probe(interfaces, host, port, timeout)
     except Exception as e:
-        print("\x1b[31m[!]\x1b[0m Checking access : "+ interface)
-        print(" "*22+f"Error checking internet access: {e}")
-        status = False
+        for interface in interfaces:
+            print("\x1b[31m[!]\x1b[0m Checking access : "+ interface)
+            print(" "*22+f"Error checking internet access: {e}")
+        return False
+    if verbose:
+        for interface in interfaces:
+            print("\x1b[34m[?]\x1b[0m Checking access : "+ interface)
+            if results[interface] == True:
+                print(" "*22+f"Successfully accessed {target} via {interface}.")
+            elif results[interface] == None:
+                print(" "*22+f"Not needed, access already found via {winner}.")
+            else:
+                print(" "*22+f"Failed to access {target} via {interface}: {results[interface]}")
+    return winner != None
 
 
 ###################
@@ -0,0 +1,159 @@
+'''
+Purpose:
+    In-process replacement for 'curl --interface X' used to
+    determine whether there is access to the internet.
+    A TCP connection is attempted through every interface at the
+    same time, each socket being bound to its interface with
+    SO_BINDTODEVICE. All attempts share one deadline, name
+    resolution included, and the probe stops as soon as one of
+    them succeeds.
+'''
+
+import errno
+import fcntl
+import selectors
+import socket
+import struct
+import threading
+import time
+
+PROBE_HOST = 'google.com'
+PROBE_PORT = 80
+PROBE_TIMEOUT = 5
+
+SIOCGIFADDR = 0x8915
+# Not exported by the socket module on every Python version
+SO_BINDTODEVICE = getattr(socket, 'SO_BINDTODEVICE', 25)
+
+
+def interface_address(interface=''):
+    '''
+    Purpose:
+        IPv4 address of an interface, through the SIOCGIFADDR ioctl
+    '''
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        request = struct.pack('256s', interface.encode()[:15])
+        response = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, request)
+    return socket.inet_ntoa(response[20:24])
+
+
+def resolve(host='', port=PROBE_PORT, timeout=PROBE_TIMEOUT):
+    '''
+    Purpose:
+        IPv4 address of host, the lookup being abandoned after
+        timeout. Without an uplink, the resolver of the C library
+        waits for its own, longer timeouts.
+    Return:
+        (address, port)
+    Raise:
+        OSError if host cannot be resolved in time
+    '''
+    try:
+        socket.inet_pton(socket.AF_INET, host)
+        return host, port
+    except OSError:
+        pass
+    answer = {}
+
+    def lookup():
+        try:
+            answer['address'] = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)[0][4]
+        except (OSError, IndexError) as e:
+            answer['error'] = e
+
+    # A daemon thread, a lookup left behind never delays the exit
+    thread = threading.Thread(target=lookup, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise TimeoutError(f"timed out after {timeout}s")
+    if 'error' in answer:
+        raise OSError(str(answer['error']))
+    return answer['address']
+
+
+def _bound_socket(interface=''):
+    '''
+    Purpose:
+        Non-blocking TCP socket which only sends through interface.
+        SO_BINDTODEVICE requires CAP_NET_RAW, without it the socket
+        is bound to the address of the interface instead.
+    '''
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_BINDTODEVICE, interface.encode() + b'\0')
+        except PermissionError:
+            sock.bind((interface_address(interface), 0))
+        sock.setblocking(False)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def probe(interfaces=[], host=PROBE_HOST, port=PROBE_PORT, timeout=PROBE_TIMEOUT):
+    '''
+    Purpose:
+        Attempt to connect to host:port through each interface concurrently.
+    Return:
+        (interface, results)
+        interface: The first interface to connect, or None
+        results: Dictionary mapping each interface to
+                 True for success, an error string for failure,
+                 or None if the attempt was abandoned
+    '''
+    results = {interface: None for interface in interfaces}
+    if not interfaces:
+        return None, results
+    deadline = time.monotonic() + timeout
+    try:
+        address = resolve(host, port, timeout)
+    except OSError as e:
+        for interface in interfaces:
+            results[interface] = f"Unable to resolve {host}: {e}"
+        return None, results
+
+    selector = selectors.DefaultSelector()
+    winner = None
+    try:
+        for interface in interfaces:
+            try:
+                sock = _bound_socket(interface)
+            except OSError as e:
+                results[interface] = str(e)
+                continue
+            code = sock.connect_ex(address)
+            if code == 0:
+                sock.close()
+                results[interface] = True
+                winner = interface
+                break
+            if code not in (errno.EINPROGRESS, errno.EALREADY, errno.EWOULDBLOCK):
+                sock.close()
+                results[interface] = errno.errorcode.get(code, str(code))
+                continue
+            selector.register(sock, selectors.EVENT_WRITE, interface)
+
+        while winner is None and selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in selector.select(remaining):
+                interface = key.data
+                code = key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                selector.unregister(key.fileobj)
+                key.fileobj.close()
+                if code == 0:
+                    results[interface] = True
+                    winner = interface
+                    break
+                results[interface] = errno.errorcode.get(code, str(code))
+
+        for key in list(selector.get_map().values()):
+            if winner is None:
+                results[key.data] = "Timed out"
+            key.fileobj.close()
+    finally:
+        selector.close()
+    return winner, results
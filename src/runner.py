@@ -0,0 +1,130 @@
+'''
+Purpose:
+    Run the shell commands of configurations.py.
+    Every command is a Step, declaring the steps it has to wait for.
+    Independent steps run concurrently on a bounded thread pool, so
+    applying the AP takes as long as its longest chain of commands,
+    rather than the sum of all of them.
+    - depends: steps which must succeed, otherwise the step is skipped
+    - after: steps which must merely have finished, whatever the outcome
+    The commands are executed by the current backend (backend.py).
+'''
+
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+
+try:
+    from . import backend
+except ImportError:
+    import backend
+
+MAX_WORKERS = 4
+
+
+class Step():
+    def __init__(self,
+        name,           # String, unique within a run
+        command,        # List of strings
+        depends=(),     # Iterable of step names which must succeed first
+        after=(),       # Iterable of step names which must finish first
+        input=None      # String sent to the standard input of the command
+    ):
+        self.name = name
+        self.command = command
+        self.depends = tuple(depends)
+        self.after = tuple(after)
+        self.input = input
+
+
+@dataclass(frozen=True)
+class StepResult:
+    name: str
+    command: list
+    returncode: int = None  # None if the step was skipped
+    duration: float = 0.0   # Seconds
+    stdout: str = ''
+    stderr: str = ''
+    started: float = 0.0    # time.monotonic() when it started
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+    @property
+    def skipped(self):
+        return self.returncode is None
+
+
+def _execute(step):
+    start = time.monotonic()
+    try:
+        returncode, stdout, stderr = backend.get_backend().run(step.command, step.input)
+    except OSError as e:
+        # The command could not be started at all, like a shell would report it
+        returncode, stdout, stderr = 127, '', str(e)
+    return StepResult(step.name, step.command, returncode, time.monotonic() - start, stdout, stderr, start)
+
+
+def _report(result):
+    command = ' '.join(result.command)
+    if result.skipped:
+        print(" "*4+"\x1b[34m[?]\033[0m "+f"Skipped \x1b[35m{command}\033[0m")
+    elif result.returncode == 127 and result.stdout == '' and result.stderr != '':
+        print(" "*4+f"\x1b[41m[!] Error executing command\033[0m:\n"+" "*4+f"\x1b[35m{command}\033[0m\n    Error: {result.stderr}")
+    elif result.ok:
+        print(" "*4+"\x1b[32m[+]\033[0m "+f"\x1b[35m{command}\033[0m")
+    else:
+        print(" "*4+"\x1b[31m[!]\033[0m "+f"\x1b[35m{command}\033[0m")
+
+
+def run_steps(steps=[], max_workers=MAX_WORKERS, verbose=False):
+    '''
+    Purpose:
+        Run every step as soon as the steps it waits for have finished.
+        In verbose mode, each step is printed when it finishes.
+    Return:
+        List of StepResult, in the same order as steps
+    '''
+    pending = {step.name: step for step in steps}
+    if len(pending) != len(steps):
+        raise ValueError("Step names must be unique")
+    for step in steps:
+        for dependency in step.depends + step.after:
+            if dependency not in pending:
+                raise ValueError(f"Step '{step.name}' waits for unknown step '{dependency}'")
+
+    results = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            ready = True
+            while ready:
+                # Skipping a step can make the steps waiting for it ready
+                ready = False
+                for name, step in list(pending.items()):
+                    if not all(dep in results for dep in step.depends + step.after):
+                        continue
+                    del pending[name]
+                    if all(results[dep].ok for dep in step.depends):
+                        running[pool.submit(_execute, step)] = name
+                    else:
+                        results[name] = StepResult(name, step.command)
+                        ready = True
+                        if verbose:
+                            _report(results[name])
+            if not running:
+                if pending:
+                    raise ValueError("Circular dependency between steps: " + ', '.join(pending))
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+                if verbose:
+                    _report(results[name])
+    return [results[step.name] for step in steps]
+
+
+def succeeded(results=[]):
+    return all(result.ok for result in results)
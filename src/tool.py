@@ -1,10 +1,17 @@
 import argparse
+import json
 import os
 
 
 # Additional files
+import cache
+import fleet
+import leases
+import packages
 import preparations
+import preflight
 import user_info
+import validate
 #import user_decision
 from logic import AP_Setup
 
@@ -21,6 +28,17 @@ parser.add_argument('-v', action='store_true', help="Verbose mode")
 parser.add_argument('-i', type=str, default=None,
                     help='Name of the .ini file to be used')
 parser.add_argument('-y', action='store_true', help="Auto accept for faster setup")
+parser.add_argument('--fresh', action='store_true', help="Ignore cached preflight results")
+parser.add_argument('-w', action='store_true', help="Watch the wifi adapter and re-apply the AP of -i when it comes back")
+parser.add_argument('--status', action='store_true', help="Print the health of the AP as JSON and exit (0 healthy, 1 not)")
+parser.add_argument('--clients', action='store_true', help="Print the DHCP clients, then every client joining or leaving")
+parser.add_argument('--fleet', type=str, default=None, metavar='INVENTORY',
+                    help="Apply the .ini file (-i) to every host of INVENTORY over SSH")
+parser.add_argument('--jobs', type=int, default=fleet.MAX_HOSTS,
+                    help=f"Hosts applied at once with --fleet (default {fleet.MAX_HOSTS})")
+commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+validate.add_arguments(commands.add_parser('validate', help="Check .ini files without applying them (no root needed)",
+    description='Validate .ini files without applying them.'))
 
 
 if __name__ == "__main__":
@@ -54,6 +72,39 @@ if __name__ == "__main__":
     if args.i:
         ini_file = args.i
 
+    if args.command == 'validate':
+        # Checks .ini files only, no preflight and no root needed
+        exit(validate.run(args))
+
+    if args.status:
+        # Meant for monitoring, so nothing but the JSON is printed
+        try:
+            with open(requirements_file, 'r') as file:
+                package_names = [line.strip() for line in file if line.strip() != '']
+        except OSError as e:
+            # i.e. run outside of the project directory
+            health = {
+                'healthy': False,
+                'wifiname': None,
+                'radios': [],
+                'checks': {'packages': {'ok': False, 'detail': f"Unable to read {requirements_file}: {e.strerror}"}},
+                'elapsed': 0.0
+            }
+        else:
+            health = user_info.project_status(packages.missing_packages(package_names))
+        print(json.dumps(health, indent=4))
+        exit(0 if health['healthy'] else 1)
+
+    if args.clients:
+        exit(leases.follow())
+
+    if args.fleet:
+        # Every host runs its own preflight, none is needed here
+        if not args.i:
+            print("\x1b[31m[!]\033[0m Fleet           : an .ini file is required (-i)")
+            exit(1)
+        exit(fleet.run(args.fleet, args.i, args.jobs, verbose))
+
 ####################################
     print("\x1b[44mConfiguration tool\x1b[0m")
     print(25*"=")
@@ -61,19 +112,37 @@ if __name__ == "__main__":
 
     '''
     Verifying the current status of the machine
+    Independent checks run concurrently, the internet probes wait
+    for the interface names. Results are printed in a fixed order.
     '''
-    model = preparations.get_model(model_file) # default argument, "/proc/cpuinfo"
-    fixed_date = preparations.check_date(test_date) # test < ? test : run normally
-    missing_packages = preparations.installed_prerequisites(requirements_file)
-    wifiname = preparations.get_wireless_interfaces(verbose)
-    ethernetname = preparations.get_ethernet_interfaces(verbose)
-    # Check if there is access to the internet through each separate interface
-    internet_status = preparations.internet_status(wifiname, verbose)
-    for interface in ethernetname:
-        if preparations.internet_status(interface, verbose):
-            if not internet_status:
-                internet_status = True
-    persistence_achieved, _  = preparations.persistence_status(persistence_files, verbose)
+    checks = [
+        preflight.Check('model', lambda r: preparations.get_model(model_file), # default argument, "/proc/cpuinfo"
+            key=lambda r: [cache.file_key(model_file), cache.boot_key()]),
+        preflight.Check('fixed_date', lambda r: preparations.check_date(test_date), # test < ? test : run normally
+            key=lambda r: [test_date] if test_date < 0 else [cache.file_key(f) for f in preparations.history_files() if f != None]),
+        preflight.Check('missing_packages', lambda r: preparations.installed_prerequisites(requirements_file),
+            key=lambda r: [cache.file_key(requirements_file), cache.file_key(packages.DPKG_STATUS)]),
+        preflight.Check('wifinames', lambda r: preparations.get_wireless_interfaces(verbose),
+            key=lambda r: [verbose, cache.interfaces_key()]),
+        preflight.Check('ethernetname', lambda r: preparations.get_ethernet_interfaces(verbose),
+            key=lambda r: [verbose, cache.interfaces_key()]),
+        # Check if there is access to the internet through each separate interface
+        # Connectivity may change at any moment, the result is only reused for a minute
+        preflight.Check('internet_status',
+            lambda r: preparations.internet_access(r['wifinames'] + r['ethernetname'], verbose),
+            depends=['wifinames', 'ethernetname'],
+            key=lambda r: [verbose, r['wifinames'], r['ethernetname']], ttl=60),
+        preflight.Check('persistence', lambda r: preparations.persistence_status(persistence_files, verbose))
+    ]
+    status = preflight.run_checks(checks, cache=cache.Cache(fresh=args.fresh))
+    model = status['model']
+    fixed_date = status['fixed_date']
+    missing_packages = status['missing_packages']
+    wifinames = status['wifinames']
+    wifiname = wifinames[0]
+    ethernetname = status['ethernetname']
+    internet_status = status['internet_status']
+    persistence_achieved, _  = status['persistence']
 
 ####################################
     print(25*"=")
@@ -110,11 +179,15 @@ if __name__ == "__main__":
         ini_file,            # String
         persistence_achieved,# Boolean
         args.q,              # Boolean, test value
-        args.y               # Boolean
+        args.y,              # Boolean
+        wifinames            # List of strings
     )
 
 
     result = AP_logic.ini_choice()
+    # Only an AP configured by this run is watched
+    if args.w and result == True:
+        exit(AP_logic.watch())
     if result == True:
         exit(0)
     elif result == False:
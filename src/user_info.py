@@ -1,4 +1,13 @@
 import subprocess
+import threading
+import time
+
+try:
+    from . import configurations
+    from . import probe
+except ImportError:
+    import configurations
+    import probe
 
 '''
 Purpose:
@@ -74,49 +83,330 @@ def review_requirements(packages=[]):
     return 0
 
 
+PROJECT_BUDGET = 0.05   # Seconds project_status may take
+PROJECT_FILES = {
+    'hostapd': '/etc/hostapd/hostapd.conf',
+    'dnsmasq': '/etc/dnsmasq.conf'
+}
+
+
+def project_radios(filename=PROJECT_FILES['dnsmasq']):
+    '''
+    Purpose:
+        The layout of the AP: the radios of update_radios, each with
+        /etc/hostapd/<interface>.conf and hostapd@<interface>, or the
+        single AP of update_ap
+    Return:
+        (radios, interfaces), radios being empty for the single AP,
+        interfaces listing every interface of dnsmasq.conf
+    '''
+    conf = configurations.read_dnsmasq_radios_conf(filename)
+    if conf == None:
+        return [], []
+    interfaces = list(conf[0])
+    radios = [name for name in interfaces
+        if configurations.read_hostapd_radio_conf(configurations.HOSTAPD_RADIO_FILE.format(name)) != None]
+    return radios, interfaces
+
+
+def _units(radios=[]):
+    # The services of the AP
+    hostapd = ['hostapd@'+wifiname for wifiname in radios] if radios else ['hostapd']
+    return hostapd + ['dnsmasq']
+
+
+def _probe_services(radios=[]):
+    '''
+    Purpose:
+        The services of the AP and ap_setup.service, in one query
+    '''
+    statuses = get_service_status(_units(radios) + ['ap_setup.service'])
+    return all(statuses[unit] == 'Active' for unit in _units(radios)), statuses
+
+
+def _probe_configuration(radios=[]):
+    '''
+    Purpose:
+        Do the files on disk match what the tool would render
+        from the settings found in them?
+    '''
+    details = {}
+    if radios:
+        conf = configurations.read_dnsmasq_radios_conf(PROJECT_FILES['dnsmasq'])
+        found = {}
+        for wifiname in radios:
+            hostapd = configurations.read_hostapd_radio_conf(configurations.HOSTAPD_RADIO_FILE.format(wifiname))
+            if hostapd == None:
+                details['hostapd@'+wifiname] = 'Missing'
+                continue
+            settings, _, content = hostapd
+            rendered = configurations.render_hostapd_radio(settings, wifiname)
+            details['hostapd@'+wifiname] = 'Match' if rendered == content else 'Modified'
+            found[wifiname] = settings
+        if conf == None:
+            details['dnsmasq'] = 'Missing'
+        else:
+            pools, content = conf
+            # The pools of dnsmasq.conf, on the radios and BSS of hostapd
+            for name, settings in configurations.radio_interfaces(found):
+                settings.update(pools.get(name, {'range_from': None}))
+            if any(settings['range_from'] == None for _, settings in configurations.radio_interfaces(found)):
+                details['dnsmasq'] = 'Modified'
+            else:
+                rendered = configurations.render_dnsmasq_radios(found)
+                details['dnsmasq'] = 'Match' if rendered == content else 'Modified'
+        return all(detail == 'Match' for detail in details.values()), details
+
+    hostapd = configurations.read_hostapd_conf(PROJECT_FILES['hostapd'])
+    if hostapd == None:
+        details['hostapd'] = 'Missing'
+    else:
+        settings, wifiname, ap_type, content = hostapd
+        rendered = configurations.render_hostapd(settings, wifiname, ap_type)
+        details['hostapd'] = 'Match' if rendered == content else 'Modified'
+    dnsmasq = configurations.read_dnsmasq_conf(PROJECT_FILES['dnsmasq'])
+    if dnsmasq == None:
+        details['dnsmasq'] = 'Missing'
+    else:
+        settings, wifiname, content = dnsmasq
+        if settings['range_from'] == None:
+            details['dnsmasq'] = 'Modified'
+        else:
+            rendered = configurations.render_dnsmasq(settings, wifiname)
+            details['dnsmasq'] = 'Match' if rendered == content else 'Modified'
+    return all(detail == 'Match' for detail in details.values()), details
+
+
+def _probe_firewall(interfaces=[]):
+    status, missing = configurations.firewall_status(interfaces)
+    if missing == None:
+        return False, 'Unable to read the rules'
+    return status, missing
+
+
+def _probe_persistence():
+    files = configurations.persistence_status()
+    return files, {'files': files}
+
+
+def _probe_address(interfaces=[]):
+    expected = configurations.dnsmasq_addresses(PROJECT_FILES['dnsmasq']) or {}
+    details = {}
+    for wifiname in interfaces:
+        try:
+            actual = probe.interface_address(wifiname)
+        except OSError:
+            actual = None
+        details[wifiname] = {'expected': expected.get(wifiname, (None,))[0], 'actual': actual}
+    ok = len(details) > 0 and all(detail['expected'] != None and detail['expected'] == detail['actual'] for detail in details.values())
+    return ok, details
+
+
+def _run_probes(probes={}, timeout=0):
+    '''
+    Purpose:
+        Run every probe in a daemon thread, waiting at most timeout
+        seconds in all. A probe still running is abandoned, a daemon
+        thread never holds up the exit of the interpreter.
+    Return:
+        probe name -> (ok, detail), None if the probe timed out
+    '''
+    results = {}
+
+    def run(name, function, *arguments):
+        try:
+            results[name] = function(*arguments)
+        except Exception as e:
+            results[name] = (False, str(e))
+
+    deadline = time.monotonic() + timeout
+    threads = [threading.Thread(target=run, args=(name,) + arguments, daemon=True) for name, arguments in probes.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(max(deadline - time.monotonic(), 0))
+    return {name: results.get(name) for name in probes}
+
+
 def project_status(
-        packages=[]
+        packages=[],
+        wifiname=None,
+        budget=PROJECT_BUDGET
     ):
     '''
     Purpose:
         Some logic to determine if system has been
         configured to set up an access point.
+        All probes run concurrently, within a strict time budget,
+        so this can be called every few seconds for monitoring.
+        The layout follows dnsmasq.conf, a single AP or several
+        radios (see project_radios):
+        - hostapd (or every hostapd@<interface>) and dnsmasq running
+        - hostapd.conf (or every <interface>.conf) and dnsmasq.conf
+          as rendered by the tool
+        - DROP policies and ACCEPT rules for every AP interface
+        - Persistence files and ap_setup.service
+        - The address of every AP interface
     Argument:
         If packages are not installed, it is impossible
         that the AP can be setup.
         If packages are up, review the status of daemons
         using systemctl
+        wifiname defaults to the first interface in /etc/dnsmasq.conf
     Return:
+        Dictionary with
+        'healthy': True if every probe apart from persistence passed
+        'wifiname': The interface reviewed
+        'radios' : The radios reviewed, empty for a single AP
+        'checks' : probe name -> {'ok': Boolean, 'detail': ...}
+                   a probe exceeding the budget is reported as 'Timed out'
+        'elapsed': Seconds taken
+    '''
+    start = time.monotonic()
+    if len(packages) > 0:
+        return {
+            'healthy': False,
+            'wifiname': wifiname,
+            'radios': [],
+            'checks': {'packages': {'ok': False, 'detail': list(packages)}},
+            'elapsed': time.monotonic() - start
+        }
+    radios, interfaces = project_radios()
+    if wifiname == None:
+        wifiname = interfaces[0] if interfaces else None
+    if not radios:
+        interfaces = [wifiname] if wifiname != None else []
+    results = _run_probes({
+        'services': (_probe_services, radios),
+        'configuration': (_probe_configuration, radios),
+        'firewall': (_probe_firewall, interfaces),
+        'persistence': (_probe_persistence,),
+        'address': (_probe_address, interfaces)
+    }, max(budget - (time.monotonic() - start), 0))
+
+    checks = {}
+    for name, result in results.items():
+        if result == None:
+            checks[name] = {'ok': False, 'detail': 'Timed out'}
+            continue
+        ok, detail = result
+        checks[name] = {'ok': ok, 'detail': detail}
+    # ap_setup.service was part of the single query of the services,
+    # the reason of a failed query otherwise
+    statuses = checks['services']['detail']
+    setup = statuses.pop('ap_setup.service', None) if isinstance(statuses, dict) else statuses
+    if isinstance(checks['persistence']['detail'], dict):
+        checks['persistence']['detail']['ap_setup.service'] = setup
+    return {
+        'healthy': wifiname != None and all(check['ok'] for name, check in checks.items() if name != 'persistence'),
+        'wifiname': wifiname,
+        'radios': radios,
+        'checks': checks,
+        'elapsed': time.monotonic() - start
+    }
+
+
+SERVICE_TTL = 2  # Seconds a service status is reused
+
+# service -> (time of query, status)
+_service_cache = {}
+
+
+def _classify(properties={}):
+    '''
+    Purpose:
+        Turn the systemctl properties of a unit into
+        Active, Not Found, Masked, Inactive or the ActiveState
+    '''
+    if properties.get('LoadState') == 'loaded' and properties.get('ActiveState') == 'active':
+        return 'Active'
+    elif properties.get('LoadState') == 'not-found':
+        return 'Not Found'
+    elif properties.get('UnitFileState') == 'masked' or properties.get('LoadState') == 'masked':
+        return 'Masked'
+    elif properties.get('ActiveState') == 'inactive':
+        return 'Inactive'
+    return properties.get('ActiveState', 'Error retrieving status')  # Other states like failed, deactivating, etc.
 
 
+def _parse_show(output=''):
     '''
-    pass
+    Purpose:
+        Split the output of 'systemctl show' for several units
+        into one dictionary per unit. Units are separated by an
+        empty line, values may themselves contain '='.
+    '''
+    blocks = []
+    properties = {}
+    for line in output.split('\n'):
+        if line.strip() == '':
+            if properties:
+                blocks.append(properties)
+                properties = {}
+            continue
+        key, _, value = line.partition('=')
+        properties[key] = value
+    if properties:
+        blocks.append(properties)
+    return blocks
 
 
-def get_service_status(service_names):
+def _show(service_names=[]):
+    '''
+    Purpose:
+        Query the units with a single systemctl process
+    Return:
+        List of property dictionaries, in the order of service_names,
+        or None if the output cannot be matched to the units
+    '''
+    command = ['systemctl', 'show', '--property=LoadState,ActiveState,UnitFileState'] + list(service_names)
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    blocks = _parse_show(result.stdout)
+    if len(blocks) != len(service_names):
+        return None
+    return blocks
+
+
+def get_service_status(service_names, ttl=SERVICE_TTL):
+    '''
+    Purpose:
+        Status of several systemd units, queried in one call.
+        Results are reused for ttl seconds, as the status is
+        asked for repeatedly during a single run.
+    Return:
+        Dictionary mapping each service to
+        'Active', 'Inactive', 'Masked', 'Not Found', another
+        ActiveState (failed, ...) or 'Error retrieving status'
+    '''
     statuses = {}
-    
+    now = time.monotonic()
+    missing = []
     for service in service_names:
-        # Query detailed properties of the service
-        result = subprocess.run(['systemctl', 'show', service, '--property=LoadState,ActiveState,UnitFileState'], capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            properties = {line.split('=')[0]: line.split('=')[1] for line in result.stdout.strip().split('\n')}
-            
-            if properties['LoadState'] == 'loaded' and properties['ActiveState'] == 'active':
-                statuses[service] = 'Active'
-            elif properties['LoadState'] == 'not-found':
-                statuses[service] = 'Not Found'
-            elif properties['UnitFileState'] == 'masked':
-                statuses[service] = 'Masked'
-            elif properties['ActiveState'] == 'inactive':
-                statuses[service] = 'Inactive'
-            else:
-                statuses[service] = properties['ActiveState']  # Other states like failed, deactivating, etc.
-        else:
-            statuses[service] = 'Error retrieving status'
+        cached = _service_cache.get(service)
+        if cached != None and now - cached[0] < ttl:
+            statuses[service] = cached[1]
+        elif service not in missing:
+            missing.append(service)
+
+    if missing:
+        blocks = _show(missing)
+        if blocks == None:
+            # A single invalid unit name fails the whole call, ask individually
+            blocks = []
+            for service in missing:
+                block = _show([service])
+                blocks.append(block[0] if block else None)
+        for service, properties in zip(missing, blocks):
+            if properties == None:
+                statuses[service] = 'Error retrieving status'
+                continue
+            statuses[service] = _classify(properties)
+            _service_cache[service] = (now, statuses[service])
+
+    return {service: statuses[service] for service in service_names}
 
-    return statuses
 
 def review_isolation_status(persistence_achieved = None, files =[], verbose = False):
     if persistence_achieved == None:
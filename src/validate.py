@@ -0,0 +1,175 @@
+'''
+Purpose:
+    The validate subcommand, checking .ini files without applying them:
+        python3 src/tool.py validate [--json] PATH [PATH ...]
+    Every PATH is a .ini file, or a directory searched for .ini files.
+    Each file goes through the same steps as ini_choice in logic.py
+    (read_ini_config, determine_ini_ap_type, ini_populate, ini_radios),
+    which read the file and nothing else on the system.
+    The files are validated in a process pool, no preflight is run,
+    and root is not required.
+'''
+
+import configparser
+import contextlib
+import io
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from . import configurations
+except ImportError:
+    import configurations
+
+# Fewer files are validated in this process, a pool costs more than it saves
+POOL_THRESHOLD = 8
+
+_ANSI = re.compile(r'\x1b\[[0-9;]*m')
+
+
+def find_files(paths=[]):
+    '''
+    Return:
+        Every .ini file of paths, in order, each directory sorted.
+        Files named explicitly are kept whatever their extension.
+    '''
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for directory, subdirectories, names in os.walk(path):
+            subdirectories.sort()
+            files += [os.path.join(directory, name) for name in sorted(names) if name.lower().endswith('.ini')]
+    return files
+
+
+def _quietly(function, *args):
+    # The result of function, and the lines it printed, without colours
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = function(*args)
+    return result, [_ANSI.sub('', line).strip() for line in output.getvalue().splitlines() if line.strip() != '']
+
+
+def _type_error(settings={}):
+    encryption = settings.get('encryption')
+    if encryption == None:
+        return "encryption is missing"
+    if encryption.lower() in ('wpa1', 'wpa2'):
+        return f"{encryption} requires a password"
+    return f"unknown encryption '{encryption}'"
+
+
+def validate_file(filename=''):
+    '''
+    Return:
+        Dictionary with the verdict of filename:
+        - file, valid, ap_type
+        - settings: normalised by ini_populate, None if not valid
+        - radios: interface -> normalised settings, for the radio
+          and BSS sections (empty for a single AP)
+        - errors: why it is not valid
+        - warnings: values ini_populate replaced
+    '''
+    verdict = {'file': filename, 'valid': False, 'ap_type': None, 'settings': None,
+        'radios': {}, 'errors': [], 'warnings': []}
+    try:
+        raw, lines = _quietly(configurations.read_ini_config, filename)
+        if raw == None:
+            verdict['errors'] += lines or ["[Settings] section is missing"]
+            return verdict
+        ap_type, _ = _quietly(configurations.determine_ini_ap_type, dict(raw))
+        if ap_type == None:
+            verdict['errors'].append(_type_error(raw))
+            return verdict
+        settings, _ = _quietly(configurations.ini_populate, dict(raw))
+        radios, lines = _quietly(configurations.ini_radios, filename)
+        if radios == None:
+            verdict['errors'] += lines or ["invalid radio sections"]
+            return verdict
+    except (OSError, ValueError, configparser.Error) as e:
+        # i.e. a file which is not text
+        verdict['errors'].append(str(e))
+        return verdict
+
+    if raw['ssid'] == None:
+        verdict['warnings'].append("ssid is missing, picked at random")
+    for key, value in raw.items():
+        if value != None and settings[key] != value:
+            verdict['warnings'].append(f"{key} '{value}' replaced by {settings[key]!r}")
+    verdict.update({
+        'valid': True,
+        'ap_type': ap_type,
+        'settings': settings,
+        'radios': {name: {key: value for key, value in radio.items() if key != 'bss'}
+            for name, radio in configurations.radio_interfaces(radios)}
+    })
+    return verdict
+
+
+def validate_files(files=[], max_workers=None):
+    '''
+    Purpose:
+        validate_file on every file, in a process pool
+        unless there are only a few files
+    Return:
+        List of verdicts, in the same order as files
+    '''
+    if len(files) < POOL_THRESHOLD:
+        return [validate_file(filename) for filename in files]
+    workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(validate_file, files, chunksize=max(1, len(files) // (workers * 4))))
+
+
+def report(verdict={}):
+    '''
+    Return:
+        The text report of a verdict
+    '''
+    if not verdict['valid']:
+        lines = ["\x1b[31m[!]\033[0m "+f"{verdict['file']}: \x1b[5;34;41mREJECTED\x1b[0m"]
+        lines += [" "*4+error for error in verdict['errors']]
+        return '\n'.join(lines)
+    lines = ["\x1b[32m[+]\033[0m "+f"{verdict['file']}: {verdict['ap_type']}"]
+    lines += [" "*4+"Warning: "+warning for warning in verdict['warnings']]
+    max_key_length = max(len(key) for key in verdict['settings'])
+    for key, value in verdict['settings'].items():
+        if value != None:
+            lines.append(" "*22+f"{key.ljust(max_key_length)} | '{value}'")
+    for name, radio in verdict['radios'].items():
+        lines.append(" "*4+f"{name}".ljust(18)+f"{radio['ssid']}, {radio['encryption']}, {radio['range_from']} - {radio['range_to']}")
+    return '\n'.join(lines)
+
+
+def add_arguments(parser):
+    '''
+    Purpose:
+        The arguments of the validate subcommand, added to parser
+    '''
+    parser.add_argument('paths', nargs='+', metavar='PATH', help="A .ini file, or a directory of .ini files")
+    parser.add_argument('--json', action='store_true', help="Print the verdicts as JSON")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per CPU)")
+
+
+def run(args):
+    '''
+    Purpose:
+        The validate subcommand, args as parsed by add_arguments
+    Return:
+        0 if every file is valid, 1 otherwise
+    '''
+    files = find_files(args.paths)
+    verdicts = validate_files(files, args.workers)
+    if args.json:
+        print(json.dumps(verdicts, indent=4))
+    else:
+        for verdict in verdicts:
+            print(report(verdict))
+        valid = len([verdict for verdict in verdicts if verdict['valid']])
+        print(f"{valid} of {len(verdicts)} files valid")
+    return 0 if all(verdict['valid'] for verdict in verdicts) else 1
+
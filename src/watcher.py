@@ -0,0 +1,110 @@
+'''
+Purpose:
+    Keep the AP alive across resets of the wifi adapter.
+    Subscribes to the RTNLGRP_LINK netlink group and reacts the
+    moment a configured interface comes back, after it was
+    removed (USB adapter reset, unplugged and plugged back in),
+    instead of waiting for someone to rerun the tool or reboot.
+'''
+
+import errno
+import time
+
+try:
+    from . import inventory
+    from . import netlink
+except ImportError:
+    import inventory
+    import netlink
+
+
+class LinkTracker():
+    '''
+    Purpose:
+        Follow the presence of one interface through link events.
+        Changes to a present interface (e.g. link down/up, new address)
+        are not a return, which keeps the re-apply from triggering itself.
+    '''
+    def __init__(self, name, index=None):
+        self.name = name        # String
+        self.index = index      # Integer, None while the interface is absent
+
+    def update(self, kind, link):
+        '''
+        Return:
+            True if the interface has just come back
+        '''
+        if link['name'] != self.name:
+            if link['index'] == self.index and kind == netlink.RTM_NEWLINK:
+                # Renamed away, e.g. by udev
+                self.index = None
+            return False
+        if kind == netlink.RTM_DELLINK:
+            self.index = None
+            return False
+        returned = self.index != link['index']
+        self.index = link['index']
+        return returned
+
+
+def _current_index(name):
+    netdev = inventory.snapshot(refresh=True).netdev(name)
+    if netdev == None:
+        return None
+    return netdev.index
+
+
+def watch(wifiname='', action=None, verbose=False):
+    '''
+    Purpose:
+        Call action(interface) every time an interface of
+        wifiname (one interface, or a list of them) comes back.
+        Runs until interrupted (Ctrl+C / SIGINT).
+    '''
+    names = [wifiname] if isinstance(wifiname, str) else list(wifiname)
+    sock = netlink.open_socket(1 << (netlink.RTNLGRP_LINK - 1))
+    # Subscribed before looking, so no event falls in between
+    trackers = [LinkTracker(name, _current_index(name)) for name in names]
+    for tracker in trackers:
+        print("\x1b[34m[?]\x1b[0m Watching        : "+tracker.name)
+        if tracker.index == None:
+            print(" "*22+"Not present, waiting for it to appear")
+    try:
+        while True:
+            returned = []
+            try:
+                data = sock.recv(65536)
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                # Events were dropped, compare with the current state instead
+                for tracker in trackers:
+                    present = tracker.index
+                    tracker.index = _current_index(tracker.name)
+                    if tracker.index != None and tracker.index != present:
+                        returned.append(tracker.name)
+            else:
+                for kind, _, payload in netlink.parse_messages(data):
+                    if kind not in (netlink.RTM_NEWLINK, netlink.RTM_DELLINK):
+                        continue
+                    link = netlink.parse_link(payload)
+                    for tracker in trackers:
+                        present = tracker.index
+                        if tracker.update(kind, link):
+                            returned.append(tracker.name)
+                        elif present != None and tracker.index == None:
+                            print("\x1b[31m[!]\x1b[0m Interface       : "+tracker.name+" removed")
+
+            for name in returned:
+                print("\x1b[32m[+]\x1b[0m Interface       : "+name+" is back, re-applying the AP")
+                start = time.monotonic()
+                status = action(name)
+                duration = time.monotonic() - start
+                if status:
+                    print(" "*22+f"Re-applied in {duration:.1f}s")
+                else:
+                    print(" "*22+f"\x1b[31mRe-apply failed\x1b[0m after {duration:.1f}s")
+    except KeyboardInterrupt:
+        print("\n\x1b[34m[?]\x1b[0m Watching        : Stopped")
+    finally:
+        sock.close()
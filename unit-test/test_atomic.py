@@ -0,0 +1,81 @@
+import unittest
+import os
+import shutil
+import stat
+import tempfile
+import src.atomic as atomic
+from unittest.mock import patch
+
+
+class TestWriteFile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.filename = os.path.join(self.directory, 'dnsmasq.conf')
+        # Never leave immutable files behind
+        mock_immutable = patch('src.atomic.fileattr.set_immutable', return_value=True)
+        self.mock_immutable = mock_immutable.start()
+        self.addCleanup(mock_immutable.stop)
+
+    def test_new_file(self):
+        """A new file gets the default mode, and the immutable flag if asked."""
+        self.assertTrue(atomic.write_file(self.filename, 'content', immutable=True))
+        with open(self.filename) as file:
+            self.assertEqual(file.read(), 'content')
+        self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode), atomic.DEFAULT_MODE)
+        self.mock_immutable.assert_called_once_with(self.filename, True)
+        self.assertEqual(os.listdir(self.directory), ['dnsmasq.conf'])
+
+    def test_replace(self):
+        """The old file is unlocked, replaced by a new inode, and keeps its mode."""
+        with open(self.filename, 'w') as file:
+            file.write('old')
+        os.chmod(self.filename, 0o500)
+        inode = os.stat(self.filename).st_ino
+        self.assertIsNone(atomic.write_file(self.filename, 'new'))
+        self.assertNotEqual(os.stat(self.filename).st_ino, inode)
+        self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode), 0o500)
+        self.mock_immutable.assert_called_once_with(self.filename, False)
+
+    def test_failure_keeps_old(self):
+        """A failed rename leaves the old file and no temporary file."""
+        with open(self.filename, 'w') as file:
+            file.write('old')
+        with patch('src.atomic.os.replace', side_effect=OSError(28, 'No space left on device')):
+            with self.assertRaises(OSError):
+                atomic.write_file(self.filename, 'new', 0o644)
+        with open(self.filename) as file:
+            self.assertEqual(file.read(), 'old')
+        self.assertEqual(os.listdir(self.directory), ['dnsmasq.conf'])
+
+    def test_failure_relocks(self):
+        """A failed write leaves an immutable old file immutable."""
+        with open(self.filename, 'w') as file:
+            file.write('old')
+        with patch('src.atomic.fileattr.is_immutable', return_value=True):
+            with patch('src.atomic.os.replace', side_effect=OSError(28, 'No space left on device')):
+                with self.assertRaises(OSError):
+                    atomic.write_file(self.filename, 'new')
+        self.assertEqual([call[0] for call in self.mock_immutable.call_args_list], [(self.filename, False), (self.filename, True)])
+
+    def test_locked(self):
+        """A file which cannot be unlocked is not replaced."""
+        with open(self.filename, 'w') as file:
+            file.write('old')
+        self.mock_immutable.return_value = False
+        with self.assertRaises(PermissionError):
+            atomic.write_file(self.filename, 'new')
+
+    def test_batch(self):
+        """Every directory is flushed once, at the end of the batch."""
+        other = os.path.join(self.directory, 'hostapd')
+        os.mkdir(other)
+        with patch('src.atomic.fsync_directory') as mock_fsync:
+            with atomic.batch():
+                atomic.write_file(self.filename, 'a')
+                atomic.write_file(os.path.join(other, 'hostapd.conf'), 'b')
+                with atomic.batch():
+                    atomic.write_file(self.filename, 'c')
+                mock_fsync.assert_not_called()
+        self.assertEqual(sorted(call[0][0] for call in mock_fsync.call_args_list), [self.directory, other])
@@ -0,0 +1,338 @@
+import unittest
+import os
+import shutil
+import time
+import src.backend as backend
+import src.configurations as config
+import src.firewall as firewall
+import src.runner as runner
+from unittest.mock import patch
+
+
+SETTINGS = {
+    'ssid': 'TestSSID',
+    'mac_address': '00:1A:2B:3C:4D:5E',
+    'encryption': 'wpa2',
+    'password': 'TestPassphrase',
+    'range_from': '10.10.10.100',
+    'range_to': '10.10.10.200',
+    'channel': '6',
+    'persistence': 'yes'
+}
+
+
+class TestFakeBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = backend.FakeBackend(
+            latency={'sudo systemctl restart': 0.05},
+            failures={'sudo systemctl restart dnsmasq': 1, 'airmon-ng': 127}
+        )
+        self.addCleanup(shutil.rmtree, self.fake.root)
+
+    def test_run(self):
+        """Latency and failures are matched on the command prefix."""
+        self.assertEqual(self.fake.run(['sudo', 'systemctl', 'restart', 'dnsmasq']), (1, '', ''))
+        self.assertEqual(self.fake.run(['sudo', 'systemctl', 'restart', 'hostapd']), (0, '', ''))
+        with self.assertRaises(OSError):
+            self.fake.run(['airmon-ng', 'check', 'kill'])
+        self.assertGreaterEqual(self.fake.events[0].duration, 0.05)
+        self.assertEqual([event.returncode for event in self.fake.events], [1, 0, 127])
+
+    def test_files(self):
+        """Files are redirected under the root."""
+        self.fake.write_file('/etc/dnsmasq.conf', 'content')
+        self.assertTrue(os.path.exists(os.path.join(self.fake.root, 'etc/dnsmasq.conf')))
+        self.assertTrue(self.fake.exists('/etc/dnsmasq.conf'))
+        self.fake.remove('/etc/dnsmasq.conf')
+        self.assertFalse(self.fake.exists('/etc/dnsmasq.conf'))
+        self.assertEqual([event.kind for event in self.fake.events], ['write', 'remove'])
+
+
+class TestHermeticApply(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = backend.FakeBackend(latency={'sudo systemctl restart': 0.1, 'sudo ip': 0.02})
+        self.addCleanup(shutil.rmtree, self.fake.root)
+        self.addCleanup(backend.set_backend, backend.set_backend(self.fake))
+        mock_firewall = patch('src.configurations.firewall.backend', return_value=firewall.IptablesBackend())
+        mock_firewall.start()
+        self.addCleanup(mock_firewall.stop)
+
+    def test_update_ap(self):
+        """The whole apply path runs under the fake root."""
+        start = time.monotonic()
+        self.assertTrue(config.update_ap(dict(SETTINGS), 'wlan0'))
+        elapsed = time.monotonic() - start
+        files = self.fake.files()
+        self.assertEqual(files, [
+            '/etc/dnsmasq.conf',
+            '/etc/hostapd/hostapd.conf',
+            '/root/firewall.sh',
+            '/root/create_ap.sh',
+            '/etc/systemd/system/ap_setup.service'
+        ])
+        for filename in files:
+            self.assertTrue(os.path.exists(self.fake.path(filename)))
+        commands = self.fake.commands()
+        self.assertIn(['sudo', 'iptables-restore'], commands)
+        self.assertIn(['sudo', 'ip', 'link', 'set', 'wlan0', 'address', '00:1A:2B:3C:4D:5E'], commands)
+        locked = [event.target for event in self.fake.events if event.kind == 'immutable']
+        self.assertEqual(locked, files)
+        self.assertFalse([command for command in commands if 'chattr' in command])
+        # Both restarts overlap
+        self.assertLess(elapsed, 0.4)
+        self.assertTrue(config.persistence_status())
+
+    def test_large_pool(self):
+        """The address of the AP carries the prefix of the pool."""
+        settings = dict(SETTINGS)
+        settings['range_from'] = '10.10.8.10'
+        settings['range_to'] = '10.10.11.200'
+        self.assertTrue(config.update_ap(settings, 'wlan0'))
+        self.assertIn(['sudo', 'ip', 'addr', 'add', '10.10.8.1/22', 'dev', 'wlan0'], self.fake.commands())
+        with open(self.fake.path('/root/create_ap.sh')) as file:
+            self.assertIn("sudo ip addr add 10.10.8.1/22 dev wlan0\n", file.read())
+
+    def test_remove(self):
+        """Isolation and persistence are removed without touching the system."""
+        self.assertTrue(config.update_ap(dict(SETTINGS), 'wlan0'))
+        config.remove_isolation(False, 'wlan0')
+        self.assertTrue(config.persistence_remove())
+        self.assertFalse(config.persistence_status())
+        self.assertIn(['sudo', 'systemctl', 'mask', 'hostapd'], self.fake.commands())
+
+
+class TestRadios(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = backend.FakeBackend(latency={'sudo systemctl restart': 0.1})
+        self.addCleanup(shutil.rmtree, self.fake.root)
+        self.addCleanup(backend.set_backend, backend.set_backend(self.fake))
+        mock_firewall = patch('src.configurations.firewall.backend', return_value=firewall.IptablesBackend())
+        mock_firewall.start()
+        self.addCleanup(mock_firewall.stop)
+        second = dict(SETTINGS, ssid='OtherSSID', mac_address=None, range_from='10.10.11.100', range_to='10.10.11.200')
+        self.radios = {'wlan0': dict(SETTINGS), 'wlan1': second}
+
+    def test_update_radios(self):
+        """Every radio gets its own hostapd, all are brought up concurrently."""
+        start = time.monotonic()
+        self.assertTrue(config.update_radios(self.radios))
+        elapsed = time.monotonic() - start
+        files = self.fake.files()
+        self.assertEqual(files[:3], ['/etc/dnsmasq.conf', '/etc/hostapd/wlan0.conf', '/etc/hostapd/wlan1.conf'])
+        commands = self.fake.commands()
+        self.assertIn(['sudo', 'systemctl', 'restart', 'hostapd@wlan0'], commands)
+        self.assertIn(['sudo', 'systemctl', 'restart', 'hostapd@wlan1'], commands)
+        self.assertIn(['sudo', 'ip', 'addr', 'add', '10.10.10.1/24', 'dev', 'wlan0'], commands)
+        self.assertIn(['sudo', 'ip', 'addr', 'add', '10.10.11.1/24', 'dev', 'wlan1'], commands)
+        restore = [event for event in self.fake.events if event.target == ['sudo', 'iptables-restore']]
+        self.assertEqual(len(restore), 1)
+        # hostapd@wlan0, hostapd@wlan1 overlap, dnsmasq follows
+        self.assertLess(elapsed, 0.35)
+        with open(self.fake.path('/root/create_ap.sh')) as file:
+            script = file.read()
+        self.assertIn("sudo systemctl reload-or-restart hostapd@wlan1\n", script)
+        with open(self.fake.path('/root/firewall.sh')) as file:
+            self.assertIn("-A INPUT -i wlan1 -j ACCEPT\n", file.read())
+
+    def test_unchanged(self):
+        """Re-applying the same radios changes nothing, a new SSID restarts its radio only."""
+        self.assertTrue(config.update_radios(self.radios))
+        policies, rules = firewall.IptablesBackend().rules(['wlan0', 'wlan1'])
+        running = backend.FakeBackend(root=self.fake.root, outputs={
+            'ip -o link show dev wlan0': "3: wlan0: <UP> mtu 1500\n    link/ether 00:1a:2b:3c:4d:5e brd ff:ff:ff:ff:ff:ff\n",
+            'ip -4 -o addr show dev wlan0': "3: wlan0    inet 10.10.10.1/24 scope global wlan0\n",
+            'ip -4 -o addr show dev wlan1': "4: wlan1    inet 10.10.11.1/24 scope global wlan1\n",
+            'systemctl is-active': "inactive\nactive\nactive\nactive\n",
+            'iptables -S': '\n'.join(policies + rules) + '\n'
+        })
+        backend.set_backend(running)
+        self.assertTrue(config.update_radios(self.radios))
+        self.assertEqual(running.files(), [])
+        self.assertEqual([command for command in running.commands() if command[0] == 'sudo'], [])
+
+        self.radios['wlan1']['ssid'] = 'ThirdSSID'
+        self.assertTrue(config.update_radios(self.radios))
+        self.assertEqual(running.files(), ['/etc/hostapd/wlan1.conf'])
+        self.assertEqual([command for command in running.commands() if command[0] == 'sudo'],
+            [['sudo', 'systemctl', 'unmask', 'hostapd@wlan1'], ['sudo', 'systemctl', 'restart', 'hostapd@wlan1']])
+
+    def test_reapply_radio(self):
+        """A radio coming back restarts its own hostapd@, the firewall keeps every radio."""
+        self.assertTrue(config.update_radios(self.radios))
+        self.assertEqual(config.dnsmasq_addresses(), {'wlan0': ('10.10.10.1', 24), 'wlan1': ('10.10.11.1', 24)})
+        replug = backend.FakeBackend(root=self.fake.root)
+        backend.set_backend(replug)
+        rules = config.firewall.backend()
+        with patch.object(rules, 'apply', wraps=rules.apply) as apply:
+            self.assertTrue(config.reapply_radio('wlan1', self.radios))
+        apply.assert_called_once_with(['wlan0', 'wlan1'])
+        commands = replug.commands()
+        self.assertIn(['sudo', 'systemctl', 'restart', 'hostapd@wlan1'], commands)
+        self.assertIn(['sudo', 'ip', 'addr', 'add', '10.10.11.1/24', 'dev', 'wlan1'], commands)
+        self.assertNotIn(['sudo', 'systemctl', 'restart', 'hostapd'], commands)
+        self.assertFalse([command for command in commands if 'wlan0' in command])
+        restore = [event for event in replug.events if event.target == ['sudo', 'iptables-restore']]
+        self.assertEqual(len(restore), 1)
+        self.assertFalse(config.reapply_radio('wlan2', self.radios))
+
+    def test_bss(self):
+        """The BSS interfaces get their address once hostapd@<radio> created them."""
+        guests = dict(SETTINGS, ssid='Guests', encryption='none', mac_address='02:1A:2B:3C:4D:5E',
+            range_from='10.10.12.100', range_to='10.10.12.200')
+        self.radios['wlan0']['bss'] = {'wlan0_1': guests}
+        self.assertTrue(config.update_radios(self.radios))
+        self.assertEqual(self.fake.files()[:3], ['/etc/dnsmasq.conf', '/etc/hostapd/wlan0.conf', '/etc/hostapd/wlan1.conf'])
+        with open(self.fake.path('/etc/hostapd/wlan0.conf')) as file:
+            self.assertIn("\nbss=wlan0_1\nbssid=02:1a:2b:3c:4d:5e\nssid=Guests\n", file.read())
+        with open(self.fake.path('/etc/dnsmasq.conf')) as file:
+            self.assertIn("interface=wlan0_1\ndhcp-range=10.10.12.100,10.10.12.200,12h\n", file.read())
+        commands = self.fake.commands()
+        address = ['sudo', 'ip', 'addr', 'replace', '10.10.12.1/24', 'dev', 'wlan0_1']
+        self.assertLess(commands.index(['sudo', 'systemctl', 'restart', 'hostapd@wlan0']), commands.index(address))
+        self.assertLess(commands.index(address), commands.index(['sudo', 'systemctl', 'restart', 'dnsmasq']))
+        self.assertNotIn(['sudo', 'systemctl', 'restart', 'hostapd@wlan0_1'], commands)
+        with open(self.fake.path('/root/create_ap.sh')) as file:
+            script = file.read()
+        self.assertIn("sudo systemctl reload-or-restart hostapd@wlan0\nsudo systemctl reload-or-restart hostapd@wlan1\n"
+            "sudo ip addr replace 10.10.12.1/24 dev wlan0_1\n", script)
+        self.assertNotIn("wlan0_1 down", script)
+        with open(self.fake.path('/root/firewall.sh')) as file:
+            self.assertIn("-A INPUT -i wlan0_1 -j ACCEPT\n", file.read())
+
+        # wlan0 coming back gets its BSS back, once hostapd@wlan0 created it
+        replug = backend.FakeBackend(root=self.fake.root)
+        backend.set_backend(replug)
+        rules = config.firewall.backend()
+        with patch.object(rules, 'apply', wraps=rules.apply) as apply:
+            self.assertTrue(config.reapply_radio('wlan0', self.radios))
+        apply.assert_called_once_with(['wlan0', 'wlan0_1', 'wlan1'])
+        commands = replug.commands()
+        self.assertLess(commands.index(['sudo', 'systemctl', 'restart', 'hostapd@wlan0']), commands.index(address))
+        self.assertLess(commands.index(address), commands.index(['sudo', 'systemctl', 'restart', 'dnsmasq']))
+
+
+class TestIdempotentApply(unittest.TestCase):
+    '''
+    The first apply happens on one fake backend, the second on a
+    fake backend sharing its root, reporting the AP as running.
+    '''
+
+    def setUp(self):
+        first = backend.FakeBackend()
+        self.root = first.root
+        self.addCleanup(shutil.rmtree, self.root)
+        self.addCleanup(backend.set_backend, backend.set_backend(first))
+        mock_firewall = patch('src.configurations.firewall.backend', return_value=firewall.IptablesBackend())
+        mock_firewall.start()
+        self.addCleanup(mock_firewall.stop)
+        self.assertTrue(config.update_ap(dict(SETTINGS), 'wlan0'))
+        policies, rules = firewall.IptablesBackend().rules('wlan0')
+        ip = config.find_usable_ip(SETTINGS['range_from'], SETTINGS['range_to'])
+        self.running = backend.FakeBackend(root=self.root, outputs={
+            'ip -o link show dev wlan0': "3: wlan0: <UP> mtu 1500\n    link/ether 00:1a:2b:3c:4d:5e brd ff:ff:ff:ff:ff:ff\n",
+            'ip -4 -o addr show dev wlan0': "3: wlan0    inet "+ip+"/24 scope global wlan0\n",
+            'systemctl is-active hostapd dnsmasq': "active\nactive\n",
+            'iptables -S': '\n'.join(policies + rules) + '\n'
+        })
+        backend.set_backend(self.running)
+
+    def test_noop(self):
+        """Re-applying the same settings changes nothing."""
+        self.assertTrue(config.update_ap(dict(SETTINGS), 'wlan0'))
+        self.assertEqual(self.running.files(), [])
+        self.assertEqual([command for command in self.running.commands() if command[0] == 'sudo'], [])
+
+    def restarts(self):
+        return [command for command in self.running.commands() if command[:3] == ['sudo', 'systemctl', 'restart']]
+
+    def test_ssid_changed(self):
+        """Only hostapd.conf is rewritten, hostapd is reloaded in place."""
+        settings = dict(SETTINGS)
+        settings['ssid'] = 'OtherSSID'
+        self.assertTrue(config.update_ap(settings, 'wlan0'))
+        self.assertEqual(self.running.files(), ['/etc/hostapd/hostapd.conf'])
+        self.assertEqual(self.restarts(), [])
+        self.assertIn(['sudo', 'hostapd_cli', '-p', config.HOSTAPD_CTRL, '-i', 'wlan0', 'reload'], self.running.commands())
+
+    def test_reload_failed(self):
+        """A reload hostapd refuses falls back to a restart."""
+        self.running.backend.outputs['sudo hostapd_cli'] = "FAIL\n"
+        settings = dict(SETTINGS)
+        settings['channel'] = '11'
+        self.assertTrue(config.update_ap(settings, 'wlan0'))
+        self.assertEqual(self.restarts(), [['sudo', 'systemctl', 'restart', 'hostapd']])
+
+    def test_restart_failed(self):
+        """A failed restart fails the apply, even with the firewall in place."""
+        self.running.backend.failures = {'sudo hostapd_cli': 1, 'sudo systemctl restart hostapd': 1}
+        settings = dict(SETTINGS)
+        settings['ssid'] = 'OtherSSID'
+        self.assertFalse(config.update_ap(settings, 'wlan0'))
+        settings['range_to'] = '10.10.10.150'
+        self.running.backend.failures = {'sudo systemctl restart dnsmasq': 1}
+        self.assertFalse(config.update_ap(settings, 'wlan0'))
+
+    def test_channel_live(self):
+        """A new channel alone can be switched on the running hostapd."""
+        settings = dict(SETTINGS)
+        settings['channel'] = '11'
+        changes = config.pending_changes(
+            config.find_usable_ip(SETTINGS['range_from'], SETTINGS['range_to']), 'wlan0', settings)
+        self.assertEqual(changes['live'], {'channel': '11'})
+        settings['ssid'] = 'OtherSSID'
+        changes = config.pending_changes(
+            config.find_usable_ip(SETTINGS['range_from'], SETTINGS['range_to']), 'wlan0', settings)
+        self.assertEqual((changes['reload'], changes['live']), (['hostapd'], {}))
+
+    def test_range_changed(self):
+        """dnsmasq only reads dnsmasq.conf at start, it is restarted."""
+        settings = dict(SETTINGS)
+        settings['range_to'] = '10.10.10.150'
+        self.assertTrue(config.update_ap(settings, 'wlan0'))
+        self.assertEqual(self.restarts(), [['sudo', 'systemctl', 'restart', 'dnsmasq']])
+        self.assertFalse([command for command in self.running.commands() if 'hostapd_cli' in command])
+
+    def test_address_changed(self):
+        """bind-dynamic follows a new address, dnsmasq is left running."""
+        changes = config.pending_changes('10.10.10.2', 'wlan0', dict(SETTINGS))
+        self.assertTrue(changes['address'])
+        self.assertEqual((changes['restart'], changes['reload']), (['hostapd'], []))
+
+    def test_interface_changed(self):
+        """A hostapd.conf for another interface needs a restart."""
+        with open(self.running.path('/etc/hostapd/hostapd.conf')) as file:
+            content = file.read()
+        self.running.write_file('/etc/hostapd/hostapd.conf', content.replace('interface=wlan0', 'interface=wlan1'))
+        changes = config.pending_changes(
+            config.find_usable_ip(SETTINGS['range_from'], SETTINGS['range_to']), 'wlan0', dict(SETTINGS))
+        self.assertEqual((changes['restart'], changes['reload']), (['hostapd'], []))
+
+
+class TestServicePaths(unittest.TestCase):
+
+    def test_paths(self):
+        """The outage runs from the link going down until the service is back."""
+        results = [
+            runner.StepResult('link_down', [], 0, 0.5, started=10.0),
+            runner.StepResult('restart_hostapd', [], 0, 2.0, started=11.0),
+            runner.StepResult('reload_dnsmasq', [], 0, 0.1, started=11.0),
+            runner.StepResult('restart_wpa_supplicant', [], 0, 1.0, started=11.0)
+        ]
+        paths = config.service_paths(results)
+        self.assertEqual([(service, path, ok) for service, path, _, ok in paths],
+            [('hostapd', 'restart', True), ('dnsmasq', 'reload', True)])
+        self.assertAlmostEqual(paths[0][2], 3.0)
+        self.assertAlmostEqual(paths[1][2], 1.1)
+
+    def test_fallback(self):
+        """A failed reload followed by a restart reports both."""
+        results = [
+            runner.StepResult('reload_hostapd', [], 0, 0.1, 'FAIL\n', started=5.0),
+            runner.StepResult('restart_hostapd', [], 0, 1.0, started=5.2)
+        ]
+        (service, path, outage, ok), = config.service_paths(results)
+        self.assertEqual((service, path, ok), ('hostapd', 'reload, restart', True))
+        self.assertAlmostEqual(outage, 1.2)
@@ -0,0 +1,76 @@
+import unittest
+import tempfile
+import io
+import os
+import src.cache as cache
+import src.preflight as preflight
+from unittest.mock import patch
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        """Use a temporary cache file for each test."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'run', 'preflight.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_roundtrip(self):
+        """A stored entry is found again by a new instance with the same key."""
+        store = cache.Cache(self.filename)
+        store.put('model', ['a', 1], 'Raspberry Pi 4', 'output\n')
+        self.assertTrue(store.save())
+        entry = cache.Cache(self.filename).get('model', ('a', 1))
+        self.assertEqual(entry['value'], 'Raspberry Pi 4')
+        self.assertEqual(entry['output'], 'output\n')
+
+    def test_key_mismatch(self):
+        """A different key invalidates the entry."""
+        store = cache.Cache(self.filename)
+        store.put('model', ['a', 1], 'value')
+        self.assertIsNone(store.get('model', ['a', 2]))
+
+    def test_ttl_expired(self):
+        """An entry older than its time to live is ignored."""
+        store = cache.Cache(self.filename)
+        store.put('internet', [], True)
+        store.entries['internet']['time'] -= 120
+        self.assertIsNone(store.get('internet', [], ttl=60))
+        self.assertIsNotNone(store.get('internet', []))
+
+    def test_fresh_ignores_stored_entries(self):
+        """--fresh bypasses what is on disk."""
+        store = cache.Cache(self.filename)
+        store.put('model', [], 'value')
+        store.save()
+        self.assertIsNone(cache.Cache(self.filename, fresh=True).get('model', []))
+
+    def test_file_key_changes(self):
+        """Modifying a file changes its key, a missing file has a key too."""
+        path = os.path.join(self.directory.name, 'history')
+        missing = cache.file_key(path)
+        with open(path, 'w') as file:
+            file.write('date -s\n')
+        self.assertNotEqual(missing, cache.file_key(path))
+
+    def test_preflight_replays_output(self):
+        """A cached check is not run again, its output is printed anyway."""
+        calls = []
+        def check(results):
+            calls.append(1)
+            print("checked")
+            return 5
+
+        checks = [preflight.Check('a', check, key=lambda r: ['key'])]
+        for _ in range(2):
+            with patch('sys.stdout', new_callable=io.StringIO) as output:
+                result = preflight.run_checks(checks, cache=cache.Cache(self.filename))
+            self.assertEqual(output.getvalue(), "checked\n")
+            self.assertEqual(result['a'], 5)
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -1,7 +1,9 @@
 import unittest
+import ipaddress
 import tempfile
 import os
 import src.configurations as config
+import src.firewall as firewall
 from unittest.mock import patch, mock_open
 
 
@@ -106,8 +108,41 @@ class TestVerification(unittest.TestCase):
     def test_range_bad_six(self):
         result = config.is_valid_range("110.10.10.10", "10.10.10.10")
         self.assertFalse(result)
+
+    def test_range_large(self):
+        """Pools up to a /16 are accepted, the network is derived from the range."""
+        self.assertTrue(config.is_valid_range("10.10.8.10", "10.10.11.200"))
+        self.assertEqual(config.pool_network("10.10.8.10", "10.10.11.200"), (int(ipaddress.IPv4Address("10.10.8.0")), 22))
+        self.assertTrue(config.is_valid_range("10.10.1.0", "10.10.200.255", "255.255.0.0"))
+        self.assertFalse(config.is_valid_range("10.10.0.10", "10.11.0.10"))
+        self.assertFalse(config.is_valid_range("10.10.0.10", "10.10.0.200", "8"))
+
+    def test_range_netmask(self):
+        """Both ends have to be within the given netmask."""
+        self.assertFalse(config.is_valid_range("10.10.8.10", "10.10.11.200", "24"))
+        self.assertFalse(config.is_valid_range("10.10.10.10", "10.10.10.200", "foobar"))
+
+    def test_range_full(self):
+        """A pool filling the network leaves no address for the AP."""
+        self.assertFalse(config.is_valid_range("10.10.10.0", "10.10.10.255"))
 # END RANGE
 
+# BEGIN GATEWAY
+    def test_gateway_default(self):
+        self.assertEqual(config.find_usable_ip("10.10.10.100", "10.10.10.255"), "10.10.10.1")
+
+    def test_gateway_below(self):
+        """A pool starting at the first host puts the AP on the last one."""
+        self.assertEqual(config.find_usable_ip("10.10.10.1", "10.10.10.200"), "10.10.10.254")
+        self.assertEqual(config.find_usable_ip("10.10.0.1", "10.10.200.0", netmask="16"), "10.10.255.254")
+
+    def test_gateway_outside_pool(self):
+        for range_from, range_to in [("10.10.10.100", "10.10.10.200"), ("10.10.8.10", "10.10.11.200"), ("10.10.10.2", "10.10.10.253")]:
+            ip = ipaddress.IPv4Address(config.find_usable_ip(range_from, range_to))
+            self.assertFalse(ipaddress.IPv4Address(range_from) <= ip <= ipaddress.IPv4Address(range_to))
+        self.assertIsNone(config.find_usable_ip("10.10.10.1", "10.10.10.254"))
+# END GATEWAY
+
 # BEGIN default
     # BEGIN key exist
     def test_default_exist_one(self):
@@ -416,9 +451,8 @@ class TestUpdateHostapd(unittest.TestCase):
         if os.path.exists(self.temp_filename):
             os.remove(self.temp_filename)
 
-    @patch('src.configurations.safe_delete', return_value=True)
-    @patch('src.configurations.safe_lock')
-    def test_update_hostapd_none(self, mock_safe_lock, mock_safe_delete):
+    @patch('src.atomic.fileattr.set_immutable', return_value=True)
+    def test_update_hostapd_none(self, mock_set_immutable):
         """Test update_hostapd with no encryption (ap_type='none')."""
         result = config.update_hostapd(self.default_settings, self.wifiname, 'none', verbose=True, filename=self.temp_filename)
 
@@ -432,6 +466,7 @@ class TestUpdateHostapd(unittest.TestCase):
         # Define the expected content
         expected_content = (
             'driver=nl80211\n'
+            'ctrl_interface=/var/run/hostapd\n'
             f'channel={self.default_settings["channel"]}\n'
             f'interface={self.wifiname}\n'
             f'ssid={self.default_settings["ssid"]}\n'
@@ -440,9 +475,8 @@ class TestUpdateHostapd(unittest.TestCase):
         # Assert that the written content matches the expected content
         self.assertEqual(written_content, expected_content)
 
-    @patch('src.configurations.safe_delete', return_value=True)
-    @patch('src.configurations.safe_lock')
-    def test_update_hostapd_wpa1(self, mock_safe_lock, mock_safe_delete):
+    @patch('src.atomic.fileattr.set_immutable', return_value=True)
+    def test_update_hostapd_wpa1(self, mock_set_immutable):
         """Test update_hostapd with WPA1 encryption (ap_type='wpa1')."""
         result = config.update_hostapd(self.default_settings, self.wifiname, 'wpa1', verbose=True, filename=self.temp_filename)
 
@@ -457,6 +491,7 @@ class TestUpdateHostapd(unittest.TestCase):
         expected_content = (
             f'interface={self.wifiname}\n'
             'driver=nl80211\n'
+            'ctrl_interface=/var/run/hostapd\n'
             f'ssid={self.default_settings["ssid"]}\n'
             'hw_mode=g\n'
             f'channel={self.default_settings["channel"]}\n'
@@ -475,9 +510,8 @@ class TestUpdateHostapd(unittest.TestCase):
         # Assert that the written content matches the expected content
         self.assertEqual(written_content, expected_content)
 
-    @patch('src.configurations.safe_delete', return_value=True)
-    @patch('src.configurations.safe_lock')
-    def test_update_hostapd_wpa2(self, mock_safe_lock, mock_safe_delete):
+    @patch('src.atomic.fileattr.set_immutable', return_value=True)
+    def test_update_hostapd_wpa2(self, mock_set_immutable):
         """Test update_hostapd with WPA2 encryption (ap_type='wpa2')."""
         result = config.update_hostapd(self.default_settings, self.wifiname, 'wpa2', verbose=True, filename=self.temp_filename)
 
@@ -492,6 +526,7 @@ class TestUpdateHostapd(unittest.TestCase):
         expected_content = (
             f'interface={self.wifiname}\n'
             'driver=nl80211\n'
+            'ctrl_interface=/var/run/hostapd\n'
             f'ssid={self.default_settings["ssid"]}\n'
             'hw_mode=g\n'
             f'channel={self.default_settings["channel"]}\n'
@@ -531,10 +566,9 @@ class TestUpdateDnsmasq(unittest.TestCase):
             os.remove(self.temp_filename)
 
 
-    @patch('src.configurations.safe_delete', return_value=True)
-    @patch('src.configurations.safe_lock')
+    @patch('src.atomic.fileattr.set_immutable', return_value=True)
     @patch('subprocess.run')
-    def test_update_dnsmasq(self, mock_subprocess_run, mock_safe_lock, mock_safe_delete):
+    def test_update_dnsmasq(self, mock_subprocess_run, mock_set_immutable):
         """Test update_dnsmasq function."""
         result = config.update_dnsmasq(self.default_settings, self.wifiname, verbose=True, filename=self.temp_filename)
 
@@ -560,7 +594,168 @@ class TestUpdateDnsmasq(unittest.TestCase):
 
 
 
+class TestFirewall(unittest.TestCase):
+
+    @patch('src.configurations.firewall.backend', return_value=firewall.IptablesBackend())
+    @patch('src.backend.subprocess.run')
+    def test_load_firewall(self, mock_run, mock_backend):
+        """A single process receives the ruleset on stdin."""
+        mock_run.return_value.returncode = 0
+        self.assertTrue(config.load_firewall('wlan0'))
+        mock_run.assert_called_once()
+        self.assertEqual(mock_run.call_args[0][0], ["sudo", "iptables-restore"])
+        self.assertEqual(mock_run.call_args[1]['input'], firewall.IptablesBackend().render('wlan0'))
+
+    @patch('src.configurations.firewall.backend', return_value=firewall.NftablesBackend())
+    @patch('src.backend.subprocess.run')
+    def test_unload_firewall(self, mock_run, mock_backend):
+        """Only the table of the tool is deleted."""
+        mock_run.return_value.returncode = 1
+        self.assertFalse(config.unload_firewall('wlan0'))
+        self.assertEqual(mock_run.call_args[0][0], ["sudo", "nft", "-f", "-"])
+        self.assertIn("delete table inet ap_isolation", mock_run.call_args[1]['input'])
+
+class TestReadConf(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the environment for each test."""
+        self.temp_file = tempfile.NamedTemporaryFile('w', delete=False)
+        self.temp_filename = self.temp_file.name
+
+    def tearDown(self):
+        """Clean up after each test."""
+        if os.path.exists(self.temp_filename):
+            os.remove(self.temp_filename)
+
+    def write(self, content):
+        self.temp_file.write(content)
+        self.temp_file.close()
+
+    def test_hostapd_round_trip(self):
+        """A rendered hostapd.conf reads back to the same settings."""
+        settings = {'ssid': 'TestSSID', 'channel': '6', 'password': 'TestPassphrase'}
+        self.write(config.render_hostapd(settings, 'wlan0', 'wpa2'))
+        result = config.read_hostapd_conf(self.temp_filename)
+        self.assertEqual(result[:3], (settings, 'wlan0', 'wpa2'))
+
+    def test_dnsmasq_round_trip(self):
+        """A rendered dnsmasq.conf reads back to the same settings."""
+        settings = {'range_from': '10.10.10.100', 'range_to': '10.10.10.200', 'netmask': None}
+        self.write(config.render_dnsmasq(settings, 'wlan0'))
+        result = config.read_dnsmasq_conf(self.temp_filename)
+        self.assertEqual(result[:2], (settings, 'wlan0'))
+
+    def test_dnsmasq_netmask(self):
+        """An explicit netmask is written to dhcp-range, and read back."""
+        settings = {'range_from': '10.10.8.10', 'range_to': '10.10.11.200', 'netmask': '22'}
+        self.write(config.render_dnsmasq(settings, 'wlan0'))
+        result = config.read_dnsmasq_conf(self.temp_filename)
+        self.assertIn('dhcp-range=10.10.8.10,10.10.11.200,255.255.252.0,12h\n', result[2])
+        self.assertEqual(result[0]['netmask'], '255.255.252.0')
+        self.assertEqual(config.address_from_conf(False, self.temp_filename), ('10.10.8.1', 22))
+
+    def test_missing(self):
+        """A missing file is None."""
+        self.write('')
+        os.remove(self.temp_filename)
+        self.assertIsNone(config.read_dnsmasq_conf(self.temp_filename))
+        self.assertIsNone(config.read_hostapd_conf(self.temp_filename))
+
+
+class TestIniRadios(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the environment for each test."""
+        self.temp_file = tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False)
+        self.temp_filename = self.temp_file.name
+
+    def tearDown(self):
+        """Clean up after each test."""
+        if os.path.exists(self.temp_filename):
+            os.remove(self.temp_filename)
+
+    def write(self, content):
+        self.temp_file.write(content)
+        self.temp_file.close()
+
+    def test_single(self):
+        """Without radio sections, there is a single AP."""
+        self.write("[Settings]\nencryption = none\n")
+        self.assertEqual(config.ini_radios(self.temp_filename), {})
+
+    def test_radios(self):
+        """Radios inherit from [Settings], but get pools of their own."""
+        self.write(
+            "[Settings]\nencryption = wpa2\npassword = TestPassphrase\nchannel = 6\n"
+            "range_from = 10.10.10.100\nrange_to = 10.10.10.200\nmac_address = 00:1A:2B:3C:4D:5E\n"
+            "[wlan0]\nssid = LabA\n"
+            "[wlan1]\nssid = LabB\nrange_from = 10.10.10.100\nrange_to = 10.10.10.200\n"
+        )
+        radios = config.ini_radios(self.temp_filename)
+        self.assertEqual(list(radios), ['wlan0', 'wlan1'])
+        self.assertEqual(radios['wlan0']['password'], 'TestPassphrase')
+        self.assertEqual(radios['wlan0']['channel'], '6')
+        self.assertIsNone(radios['wlan0']['mac_address'])
+        # The explicit pool of wlan1 is kept, wlan0 moves to the next free /24
+        self.assertEqual(radios['wlan1']['range_from'], '10.10.10.100')
+        self.assertEqual((radios['wlan0']['range_from'], radios['wlan0']['range_to']), ('10.10.11.100', '10.10.11.255'))
+
+    def test_overlap(self):
+        """Overlapping pools are rejected."""
+        self.write(
+            "[Settings]\nencryption = none\n"
+            "[wlan0]\nrange_from = 10.10.8.10\nrange_to = 10.10.11.200\n"
+            "[wlan1]\nrange_from = 10.10.10.100\nrange_to = 10.10.10.200\n"
+        )
+        self.assertIsNone(config.ini_radios(self.temp_filename))
+
+    def test_bss(self):
+        """BSS sections join their radio, [Settings] being its first SSID."""
+        self.write(
+            "[Settings]\nencryption = wpa2\npassword = TestPassphrase\nssid = Staff\n"
+            "[bss:wlan0_1]\nssid = Guests\nencryption = none\nmac_address = 02:1A:2B:3C:4D:5E\n"
+            "[bss:wlan0_2]\nssid = Lab\nencryption = wpa1\npassword = OtherPassphrase\n"
+            "range_from = 10.10.40.10\nrange_to = 10.10.40.50\n"
+        )
+        radios = config.ini_radios(self.temp_filename)
+        self.assertEqual(list(radios), ['wlan0'])
+        self.assertEqual([name for name, _ in config.radio_interfaces(radios)], ['wlan0', 'wlan0_1', 'wlan0_2'])
+        guests = radios['wlan0']['bss']['wlan0_1']
+        self.assertEqual(guests['encryption'], 'none')
+        self.assertEqual(radios['wlan0']['range_from'], '10.10.10.100')
+        self.assertEqual(guests['range_from'], '10.10.11.100')
+        self.assertEqual(radios['wlan0']['bss']['wlan0_2']['range_from'], '10.10.40.10')
+
+    def test_bss_rejected(self):
+        """A BSS needs a known radio, and an AP type of its own."""
+        self.write(
+            "[Settings]\nencryption = none\n"
+            "[wlan0]\nssid = LabA\n"
+            "[bss:wlan1_1]\nencryption = none\n"
+        )
+        self.assertIsNone(config.ini_radios(self.temp_filename))
+        with open(self.temp_filename, 'w') as file:
+            file.write("[Settings]\nencryption = none\n[bss:wlan0_1]\npassword = TestPassphrase\n")
+        self.assertIsNone(config.ini_radios(self.temp_filename))
+
+    def test_render_bss(self):
+        """The bss= block leaves the radio settings to the radio."""
+        block = config.render_bss({'ssid': 'Guests', 'channel': '6', 'password': 'TestPassphrase',
+            'mac_address': '02-1A-2B-3C-4D-5E'}, 'wlan0_1', 'wpa2')
+        self.assertTrue(block.startswith("\nbss=wlan0_1\nbssid=02:1a:2b:3c:4d:5e\nssid=Guests\n"))
+        self.assertIn("wpa_passphrase=TestPassphrase\n", block)
+        self.assertNotIn("channel=", block)
+        self.assertNotIn("interface=", block)
+
+    def test_render_dnsmasq(self):
+        """One interface block per radio."""
+        content = config.render_dnsmasq_radios({
+            'wlan0': {'range_from': '10.10.10.100', 'range_to': '10.10.10.200'},
+            'wlan1': {'range_from': '10.10.11.100', 'range_to': '10.10.11.200'}
+        })
+        self.assertEqual(content.count('bind-dynamic'), 1)
+        self.assertIn("# wlan1\ninterface=wlan1\ndhcp-range=10.10.11.100,10.10.11.200,12h\n", content)
 
 
 if __name__ == '__main__':
-    unittest.main(verbosity=2)
\ No newline at end of file
+    unittest.main(verbosity=2)
@@ -0,0 +1,58 @@
+import unittest
+import errno
+import os
+import tempfile
+import src.fileattr as fileattr
+from unittest.mock import patch
+
+
+class TestIoctlNumbers(unittest.TestCase):
+
+    def test_numbers(self):
+        """_IOR('f', 1, long) and _IOW('f', 2, long)."""
+        size = fileattr.struct.calcsize('l')
+        self.assertEqual(fileattr.FS_IOC_GETFLAGS, 0x80006601 | size << 16)
+        self.assertEqual(fileattr.FS_IOC_SETFLAGS, 0x40006602 | size << 16)
+
+
+class TestSetImmutable(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+        try:
+            fileattr.set_immutable(self.filename, False)
+        except OSError:
+            pass
+        os.remove(self.filename)
+
+    def test_round_trip(self):
+        """The flag is set and cleared, or reported as unsupported."""
+        status = fileattr.set_immutable(self.filename, True)
+        if status == None:
+            self.skipTest("Immutable flag not supported here")
+        if status == False:
+            self.skipTest("Not allowed to set the immutable flag")
+        self.assertTrue(fileattr.is_immutable(self.filename))
+        self.assertTrue(fileattr.set_immutable(self.filename, False))
+        self.assertFalse(fileattr.is_immutable(self.filename))
+
+    @patch('src.fileattr.fcntl.ioctl', side_effect=OSError(errno.ENOTTY, 'Inappropriate ioctl for device'))
+    def test_unsupported(self, mock_ioctl):
+        self.assertIsNone(fileattr.set_immutable(self.filename, True))
+        self.assertIsNone(fileattr.get_flags(self.filename))
+
+    def test_not_permitted(self):
+        """A refused change is a failure, not an exception."""
+        def ioctl(fd, request, argument):
+            if request == fileattr.FS_IOC_SETFLAGS:
+                raise OSError(errno.EPERM, 'Operation not permitted')
+            return argument
+        with patch('src.fileattr.fcntl.ioctl', side_effect=ioctl):
+            self.assertFalse(fileattr.set_immutable(self.filename, True))
+
+    def test_missing(self):
+        with self.assertRaises(OSError):
+            fileattr.set_immutable(self.filename + '.missing', True)
@@ -0,0 +1,140 @@
+import unittest
+import subprocess
+import src.firewall as firewall
+from unittest.mock import patch
+
+
+def completed(stdout, returncode=0):
+    return subprocess.CompletedProcess([], returncode, stdout, '')
+
+
+class TestIptablesBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = firewall.IptablesBackend()
+
+    def test_render(self):
+        """The whole filter table is one iptables-restore transaction."""
+        expected_content = (
+            "*filter\n"
+            ":INPUT DROP [0:0]\n"
+            ":FORWARD DROP [0:0]\n"
+            ":OUTPUT DROP [0:0]\n"
+            "-A INPUT -i wlan0 -j ACCEPT\n"
+            "-A FORWARD -i wlan0 -j ACCEPT\n"
+            "-A OUTPUT -o wlan0 -j ACCEPT\n"
+            "-A FORWARD -o wlan0 -j ACCEPT\n"
+            "COMMIT\n"
+        )
+        self.assertEqual(self.backend.render('wlan0'), expected_content)
+
+    def test_render_radios(self):
+        """Every AP interface gets its ACCEPT rules."""
+        policies, rules = self.backend.rules(['wlan0', 'wlan1'])
+        self.assertEqual(len(rules), 8)
+        self.assertIn("-A OUTPUT -o wlan1 -j ACCEPT", rules)
+        self.assertIn("wlan0, wlan1 allowed", self.backend.script(['wlan0', 'wlan1']))
+
+    @patch('src.backend.subprocess.run', return_value=completed(
+        "-P INPUT DROP\n-P FORWARD DROP\n-P OUTPUT ACCEPT\n"
+        "-A INPUT -i wlan0 -j ACCEPT\n-A FORWARD -i wlan0 -j ACCEPT\n"
+        "-A OUTPUT -o wlan0 -j ACCEPT\n-A FORWARD -o wlan0 -j ACCEPT\n"
+        "-A INPUT -i eth0 -p tcp --dport 22 -j ACCEPT\n"))
+    def test_status(self, mock_run):
+        """Missing policies and rules are listed."""
+        self.assertEqual(self.backend.status('wlan0'), (False, ["-P OUTPUT DROP"]))
+
+    @patch('src.backend.subprocess.run', return_value=completed(
+        "-P INPUT DROP\n-P FORWARD DROP\n-P OUTPUT DROP\n"
+        "-A INPUT -i wlan0 -j ACCEPT\n-A INPUT -i eth0 -p tcp --dport 22 -j ACCEPT\n"))
+    def test_remove(self, mock_run):
+        """Only the rules of the tool which are present are deleted."""
+        command, content = self.backend.remove('wlan0')
+        self.assertEqual(command, ["sudo", "iptables-restore", "--noflush"])
+        self.assertEqual(content, (
+            "*filter\n"
+            ":INPUT ACCEPT [0:0]\n"
+            ":FORWARD ACCEPT [0:0]\n"
+            ":OUTPUT ACCEPT [0:0]\n"
+            "-D INPUT -i wlan0 -j ACCEPT\n"
+            "COMMIT\n"
+        ))
+
+
+NFT_LIST = '''table inet ap_isolation {
+	chain input {
+		type filter hook input priority filter; policy drop;
+		iifname "wlan0" accept
+	}
+	chain forward {
+		type filter hook forward priority filter; policy drop;
+		iifname "wlan0" accept
+	}
+	chain output {
+		type filter hook output priority filter; policy accept;
+		oifname "wlan0" accept
+	}
+}
+'''
+
+
+class TestNftablesBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = firewall.NftablesBackend()
+
+    def test_render(self):
+        """The table is replaced within the same transaction."""
+        content = self.backend.render('wlan0')
+        self.assertTrue(content.startswith(
+            "table inet ap_isolation\n"
+            "delete table inet ap_isolation\n"
+            "table inet ap_isolation {\n"
+            "    chain input {\n"
+            "        type filter hook input priority 0; policy drop;\n"
+            '        iifname "wlan0" accept\n'
+            "    }\n"
+        ))
+        self.assertEqual(content.count("policy drop;"), 3)
+
+    def test_render_radios(self):
+        """Every AP interface gets its ACCEPT rules."""
+        rules = self.backend.rules(['wlan0', 'wlan1'])
+        self.assertEqual(rules['input'], ['iifname "wlan0" accept', 'iifname "wlan1" accept'])
+        self.assertEqual(len(rules['forward']), 4)
+
+    def test_remove(self):
+        """Removal deletes the table, even if it is absent."""
+        self.assertEqual(self.backend.remove('wlan0'), (
+            ["sudo", "nft", "-f", "-"],
+            "table inet ap_isolation\ndelete table inet ap_isolation\n"
+        ))
+
+    @patch('src.backend.subprocess.run', return_value=completed(NFT_LIST))
+    def test_status(self, mock_run):
+        """Missing policies and rules are listed."""
+        self.assertEqual(self.backend.status('wlan0'), (False, [
+            'forward oifname "wlan0" accept',
+            'chain output policy drop'
+        ]))
+
+    @patch('src.backend.subprocess.run', return_value=completed('', 1))
+    def test_status_absent(self, mock_run):
+        self.assertEqual(self.backend.status('wlan0'), (False, ["table inet ap_isolation"]))
+
+
+class TestDetect(unittest.TestCase):
+
+    @patch('src.firewall.shutil.which', side_effect=lambda name: '/usr/sbin/'+name)
+    @patch('src.backend.subprocess.run', return_value=completed("iptables v1.8.9 (nf_tables)\n"))
+    def test_iptables_nft(self, mock_run, mock_which):
+        self.assertEqual(firewall.detect(), 'nftables')
+
+    @patch('src.firewall.shutil.which', side_effect=lambda name: '/usr/sbin/'+name)
+    @patch('src.backend.subprocess.run', return_value=completed("iptables v1.8.7 (legacy)\n"))
+    def test_iptables_legacy(self, mock_run, mock_which):
+        self.assertEqual(firewall.detect(), 'iptables')
+
+    @patch('src.firewall.shutil.which', side_effect=lambda name: '/usr/sbin/nft' if name == 'nft' else None)
+    def test_nft_only(self, mock_which):
+        self.assertEqual(firewall.detect(), 'nftables')
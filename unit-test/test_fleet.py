@@ -0,0 +1,92 @@
+import unittest
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import src.backend as backend
+import src.fleet as fleet
+from unittest.mock import patch
+
+
+class TestInventory(unittest.TestCase):
+
+    def test_parse_host(self):
+        self.assertEqual(fleet.parse_host("pi@lab-01\n"), fleet.Host('pi@lab-01'))
+        self.assertEqual(fleet.parse_host("pi@10.0.0.5:2222 ap_setup # spare"), fleet.Host('pi@10.0.0.5', 2222, 'ap_setup'))
+        self.assertEqual(fleet.parse_host("root@[::1]:2200"), fleet.Host('root@::1', 2200))
+        self.assertIsNone(fleet.parse_host("   # comment only"))
+        with self.assertRaises(ValueError):
+            fleet.parse_host("lab-01:ssh")
+
+    def test_read_inventory(self):
+        """Hosts keep the order of the inventory, an invalid line names its number."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        filename = os.path.join(directory, 'inventory')
+        with open(filename, 'w') as file:
+            file.write("# Course room\nlab-02\n\nlab-01:22\n")
+        self.assertEqual([host.name for host in fleet.read_inventory(filename)], ['lab-02', 'lab-01:22'])
+        with open(filename, 'w') as file:
+            file.write("lab-01\nlab-02:x\n")
+        with self.assertRaisesRegex(ValueError, ':2:'):
+            fleet.read_inventory(filename)
+
+
+class TestApplyFleet(unittest.TestCase):
+
+    def setUp(self):
+        self.hosts = [fleet.Host(f"pi@lab-0{number}") for number in range(1, 5)]
+        failed = ' '.join(fleet.ssh_command(self.hosts[2]))
+        unreachable = ' '.join(fleet.ssh_command(self.hosts[3]))
+        self.fake = backend.FakeBackend(default_latency=0.1,
+            failures={failed+' f=$(mktemp)': 1, unreachable: 255},
+            outputs={failed+' f=$(mktemp)': "Something went wrong with implementing the .ini file\n"})
+        self.addCleanup(shutil.rmtree, self.fake.root)
+        self.addCleanup(backend.set_backend, backend.set_backend(self.fake))
+        mock_print = patch('builtins.print')
+        mock_print.start()
+        self.addCleanup(mock_print.stop)
+
+    def test_apply_fleet(self):
+        """Hosts are applied concurrently, in one ssh session each."""
+        start = time.monotonic()
+        results = fleet.apply_fleet(self.hosts, "[Settings]\nencryption = none\n", max_hosts=4)
+        # One command of 0.1s per host, the four hosts overlap
+        self.assertLess(time.monotonic() - start, 0.25)
+        self.assertEqual([result.ok for result in results], [True, True, False, False])
+        self.assertEqual(results[2].returncode, 1)
+        self.assertEqual(results[2].detail, "Something went wrong with implementing the .ini file")
+        self.assertEqual(results[3].returncode, 255)
+        self.assertEqual(len(self.fake.commands()), 4)
+        self.assertIn(fleet.ssh_command(self.hosts[0]) + [fleet.apply_command(self.hosts[0])], self.fake.commands())
+
+    def test_apply_command(self):
+        """The .ini file lands in a private temporary file, removed afterwards."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        command = fleet.apply_command(fleet.Host('lab-01', directory=directory)).replace('sudo python3 src/tool.py -y -i', 'cp')
+        command = command.replace('"$f"; status', '"$f" copied.ini; status')
+        result = subprocess.run(['sh', '-c', command], input="[Settings]\n", text=True)
+        self.assertEqual(result.returncode, 0)
+        with open(os.path.join(directory, 'copied.ini')) as file:
+            self.assertEqual(file.read(), "[Settings]\n")
+        self.assertIn('$(mktemp)', command)
+        self.assertIn('rm -f "$f"', command)
+
+    def test_bounded(self):
+        """No more than max_hosts hosts at once."""
+        start = time.monotonic()
+        fleet.apply_fleet(self.hosts[:2] * 2, '', max_hosts=2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_summary(self):
+        results = fleet.apply_fleet(self.hosts, '', max_hosts=4)
+        table = fleet.summary(results)
+        self.assertIn("pi@lab-03 | FAIL   |", table)
+        self.assertIn("(1) Something went wrong", table)
+        self.assertTrue(table.endswith("2 of 4 hosts applied, 2 failed"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,82 @@
+import unittest
+import tempfile
+import os
+import src.cache as cache
+import src.history as history
+from unittest.mock import patch
+
+
+class TestHistory(unittest.TestCase):
+
+    def setUp(self):
+        """A history file and a state file for each test."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, '.bash_history')
+        self.state_file = os.path.join(self.directory.name, 'history.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, content, mode='w'):
+        with open(self.filename, mode) as file:
+            file.write(content)
+
+    def test_most_recent_match(self):
+        """The last matching line is returned, with its timestamp."""
+        self.write("#1700000000\nsudo date -s \"2023-11-14 22:13:20\"\n"
+                   "ls\n"
+                   "#1710000000\nsudo date -s \"2024-03-09 16:00:00\"\n"
+                   "#1710000100\ncd /tmp\n")
+        match = history.last_match(self.filename, 'date -s')
+        self.assertEqual(match['line'], 'sudo date -s "2024-03-09 16:00:00"')
+        self.assertEqual(match['timestamp'], 1710000000)
+
+    def test_without_timestamps(self):
+        """A history file without timestamps still matches."""
+        self.write("ls\nsudo date -s now\npwd")
+        match = history.last_match(self.filename, 'sudo date -s')
+        self.assertEqual(match['line'], 'sudo date -s now')
+        self.assertIsNone(match['timestamp'])
+
+    def test_no_match_or_missing(self):
+        """No match, an empty file and a missing file all give None."""
+        self.assertIsNone(history.last_match(self.filename))
+        self.write("")
+        self.assertIsNone(history.last_match(self.filename))
+        self.write("ls\n")
+        self.assertIsNone(history.last_match(self.filename))
+
+    def test_incremental_scan(self):
+        """A later run only scans the appended bytes."""
+        self.write("sudo date -s first\n" + "ls\n" * 1000)
+        state = cache.Cache(self.state_file)
+        self.assertEqual(history.last_match(self.filename, 'date -s', state)['line'], 'sudo date -s first')
+        state.save()
+
+        state = cache.Cache(self.state_file)
+        with patch('src.history._scan') as mock_scan:
+            match = history.last_match(self.filename, 'date -s', state)
+        mock_scan.assert_not_called()
+        self.assertEqual(match['line'], 'sudo date -s first')
+
+        self.write("pwd\n", 'a')
+        with patch('src.history._scan', wraps=history._scan) as mock_scan:
+            match = history.last_match(self.filename, 'date -s', state)
+        self.assertGreater(mock_scan.call_args[0][2], 0)
+        self.assertEqual(match['line'], 'sudo date -s first')
+
+        self.write("sudo date -s second\n", 'a')
+        self.assertEqual(history.last_match(self.filename, 'date -s', state)['line'], 'sudo date -s second')
+
+    def test_replaced_file_rescanned(self):
+        """A new inode (history rewritten) triggers a full scan."""
+        self.write("sudo date -s first\n")
+        state = cache.Cache(self.state_file)
+        history.last_match(self.filename, 'date -s', state)
+        os.remove(self.filename)
+        self.write("ls\n")
+        self.assertIsNone(history.last_match(self.filename, 'date -s', state))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,136 @@
+import unittest
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import src.hostapd_ctrl as hostapd_ctrl
+import src.backend as backend
+import src.configurations as config
+
+
+class FakeHostapd():
+    '''
+    A control socket answering like hostapd, from a
+    dictionary mapping each command to its answer
+    '''
+    def __init__(self, directory, wifiname='wlan0', answers={}):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, wifiname)
+        self.answers = answers
+        self.received = []
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(4096)
+            except OSError:
+                return
+            command = data.decode()
+            self.received.append(command)
+            # An event first, which the client has to skip
+            self.sock.sendto(b'<3>CTRL-EVENT-TEST', address)
+            self.sock.sendto(self.answers.get(command, 'UNKNOWN COMMAND\n').encode(), address)
+
+    def close(self):
+        self.sock.close()
+        os.remove(self.path)
+
+
+STATUS = "state=ENABLED\nphy=phy0\nfreq=2437\nchannel=6\nssid[0]=TestSSID\nnum_sta[0]=2\n"
+
+
+class TestControlClient(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.hostapd = FakeHostapd(self.directory, answers={
+            'PING': 'PONG\n',
+            'STATUS': STATUS,
+            'STA-FIRST': "00:1a:2b:3c:4d:5e\nflags=[AUTH][ASSOC][AUTHORIZED]\nconnected_time=42\n",
+            'STA-NEXT 00:1a:2b:3c:4d:5e': "00:1a:2b:3c:4d:5f\nconnected_time=7\n",
+            'STA-NEXT 00:1a:2b:3c:4d:5f': "",
+            'RELOAD': 'OK\n',
+            'CHAN_SWITCH 5 2462': 'OK\n',
+            'DISASSOCIATE 00:1a:2b:3c:4d:5e': 'OK\n',
+            'SET max_num_sta 5': 'FAIL\n'
+        })
+        self.addCleanup(self.hostapd.close)
+        self.client = hostapd_ctrl.ControlClient('wlan0', self.directory, timeout=1.0)
+        self.addCleanup(self.client.close)
+
+    def test_status(self):
+        """STATUS is parsed, events are skipped."""
+        self.assertTrue(self.client.ping())
+        status = self.client.status()
+        self.assertEqual(status['channel'], '6')
+        self.assertEqual(status['ssid[0]'], 'TestSSID')
+
+    def test_stations(self):
+        """Every station is walked through with STA-FIRST/STA-NEXT."""
+        stations = self.client.stations()
+        self.assertEqual(list(stations), ['00:1a:2b:3c:4d:5e', '00:1a:2b:3c:4d:5f'])
+        self.assertEqual(stations['00:1a:2b:3c:4d:5e']['connected_time'], '42')
+
+    def test_changes(self):
+        """OK and FAIL answers are reported as True/False."""
+        self.assertTrue(self.client.reload())
+        self.assertTrue(self.client.chan_switch('11'))
+        self.assertTrue(self.client.disassociate('00:1a:2b:3c:4d:5e'))
+        self.assertFalse(self.client.set('max_num_sta', 5))
+        self.assertFalse(self.client.chan_switch('99'))
+        self.assertNotIn('CHAN_SWITCH 5 None', self.hostapd.received)
+
+    def test_unreachable(self):
+        """A missing socket raises OSError, ping reports False."""
+        client = hostapd_ctrl.ControlClient('wlan1', self.directory)
+        self.assertFalse(client.ping())
+        with self.assertRaises(OSError):
+            client.status()
+
+    def test_channel_frequency(self):
+        self.assertEqual(hostapd_ctrl.channel_frequency('1'), 2412)
+        self.assertEqual(hostapd_ctrl.channel_frequency('14'), 2484)
+        self.assertEqual(hostapd_ctrl.channel_frequency('36'), 5180)
+        self.assertIsNone(hostapd_ctrl.channel_frequency('x'))
+
+
+class TestLiveChanges(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = backend.FakeBackend()
+        self.addCleanup(shutil.rmtree, self.fake.root)
+        self.addCleanup(backend.set_backend, backend.set_backend(self.fake))
+        self.hostapd = FakeHostapd(self.fake.path(config.HOSTAPD_CTRL), answers={
+            'CHAN_SWITCH 5 2462': 'OK\n',
+            'DISASSOCIATE 00:1a:2b:3c:4d:5e': 'OK\n'
+        })
+        self.addCleanup(self.hostapd.close)
+        self.filename = '/etc/hostapd/hostapd.conf'
+        self.fake.write_file(self.filename,
+            config.render_hostapd({'ssid': 'TestSSID', 'channel': '6', 'password': 'TestPassphrase'}, 'wlan0', 'wpa2'))
+
+    def test_change_channel(self):
+        """The channel is switched live, and kept in hostapd.conf."""
+        self.assertTrue(config.change_channel('wlan0', '11', filename=self.filename))
+        self.assertEqual(self.hostapd.received, ['CHAN_SWITCH 5 2462'])
+        self.assertEqual(config.read_hostapd_conf(self.filename)[0]['channel'], '11')
+        self.assertEqual(self.fake.commands(), [])
+
+    def test_change_refused(self):
+        """hostapd.conf is left alone when the switch fails."""
+        self.assertFalse(config.change_channel('wlan0', '1', filename=self.filename))
+        self.assertEqual(config.read_hostapd_conf(self.filename)[0]['channel'], '6')
+
+    def test_disconnect(self):
+        self.assertTrue(config.disconnect_station('wlan0', '00:1A:2B:3C:4D:5E'))
+        self.assertFalse(config.disconnect_station('wlan1', '00:1A:2B:3C:4D:5E'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,92 @@
+import unittest
+import tempfile
+import os
+import dataclasses
+import src.inventory as inventory
+
+
+class TestInventory(unittest.TestCase):
+
+    def setUp(self):
+        """Build a fake /proc and /sys/class/net for each test."""
+        self.directory = tempfile.TemporaryDirectory()
+        root = self.directory.name
+        self.cpuinfo = os.path.join(root, 'cpuinfo')
+        self.meminfo = os.path.join(root, 'meminfo')
+        self.net = os.path.join(root, 'net')
+        with open(self.cpuinfo, 'w') as file:
+            file.write("processor\t: 0\nprocessor\t: 1\n\n"
+                       "Hardware\t: BCM2835\nModel\t\t: Raspberry Pi 4 Model B Rev 1.4\n")
+        with open(self.meminfo, 'w') as file:
+            file.write("MemTotal:        3882924 kB\nMemFree:          100 kB\n")
+        self.add_netdev('eth0', device=True, driver='bcmgenet')
+        self.add_netdev('wlan0', device=True, driver='brcmfmac', phy='phy0')
+        self.add_netdev('lo', type_='772')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def add_netdev(self, name, type_='1', device=False, driver=None, phy=None):
+        path = os.path.join(self.net, name)
+        os.makedirs(path)
+        for attribute, value in (('type', type_), ('address', '02:00:00:00:00:01'), ('operstate', 'up')):
+            with open(os.path.join(path, attribute), 'w') as file:
+                file.write(value + "\n")
+        if device:
+            os.makedirs(os.path.join(path, 'device'))
+        if driver:
+            os.makedirs(os.path.join(self.directory.name, 'drivers', driver), exist_ok=True)
+            os.symlink(os.path.join(self.directory.name, 'drivers', driver), os.path.join(path, 'device', 'driver'))
+        if phy:
+            os.makedirs(os.path.join(path, 'wireless'))
+            os.makedirs(os.path.join(self.directory.name, 'ieee80211', phy))
+            os.symlink(os.path.join(self.directory.name, 'ieee80211', phy), os.path.join(path, 'phy80211'))
+
+    def test_machine(self):
+        """Model, CPU count and RAM are read from cpuinfo and meminfo."""
+        result = inventory.take_snapshot(self.cpuinfo, self.meminfo, self.net)
+        self.assertEqual(result.model, 'Raspberry Pi 4 Model B Rev 1.4')
+        self.assertEqual(result.cpu_count, 2)
+        self.assertEqual(result.mem_total, 3882924)
+        self.assertEqual(result.errors, ())
+
+    def test_cpu_model(self):
+        """The numeric CPU model and model name of x86 are not a board model."""
+        with open(self.cpuinfo, 'w') as file:
+            file.write("processor\t: 0\nmodel\t\t: 143\nmodel name\t: Intel(R) Xeon(R) Processor\n")
+        self.assertEqual(inventory.read_cpuinfo(self.cpuinfo), (None, 1))
+
+    def test_interfaces(self):
+        """Wireless and ethernet interfaces are told apart, virtual links ignored."""
+        result = inventory.take_snapshot(self.cpuinfo, self.meminfo, self.net)
+        self.assertEqual(result.wireless(), ['wlan0'])
+        self.assertEqual(result.ethernet(), ['eth0'])
+        wlan0 = result.netdev('wlan0')
+        self.assertEqual(wlan0.driver, 'brcmfmac')
+        self.assertEqual(wlan0.phy, 'phy0')
+        self.assertEqual(wlan0.operstate, 'up')
+        self.assertIsNone(result.netdev('wlan9'))
+
+    def test_immutable(self):
+        """The snapshot cannot be altered."""
+        result = inventory.take_snapshot(self.cpuinfo, self.meminfo, self.net)
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            result.model = 'other'
+
+    def test_missing_sources(self):
+        """Unreadable sources are reported instead of raising."""
+        missing = os.path.join(self.directory.name, 'missing')
+        result = inventory.take_snapshot(missing, missing, missing)
+        self.assertIsNone(result.model)
+        self.assertEqual(result.netdevs, ())
+        self.assertEqual(len(result.errors), 3)
+
+    def test_snapshot_taken_once(self):
+        """Repeated calls share one snapshot until refreshed."""
+        first = inventory.snapshot(self.cpuinfo, self.meminfo, self.net)
+        self.assertIs(first, inventory.snapshot(self.cpuinfo, self.meminfo, self.net))
+        self.assertIsNot(first, inventory.snapshot(self.cpuinfo, self.meminfo, self.net, refresh=True))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,93 @@
+import unittest
+import os
+import shutil
+import tempfile
+import src.leases as leases
+
+
+FIRST = "1700000000 00:1a:2b:3c:4d:5e 10.10.10.101 laptop 01:00:1a:2b:3c:4d:5e\n"
+SECOND = "1700000100 00:1a:2b:3c:4d:5f 10.10.10.102 * *\n"
+
+
+class TestLeaseTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = leases.LeaseTable()
+
+    def test_parse_line(self):
+        lease = leases.parse_line(SECOND)
+        self.assertEqual(lease, leases.Lease(1700000100, '00:1a:2b:3c:4d:5f', '10.10.10.102'))
+        self.assertIsNone(leases.parse_line("duid 00:01:00:01:2c:4b\n"))
+
+    def test_update(self):
+        """Joins, leaves and renewals are reported, and indexed."""
+        joined, left, renewed = self.table.update(FIRST + SECOND)
+        self.assertEqual([lease.ip for lease in joined], ['10.10.10.101', '10.10.10.102'])
+        self.assertEqual(self.table.lookup('LAPTOP')[0].mac, '00:1a:2b:3c:4d:5e')
+        self.assertEqual(self.table.lookup('10.10.10.102')[0].mac, '00:1a:2b:3c:4d:5f')
+        self.assertEqual(self.table.lookup('00-1A-2B-3C-4D-5E')[0].hostname, 'laptop')
+
+        # The laptop renews onto another IP, the second client leaves
+        renewal = FIRST.replace('1700000000', '1700000500').replace('.101', '.103')
+        joined, left, renewed = self.table.update(renewal)
+        self.assertEqual((joined, [lease.mac for lease in left]), ([], ['00:1a:2b:3c:4d:5f']))
+        self.assertEqual([lease.ip for lease in renewed], ['10.10.10.103'])
+        self.assertEqual(self.table.lookup('10.10.10.101'), [])
+        self.assertEqual(self.table.lookup('10.10.10.102'), [])
+        self.assertEqual([lease.ip for lease in self.table.lookup('laptop')], ['10.10.10.103'])
+
+    def test_incomplete_line(self):
+        """A line still being written is left for the next update."""
+        joined, _, _ = self.table.update(FIRST + SECOND[:20])
+        self.assertEqual(len(joined), 1)
+        self.assertEqual(len(self.table.leases()), 1)
+
+    def test_shared_hostname(self):
+        """Two clients with the same hostname are both found."""
+        self.table.update(FIRST + SECOND.replace(' * *', ' Laptop *'))
+        self.assertEqual(len(self.table.lookup('laptop')), 2)
+        self.table.update(FIRST)
+        self.assertEqual(len(self.table.lookup('laptop')), 1)
+
+    def test_duid_line(self):
+        """A line which is not a lease can leave the file."""
+        self.table.update("duid 00:01:00:01:2c:4b\n" + FIRST)
+        self.assertEqual(len(self.table.leases()), 1)
+        joined, left, renewed = self.table.update('')
+        self.assertEqual([lease.mac for lease in left], ['00:1a:2b:3c:4d:5e'])
+        self.assertEqual(self.table.lines, {})
+
+
+class TestLeaseMonitor(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.filename = os.path.join(self.directory, 'dnsmasq.leases')
+        with open(self.filename, 'w') as file:
+            file.write(FIRST)
+        self.monitor = leases.LeaseMonitor(self.filename)
+        self.addCleanup(self.monitor.stop)
+
+    def test_follow(self):
+        """A rewrite of the lease file reaches the index without a lookup reading it."""
+        if not self.monitor.start():
+            self.skipTest("inotify is not available")
+        self.assertEqual(len(self.monitor.leases()), 1)
+        version = self.monitor.version
+        # Rewritten in place, like dnsmasq does
+        with open(self.filename, 'r+') as file:
+            file.truncate()
+            file.write(FIRST + SECOND)
+        self.assertGreater(self.monitor.wait(version, timeout=2), version)
+        self.assertEqual(self.monitor.lookup('10.10.10.102')[0].mac, '00:1a:2b:3c:4d:5f')
+
+    def test_missing_file(self):
+        """A missing lease file means no clients."""
+        monitor = leases.LeaseMonitor(os.path.join(self.directory, 'missing', 'dnsmasq.leases'))
+        self.assertFalse(monitor.start())
+        self.assertEqual(monitor.leases(), [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
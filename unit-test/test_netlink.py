@@ -0,0 +1,60 @@
+import unittest
+import struct
+import socket
+import src.netlink as netlink
+
+
+def attribute(kind, value):
+    length = 4 + len(value)
+    return struct.pack('=HH', length, kind) + value + b'\0' * ((4 - length % 4) % 4)
+
+
+def newlink(index, name, mac=b'\x02\x00\x00\x00\x00\x01', operstate=6, kind=None, msg_type=netlink.RTM_NEWLINK, sequence=1, pid=0):
+    payload = struct.pack('=BxHiII', socket.AF_UNSPEC, 1, index, netlink.IFF_UP, 0)
+    payload += attribute(netlink.IFLA_IFNAME, name.encode() + b'\0')
+    payload += attribute(netlink.IFLA_ADDRESS, mac)
+    payload += attribute(netlink.IFLA_OPERSTATE, bytes([operstate]))
+    if kind:
+        payload += attribute(netlink.IFLA_LINKINFO, attribute(netlink.IFLA_INFO_KIND, kind.encode() + b'\0'))
+    return struct.pack('=IHHII', 16 + len(payload), msg_type, netlink.NLM_F_MULTI, sequence, pid) + payload
+
+
+class TestNetlink(unittest.TestCase):
+
+    def test_parse_link(self):
+        """Name, MAC, operstate and kind are decoded."""
+        messages = netlink.parse_messages(newlink(3, 'wlan0') + newlink(7, 'veth0', operstate=2, kind='veth'))
+        self.assertEqual(len(messages), 2)
+        first = netlink.parse_link(messages[0][2])
+        self.assertEqual(first['index'], 3)
+        self.assertEqual(first['name'], 'wlan0')
+        self.assertEqual(first['mac'], '02:00:00:00:00:01')
+        self.assertEqual(first['operstate'], 'up')
+        self.assertIsNone(first['kind'])
+        second = netlink.parse_link(messages[1][2])
+        self.assertEqual(second['operstate'], 'down')
+        self.assertEqual(second['kind'], 'veth')
+
+    def test_truncated_message_ignored(self):
+        """A truncated datagram does not raise."""
+        data = newlink(3, 'wlan0')
+        self.assertEqual(netlink.parse_messages(data[:10]), [])
+
+    def test_other_messages_ignored(self):
+        """Only the replies to the request are kept."""
+        data = newlink(3, 'wlan0', sequence=7, pid=42) + newlink(4, 'wlan1', sequence=0, pid=0) + newlink(5, 'wlan2', sequence=7, pid=43)
+        messages = netlink.parse_messages(data, 7, 42)
+        self.assertEqual([netlink.parse_link(payload)['name'] for _, _, payload in messages], ['wlan0'])
+        self.assertEqual(len(netlink.parse_messages(data)), 3)
+
+    def test_dump_links_live(self):
+        """The loopback interface is part of the live dump."""
+        try:
+            links = netlink.dump_links()
+        except OSError:
+            self.skipTest("netlink is not available")
+        self.assertIn('lo', [link['name'] for link in links])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
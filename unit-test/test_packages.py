@@ -0,0 +1,68 @@
+import unittest
+import tempfile
+import os
+import src.packages as packages
+from unittest.mock import patch
+
+
+STATUS = (
+    "Package: dnsmasq\n"
+    "Status: install ok installed\n"
+    "Version: 2.89-1\n"
+    "\n"
+    "Package: hostapd\n"
+    "Status: deinstall ok config-files\n"
+    "Version: 2:2.10-12\n"
+    "\n"
+    "Package: iptables\n"
+    "Status: hold ok installed\n"
+)
+
+
+class TestPackages(unittest.TestCase):
+
+    def setUp(self):
+        """Create a status file and a cache location for each test."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.status_file = os.path.join(self.directory.name, 'status')
+        self.cache_file = os.path.join(self.directory.name, 'cache', 'packages.json')
+        with open(self.status_file, 'w') as file:
+            file.write(STATUS)
+        packages._installed.clear()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        packages._installed.clear()
+
+    def test_parse_status(self):
+        """Only packages in an installed state are reported."""
+        result = packages.parse_status(self.status_file)
+        self.assertEqual(result, {'dnsmasq', 'iptables'})
+
+    def test_missing_packages_order(self):
+        """Missing packages are returned in the requested order."""
+        result = packages.missing_packages(['hostapd', 'dnsmasq', 'aircrack-ng', 'iptables'], self.status_file, self.cache_file)
+        self.assertEqual(result, ['hostapd', 'aircrack-ng'])
+
+    def test_cache_reused(self):
+        """A second run with an unchanged status file does not parse it again."""
+        packages.missing_packages(['dnsmasq'], self.status_file, self.cache_file)
+        self.assertTrue(os.path.exists(self.cache_file))
+        packages._installed.clear()
+        with patch('src.packages.parse_status') as mock_parse:
+            result = packages.missing_packages(['dnsmasq', 'hostapd'], self.status_file, self.cache_file)
+        mock_parse.assert_not_called()
+        self.assertEqual(result, ['hostapd'])
+
+    def test_cache_invalidated(self):
+        """Changing the status file invalidates the cache."""
+        packages.missing_packages(['hostapd'], self.status_file, self.cache_file)
+        with open(self.status_file, 'a') as file:
+            file.write("\nPackage: hostapd\nStatus: install ok installed\n")
+        os.utime(self.status_file, ns=(0, os.stat(self.status_file).st_mtime_ns + 1))
+        result = packages.missing_packages(['hostapd'], self.status_file, self.cache_file)
+        self.assertEqual(result, [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
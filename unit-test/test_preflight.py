@@ -0,0 +1,68 @@
+import unittest
+import io
+import time
+import src.preflight as preflight
+from unittest.mock import patch
+
+
+class TestRunChecks(unittest.TestCase):
+
+    def test_output_in_fixed_order(self):
+        """The slow first check is still printed first."""
+        def slow(results):
+            time.sleep(0.2)
+            print("first")
+            return 1
+
+        def fast(results):
+            print("second")
+            return 2
+
+        with patch('sys.stdout', new_callable=io.StringIO) as output:
+            result = preflight.run_checks([preflight.Check('a', slow), preflight.Check('b', fast)])
+        self.assertEqual(output.getvalue(), "first\nsecond\n")
+        self.assertEqual(result, {'a': 1, 'b': 2})
+
+    def test_checks_run_concurrently(self):
+        """Wall-clock time is close to the slowest check, not the sum."""
+        checks = [preflight.Check(str(i), lambda r: time.sleep(0.2)) for i in range(5)]
+        start = time.monotonic()
+        with patch('sys.stdout', new_callable=io.StringIO):
+            preflight.run_checks(checks)
+        self.assertLess(time.monotonic() - start, 0.6)
+
+    def test_dependency_receives_result(self):
+        """A dependent check only runs with the result of its dependency."""
+        checks = [
+            preflight.Check('names', lambda r: ['eth0', 'wlan0']),
+            preflight.Check('count', lambda r: len(r['names']), depends=['names'])
+        ]
+        with patch('sys.stdout', new_callable=io.StringIO):
+            result = preflight.run_checks(checks)
+        self.assertEqual(result['count'], 2)
+
+    def test_exit_is_raised_after_earlier_output(self):
+        """exit() in a check prints what came before and stops there."""
+        def failing(results):
+            print("failing")
+            exit(1)
+
+        checks = [
+            preflight.Check('a', lambda r: print("before")),
+            preflight.Check('b', failing),
+            preflight.Check('c', lambda r: print("after")),
+            preflight.Check('d', lambda r: print("never"), depends=['b'])
+        ]
+        with patch('sys.stdout', new_callable=io.StringIO) as output:
+            with self.assertRaises(SystemExit):
+                preflight.run_checks(checks)
+        self.assertEqual(output.getvalue(), "before\nfailing\n")
+
+    def test_unknown_dependency(self):
+        """Depending on a check that does not exist is an error."""
+        with self.assertRaises(ValueError):
+            preflight.run_checks([preflight.Check('a', lambda r: 1, depends=['missing'])])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
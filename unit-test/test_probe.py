@@ -0,0 +1,61 @@
+import unittest
+import socket
+import time
+import src.probe as probe
+from unittest.mock import patch
+
+
+class TestProbe(unittest.TestCase):
+
+    def setUp(self):
+        """A local stand-in for the probed host."""
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(8)
+        self.port = self.listener.getsockname()[1]
+
+    def tearDown(self):
+        self.listener.close()
+
+    def test_success_through_loopback(self):
+        """Connecting through 'lo' to the local listener succeeds."""
+        winner, results = probe.probe(['lo'], '127.0.0.1', self.port, timeout=1)
+        self.assertEqual(winner, 'lo')
+        self.assertTrue(results['lo'])
+
+    def test_refused(self):
+        """A closed port fails immediately rather than at the deadline."""
+        self.listener.close()
+        start = time.monotonic()
+        winner, results = probe.probe(['lo'], '127.0.0.1', self.port, timeout=5)
+        self.assertIsNone(winner)
+        self.assertIsInstance(results['lo'], str)
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_unknown_interface(self):
+        """An interface which does not exist is reported, others still succeed."""
+        winner, results = probe.probe(['doesnotexist0', 'lo'], '127.0.0.1', self.port, timeout=1)
+        self.assertEqual(winner, 'lo')
+        self.assertIsInstance(results['doesnotexist0'], str)
+
+    def test_no_interfaces(self):
+        """Nothing to probe means no access."""
+        winner, results = probe.probe([], '127.0.0.1', self.port)
+        self.assertIsNone(winner)
+        self.assertEqual(results, {})
+
+    def test_slow_resolver(self):
+        """Name resolution counts against the deadline."""
+        def slow(*args):
+            time.sleep(2)
+            return []
+        start = time.monotonic()
+        with patch('src.probe.socket.getaddrinfo', side_effect=slow):
+            winner, results = probe.probe(['lo'], 'probe.invalid', self.port, timeout=0.2)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertIsNone(winner)
+        self.assertIn("Unable to resolve", results['lo'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,69 @@
+import unittest
+import subprocess
+import time
+import src.configurations as config
+import src.runner as runner
+from unittest.mock import patch
+
+
+class TestRunSteps(unittest.TestCase):
+
+    def test_independent_concurrent(self):
+        """Independent steps overlap."""
+        start = time.monotonic()
+        results = runner.run_steps([
+            runner.Step('a', ['sleep', '0.3']),
+            runner.Step('b', ['sleep', '0.3']),
+            runner.Step('c', ['sleep', '0.3'])
+        ])
+        self.assertLess(time.monotonic() - start, 0.8)
+        self.assertTrue(runner.succeeded(results))
+        self.assertGreaterEqual(results[0].duration, 0.3)
+
+    def test_order_and_input(self):
+        """Results follow the order of the steps, input reaches stdin."""
+        results = runner.run_steps([
+            runner.Step('second', ['cat'], after=['first'], input='hello'),
+            runner.Step('first', ['true'])
+        ])
+        self.assertEqual([result.name for result in results], ['second', 'first'])
+        self.assertEqual(results[0].stdout, 'hello')
+
+    def test_depends_skipped(self):
+        """A failed dependency skips the step, and the steps waiting for it."""
+        results = runner.run_steps([
+            runner.Step('fail', ['false']),
+            runner.Step('skipped', ['true'], depends=['fail']),
+            runner.Step('also_skipped', ['true'], depends=['skipped']),
+            runner.Step('ordered', ['true'], after=['fail'])
+        ])
+        self.assertEqual([result.returncode for result in results], [1, None, None, 0])
+        self.assertTrue(results[1].skipped)
+        self.assertFalse(runner.succeeded(results))
+
+    def test_missing_command(self):
+        """A command which cannot be started is reported as 127."""
+        result = runner.run_steps([runner.Step('missing', ['/nonexistent/command'])])[0]
+        self.assertEqual(result.returncode, 127)
+        self.assertNotEqual(result.stderr, '')
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            runner.run_steps([runner.Step('a', ['true'], depends=['unknown'])])
+        with self.assertRaises(ValueError):
+            runner.run_steps([
+                runner.Step('a', ['true'], after=['b']),
+                runner.Step('b', ['true'], after=['a'])
+            ])
+
+
+class TestCreateIsolation(unittest.TestCase):
+
+    @patch('src.configurations.firewall.backend')
+    @patch('src.backend.subprocess.run')
+    def test_firewall_failure(self, mock_run, mock_backend):
+        """Nothing is started when the firewall cannot be loaded."""
+        mock_backend.return_value.apply.return_value = (['sudo', 'iptables-restore'], '')
+        mock_run.return_value = subprocess.CompletedProcess([], 1, '', '')
+        self.assertFalse(config.create_isolation('10.10.10.1', 'wlan0'))
+        mock_run.assert_called_once()
@@ -0,0 +1,197 @@
+import unittest
+import shutil
+import subprocess
+import threading
+import time
+import src.backend as backend
+import src.configurations as config
+import src.firewall as firewall
+import src.user_info as user_info
+from unittest.mock import patch
+
+
+SHOW_OUTPUT = (
+    "LoadState=loaded\nActiveState=active\nUnitFileState=enabled\n\n"
+    "LoadState=masked\nActiveState=inactive\nUnitFileState=masked\n\n"
+    "LoadState=not-found\nActiveState=inactive\nUnitFileState=\n\n"
+    "LoadState=loaded\nActiveState=failed\nUnitFileState=enabled\n"
+)
+
+
+def completed(stdout, returncode=0):
+    return subprocess.CompletedProcess([], returncode, stdout, '')
+
+
+class TestGetServiceStatus(unittest.TestCase):
+
+    def setUp(self):
+        user_info._service_cache.clear()
+
+    def tearDown(self):
+        user_info._service_cache.clear()
+
+    @patch('src.user_info.subprocess.run', return_value=completed(SHOW_OUTPUT))
+    def test_single_call(self, mock_run):
+        """All services are classified from one systemctl call."""
+        result = user_info.get_service_status(['hostapd', 'dnsmasq', 'stuff.service', 'broken'])
+        self.assertEqual(mock_run.call_count, 1)
+        self.assertEqual(mock_run.call_args[0][0][-4:], ['hostapd', 'dnsmasq', 'stuff.service', 'broken'])
+        self.assertEqual(result, {
+            'hostapd': 'Active',
+            'dnsmasq': 'Masked',
+            'stuff.service': 'Not Found',
+            'broken': 'failed'
+        })
+
+    @patch('src.user_info.subprocess.run', return_value=completed("LoadState=loaded\nActiveState=active\nDescription=a=b\n"))
+    def test_value_with_equals(self, mock_run):
+        """Values containing '=' do not break parsing."""
+        self.assertEqual(user_info.get_service_status(['hostapd']), {'hostapd': 'Active'})
+
+    @patch('src.user_info.subprocess.run', return_value=completed("LoadState=loaded\nActiveState=inactive\n"))
+    def test_cached(self, mock_run):
+        """A second query within the TTL does not call systemctl."""
+        user_info.get_service_status(['hostapd'])
+        user_info.get_service_status(['hostapd'])
+        self.assertEqual(mock_run.call_count, 1)
+        user_info.get_service_status(['hostapd'], ttl=0)
+        self.assertEqual(mock_run.call_count, 2)
+
+    def test_failed_batch_falls_back(self):
+        """An invalid unit name does not hide the status of the others."""
+        def run(command, **kwargs):
+            if len(command) > 4 or 'bad!' in command:
+                return completed('', 1)
+            return completed("LoadState=loaded\nActiveState=active\n")
+
+        with patch('src.user_info.subprocess.run', side_effect=run):
+            result = user_info.get_service_status(['hostapd', 'bad!'])
+        self.assertEqual(result, {'hostapd': 'Active', 'bad!': 'Error retrieving status'})
+
+
+
+class TestProjectStatus(unittest.TestCase):
+
+    def passing(self):
+        return {
+            '_probe_services': patch('src.user_info._probe_services', return_value=(True, {})),
+            '_probe_configuration': patch('src.user_info._probe_configuration', return_value=(True, {})),
+            '_probe_firewall': patch('src.user_info._probe_firewall', return_value=(True, [])),
+            '_probe_persistence': patch('src.user_info._probe_persistence', return_value=(False, {})),
+            '_probe_address': patch('src.user_info._probe_address', return_value=(True, {}))
+        }
+
+    def test_missing_packages(self):
+        """Missing packages are the verdict, no probe is run."""
+        with patch('src.user_info._probe_services') as mock_services:
+            result = user_info.project_status(['hostapd'], 'wlan0')
+        mock_services.assert_not_called()
+        self.assertFalse(result['healthy'])
+        self.assertEqual(result['checks'], {'packages': {'ok': False, 'detail': ['hostapd']}})
+
+    def test_healthy(self):
+        """Persistence is informational only."""
+        patches = self.passing()
+        for p in patches.values():
+            p.start()
+        self.addCleanup(patch.stopall)
+        result = user_info.project_status([], 'wlan0')
+        self.assertTrue(result['healthy'])
+        self.assertFalse(result['checks']['persistence']['ok'])
+        self.assertEqual(set(result['checks']), {'services', 'configuration', 'firewall', 'persistence', 'address'})
+
+    def test_timeout(self):
+        """A probe exceeding the budget is reported without being waited for."""
+        patches = self.passing()
+        patches['_probe_firewall'] = patch('src.user_info._probe_firewall', side_effect=lambda w: time.sleep(0.5) or (True, []))
+        for p in patches.values():
+            p.start()
+        self.addCleanup(patch.stopall)
+        result = user_info.project_status([], 'wlan0', budget=0.05)
+        self.assertLess(result['elapsed'], 0.4)
+        self.assertFalse(result['healthy'])
+        self.assertEqual(result['checks']['firewall'], {'ok': False, 'detail': 'Timed out'})
+
+    def test_daemon_threads(self):
+        """A hung probe never holds up the exit of the interpreter."""
+        patches = self.passing()
+        daemon = []
+        patches['_probe_firewall'] = patch('src.user_info._probe_firewall',
+            side_effect=lambda w: daemon.append(threading.current_thread().daemon) or (True, []))
+        for p in patches.values():
+            p.start()
+        self.addCleanup(patch.stopall)
+        user_info.project_status([], 'wlan0')
+        self.assertEqual(daemon, [True])
+
+    def test_single_query(self):
+        """The services and ap_setup.service are queried together."""
+        patches = self.passing()
+        del patches['_probe_services']
+        del patches['_probe_persistence']
+        for p in patches.values():
+            p.start()
+        self.addCleanup(patch.stopall)
+        statuses = {'hostapd': 'Active', 'dnsmasq': 'Active', 'ap_setup.service': 'Inactive'}
+        with patch('src.user_info.get_service_status', return_value=statuses) as mock_status, \
+                patch('src.user_info.configurations.persistence_status', return_value=True):
+            result = user_info.project_status([], 'wlan0')
+        mock_status.assert_called_once_with(['hostapd', 'dnsmasq', 'ap_setup.service'])
+        self.assertEqual(result['checks']['services'], {'ok': True, 'detail': {'hostapd': 'Active', 'dnsmasq': 'Active'}})
+        self.assertEqual(result['checks']['persistence']['detail'], {'files': True, 'ap_setup.service': 'Inactive'})
+
+    def test_probe_error(self):
+        """An exception in a probe fails that probe only."""
+        patches = self.passing()
+        patches['_probe_address'] = patch('src.user_info._probe_address', side_effect=OSError('No such device'))
+        for p in patches.values():
+            p.start()
+        self.addCleanup(patch.stopall)
+        result = user_info.project_status([], 'wlan0')
+        self.assertEqual(result['checks']['address'], {'ok': False, 'detail': 'No such device'})
+        self.assertTrue(result['checks']['services']['ok'])
+
+
+class TestProjectRadios(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = backend.FakeBackend()
+        self.addCleanup(shutil.rmtree, self.fake.root)
+        self.addCleanup(backend.set_backend, backend.set_backend(self.fake))
+        mock_firewall = patch('src.configurations.firewall.backend', return_value=firewall.IptablesBackend())
+        mock_firewall.start()
+        self.addCleanup(mock_firewall.stop)
+        mock_print = patch('builtins.print')
+        mock_print.start()
+        self.addCleanup(mock_print.stop)
+        first = {'ssid': 'TestSSID', 'mac_address': None, 'encryption': 'wpa2', 'password': 'TestPassphrase',
+            'range_from': '10.10.10.100', 'range_to': '10.10.10.200', 'channel': '6', 'persistence': None}
+        guests = dict(first, ssid='Guests', encryption='none', mac_address='02:1a:2b:3c:4d:5e',
+            range_from='10.10.12.100', range_to='10.10.12.200')
+        second = dict(first, ssid='OtherSSID', range_from='10.10.11.100', range_to='10.10.11.200')
+        self.assertTrue(config.update_radios({'wlan0': dict(first, bss={'wlan0_1': guests}), 'wlan1': second}))
+
+    def test_layout(self):
+        """Every hostapd@<interface> and its configuration are reviewed."""
+        self.assertEqual(user_info.project_radios(), (['wlan0', 'wlan1'], ['wlan0', 'wlan0_1', 'wlan1']))
+        self.assertEqual(user_info._units(['wlan0', 'wlan1']), ['hostapd@wlan0', 'hostapd@wlan1', 'dnsmasq'])
+        self.assertEqual(user_info._probe_configuration(['wlan0', 'wlan1']),
+            (True, {'hostapd@wlan0': 'Match', 'hostapd@wlan1': 'Match', 'dnsmasq': 'Match'}))
+        with open(self.fake.path('/etc/hostapd/wlan0.conf'), 'a') as file:
+            file.write("ignore_broadcast_ssid=1\n")
+        self.assertEqual(user_info._probe_configuration(['wlan0', 'wlan1'])[1]['hostapd@wlan0'], 'Modified')
+
+    def test_project_status(self):
+        with patch('src.user_info._probe_services', return_value=(True, {})) as mock_services, \
+                patch('src.user_info._probe_firewall', return_value=(True, [])) as mock_firewall, \
+                patch('src.user_info._probe_address', return_value=(True, {})):
+            result = user_info.project_status([], budget=1)
+        mock_services.assert_called_once_with(['wlan0', 'wlan1'])
+        mock_firewall.assert_called_once_with(['wlan0', 'wlan0_1', 'wlan1'])
+        self.assertEqual((result['wifiname'], result['radios']), ('wlan0', ['wlan0', 'wlan1']))
+        self.assertTrue(result['checks']['configuration']['ok'])
+        self.assertTrue(result['healthy'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,80 @@
+import unittest
+import argparse
+import os
+import shutil
+import tempfile
+import src.validate as validate
+from unittest.mock import patch
+
+
+class TestValidate(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        filename = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'w') as file:
+            file.write(content)
+        return filename
+
+    def test_valid(self):
+        """The settings are normalised, replaced values are reported."""
+        filename = self.write('a.ini', "[Settings]\nssid = TestSSID\nencryption = wpa2\npassword = TestPassphrase\nchannel = 30\n")
+        verdict = validate.validate_file(filename)
+        self.assertTrue(verdict['valid'])
+        self.assertEqual(verdict['ap_type'], 'wpa2')
+        self.assertEqual(verdict['settings']['ssid'], 'TestSSID')
+        self.assertEqual(verdict['settings']['channel'], '1')
+        self.assertEqual(verdict['warnings'], ["channel '30' replaced by '1'"])
+
+    def test_rejected(self):
+        """Each rejection carries its reason."""
+        cases = {
+            'missing.ini': "[Other]\nssid = TestSSID\n",
+            'password.ini': "[Settings]\nencryption = wpa1\n",
+            'broken.ini': "ssid = TestSSID\n",
+            'radios.ini': "[Settings]\nencryption = none\n[wlan0]\nrange_from = 10.10.8.10\nrange_to = 10.10.11.200\n"
+                "[wlan1]\nrange_from = 10.10.10.100\nrange_to = 10.10.10.200\n"
+        }
+        for name, content in cases.items():
+            verdict = validate.validate_file(self.write(name, content))
+            self.assertFalse(verdict['valid'], name)
+            self.assertNotEqual(verdict['errors'], [], name)
+        verdict = validate.validate_file(os.path.join(self.directory, 'password.ini'))
+        self.assertEqual(verdict['errors'], ["wpa1 requires a password"])
+        self.assertFalse(validate.validate_file(os.path.join(self.directory, 'absent.ini'))['valid'])
+
+    def test_find_files(self):
+        """Directories are searched for .ini files, in order."""
+        self.write('b.ini', '')
+        self.write('a.ini', '')
+        self.write('notes.txt', '')
+        self.write('sub/c.ini', '')
+        explicit = self.write('other.conf', '')
+        files = validate.find_files([self.directory, explicit])
+        self.assertEqual([os.path.relpath(name, self.directory) for name in files], ['a.ini', 'b.ini', 'sub/c.ini', 'other.conf'])
+
+    def test_pool(self):
+        """Many files go through the process pool, verdicts keep their order."""
+        files = [self.write(f"{number:02d}.ini", "[Settings]\nencryption = none\n" if number % 2 else "[Settings]\n")
+            for number in range(validate.POOL_THRESHOLD + 2)]
+        verdicts = validate.validate_files(files, max_workers=2)
+        self.assertEqual([verdict['file'] for verdict in verdicts], files)
+        self.assertEqual([verdict['valid'] for verdict in verdicts], [number % 2 == 1 for number in range(len(files))])
+
+    @patch('builtins.print')
+    def test_run(self, mock_print):
+        parser = argparse.ArgumentParser()
+        validate.add_arguments(parser)
+        self.write('a.ini', "[Settings]\nencryption = none\n")
+        self.assertEqual(validate.run(parser.parse_args(['--json', self.directory])), 0)
+        self.write('b.ini', "[Settings]\n")
+        self.assertEqual(validate.run(parser.parse_args([self.directory])), 1)
+        mock_print.assert_called_with("1 of 2 files valid")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,47 @@
+import unittest
+import src.netlink as netlink
+import src.watcher as watcher
+
+
+def link(name, index):
+    return {'name': name, 'index': index}
+
+
+class TestLinkTracker(unittest.TestCase):
+
+    def test_replug_is_a_return(self):
+        """Removal followed by a new link of the same name triggers."""
+        tracker = watcher.LinkTracker('wlan1', 5)
+        self.assertFalse(tracker.update(netlink.RTM_DELLINK, link('wlan1', 5)))
+        self.assertIsNone(tracker.index)
+        self.assertTrue(tracker.update(netlink.RTM_NEWLINK, link('wlan1', 9)))
+        self.assertEqual(tracker.index, 9)
+
+    def test_changes_while_present_ignored(self):
+        """Link down/up of the present interface (our own re-apply) does not trigger."""
+        tracker = watcher.LinkTracker('wlan1', 5)
+        self.assertFalse(tracker.update(netlink.RTM_NEWLINK, link('wlan1', 5)))
+        self.assertFalse(tracker.update(netlink.RTM_NEWLINK, link('wlan1', 5)))
+
+    def test_other_interfaces_ignored(self):
+        """Events of other interfaces do not trigger."""
+        tracker = watcher.LinkTracker('wlan1', 5)
+        self.assertFalse(tracker.update(netlink.RTM_DELLINK, link('eth0', 2)))
+        self.assertFalse(tracker.update(netlink.RTM_NEWLINK, link('eth0', 7)))
+        self.assertEqual(tracker.index, 5)
+
+    def test_initially_absent(self):
+        """An adapter plugged in after the watcher started triggers."""
+        tracker = watcher.LinkTracker('wlan1')
+        self.assertTrue(tracker.update(netlink.RTM_NEWLINK, link('wlan1', 3)))
+
+    def test_renamed_away(self):
+        """A rename by udev counts as a removal, renaming back as a return."""
+        tracker = watcher.LinkTracker('wlan1', 5)
+        self.assertFalse(tracker.update(netlink.RTM_NEWLINK, link('wlx0013ef', 5)))
+        self.assertIsNone(tracker.index)
+        self.assertTrue(tracker.update(netlink.RTM_NEWLINK, link('wlan1', 5)))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)